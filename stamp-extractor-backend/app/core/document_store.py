@@ -0,0 +1,220 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# Uploaded PDFs are kept on disk under their SHA-256, so a client only has to
+# send a drawing set once per session and can then refer to it by doc_id.
+DOCUMENT_STORE_DIR = os.environ.get(
+    "DOCUMENT_STORE_DIR", os.path.join(tempfile.gettempdir(), "stamp-extractor", "documents")
+)
+DOCUMENT_STORE_MAX_MB = int(os.environ.get("DOCUMENT_STORE_MAX_MB", "4096"))
+
+# Uploads are copied into the store in chunks, never held in memory whole
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "200"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# In-process LRU of opened fitz.Document objects. The byte budget is measured
+# against the PDF file size, which is a reasonable proxy for MuPDF's footprint.
+DOC_CACHE_MAX_ENTRIES = int(os.environ.get("DOC_CACHE_MAX_ENTRIES", "8"))
+DOC_CACHE_MAX_MB = int(os.environ.get("DOC_CACHE_MAX_MB", "512"))
+
+DOC_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class DocumentNotFound(KeyError):
+    pass
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, max_bytes):
+        super().__init__(f"PDF exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+        self.max_bytes = max_bytes
+
+
+class _Spool:
+    """
+    Writes a PDF into the store directory chunk by chunk while hashing it.
+    On a clean exit the file is moved to its SHA-256 path and doc_id is set.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.size = 0
+        self.doc_id = None
+        self._sha = hashlib.sha256()
+
+    def __enter__(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=self.store.root, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        return self
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.store.max_upload_bytes:
+            raise UploadTooLarge(self.store.max_upload_bytes)
+        self._sha.update(chunk)
+        self._file.write(chunk)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self._tmp_path)
+            return False
+        self.doc_id = self._sha.hexdigest()
+        self.store._commit(self._tmp_path, self.doc_id)
+        return False
+
+
+class DocumentStore:
+    def __init__(self, root, max_entries, max_bytes, max_disk_bytes, max_upload_bytes):
+        self.root = root
+        self.max_upload_bytes = max_upload_bytes
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._open_docs = OrderedDict()  # doc_id -> (fitz.Document, size_bytes)
+        self._open_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, doc_id):
+        if not DOC_ID_PATTERN.match(doc_id or ""):
+            raise DocumentNotFound(doc_id)
+        return os.path.join(self.root, f"{doc_id}.pdf")
+
+    def has(self, doc_id):
+        try:
+            return os.path.exists(self.path_for(doc_id))
+        except DocumentNotFound:
+            return False
+
+    def size_of(self, doc_id):
+        try:
+            return os.path.getsize(self.path_for(doc_id))
+        except OSError:
+            raise DocumentNotFound(doc_id)
+
+    def put(self, data):
+        """Store PDF bytes under their SHA-256 and return the doc_id."""
+        with _Spool(self) as spool:
+            spool.write(data)
+        return spool.doc_id
+
+    def put_file(self, fileobj):
+        """
+        Stream a file object into the store in UPLOAD_CHUNK_SIZE pieces.
+        Returns (doc_id, size_bytes); raises UploadTooLarge past max_upload_bytes.
+        """
+        with _Spool(self) as spool:
+            while True:
+                chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool.write(chunk)
+        return spool.doc_id, spool.size
+
+    def _commit(self, tmp_path, doc_id):
+        path = self.path_for(doc_id)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)
+            return
+        os.replace(tmp_path, path)
+        self._prune_disk(keep=doc_id)
+
+    def open(self, doc_id):
+        """Return an opened fitz.Document for doc_id, reusing the LRU entry if present."""
+        with self._lock:
+            entry = self._open_docs.get(doc_id)
+            if entry is not None:
+                self._open_docs.move_to_end(doc_id)
+                self.hits += 1
+                return entry[0]
+
+        path = self.path_for(doc_id)
+        if not os.path.exists(path):
+            raise DocumentNotFound(doc_id)
+        # Imported here, not at module level: MuPDF stays off the app import path
+        # (the warm-up imports it in the background)
+        from app.core.pdf_handler import open_pdf_file
+        # Opened from the path: MuPDF reads pages from the file on demand instead of
+        # keeping a bytes copy of the whole PDF in this process
+        doc = open_pdf_file(path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self.misses += 1
+            existing = self._open_docs.get(doc_id)
+            if existing is not None:
+                # Another thread opened it while we were parsing
+                return existing[0]
+            self._open_docs[doc_id] = (doc, size)
+            self._open_bytes += size
+            self._evict()
+        return doc
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the byte budget
+        while len(self._open_docs) > 1 and (
+            len(self._open_docs) > self.max_entries or self._open_bytes > self.max_bytes
+        ):
+            _, (_, size) = self._open_docs.popitem(last=False)
+            self._open_bytes -= size
+            self.evictions += 1
+
+    def _prune_disk(self, keep):
+        # Drop least recently touched PDFs once the store exceeds its disk budget
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(self.root, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, name[:-4], path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, doc_id, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            if doc_id == keep:
+                continue
+            with self._lock:
+                entry = self._open_docs.pop(doc_id, None)
+                if entry is not None:
+                    self._open_bytes -= entry[1]
+            os.remove(path)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open_documents": len(self._open_docs),
+                "open_bytes": self._open_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+document_store = DocumentStore(
+    DOCUMENT_STORE_DIR,
+    max_entries=DOC_CACHE_MAX_ENTRIES,
+    max_bytes=DOC_CACHE_MAX_MB * 1024 * 1024,
+    max_disk_bytes=DOCUMENT_STORE_MAX_MB * 1024 * 1024,
+    max_upload_bytes=MAX_UPLOAD_MB * 1024 * 1024,
+)
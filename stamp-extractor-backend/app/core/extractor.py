@@ -1,12 +1,60 @@
+import contextvars
+import os
 import re
-import pytesseract
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.mosaic import build_mosaic, plan_mosaics, split_words
+from app.core.ocr_engine import get_ocr_engine, words_to_columns, words_to_text, OCR_PSM
+from app.core.ocr_pipeline import (
+    center_block, ring_strips_for_ocr, SEAL_UNWRAP, CENTER_PSM, RING_PSM,
+)
+from app.core.tiling import plan_tiles, words_in_core, merge_tile_lines
+from app.core.tracing import count
+from app.core.vocabulary import VOCABULARY
+from app.core.worker_pool import WORKER_POOL_SIZE
+
+# Batch all crops of a call into one OCR pass (see app/core/mosaic.py): "1", "0", or
+# "auto" = only for backends that launch a process per call, where the fixed cost
+# dominates; in-process tesserocr has almost none, and the gutters cost a little
+OCR_MOSAIC = os.environ.get("OCR_MOSAIC", "auto")
+
+# OCR threads per worker process, each with its own engine, fed by the thread rendering
+# the page's regions (see extract_fields_pipelined); 0 = render everything, then OCR in turn.
+# Each thread is CPU-bound like the worker itself, so by default they only use cores the
+# pool leaves spare: none with the default pool of one worker per core, which under load
+# is already busy; a smaller pool (fewer, faster pages) gets the rest
+OCR_THREADS = max(0, int(os.environ.get(
+    "OCR_THREADS", str(max(0, (os.cpu_count() or 1) // WORKER_POOL_SIZE - 1))
+)))
+# Rendered crops allowed to wait for an OCR thread, which bounds the crops held in memory
+OCR_PIPELINE_DEPTH = OCR_THREADS + 1
+
+_ocr_executor = None
+
+
+# Name candidates for a license line are searched among lines starting at most this far
+# above it and this far to either side (OCR crop pixels)
+NAME_SEARCH_ABOVE = 400
+NAME_SEARCH_SIDE = 300
+
+SCATTERED_LETTERS = re.compile(r'^([A-Z]\s+){2,}[A-Z]$')
+NON_NAME_CHARS = re.compile(r'[^A-Z\s\.]')
+OF_WORD = re.compile(r'\bOF\b')
+DIGIT = re.compile(r'\d')
+WHITESPACE = re.compile(r'\s')
+# OCR artifacts around license numbers: "0, 39479" -> "39479", "No. 39479" -> "39479"
+LEADING_ZERO_NOISE = re.compile(r'[Oo0][\s,\.]+')
+NUMBER_PREFIX = re.compile(r'[Nn][Oo0]\.?\s*')
 
 
 def clean_scattered_text(text):
     lines = text.split('\n')
     cleaned_lines = []
     for line in lines:
-        if re.match(r'^([A-Z]\s+){2,}[A-Z]$', line.strip()):
+        if SCATTERED_LETTERS.match(line.strip()):
             cleaned_line = line.replace(' ', '')
             cleaned_lines.append(cleaned_line)
         else:
@@ -14,70 +62,55 @@ def clean_scattered_text(text):
     return '\n'.join(cleaned_lines)
 
 
-def get_blacklist_and_titles():
-    blacklist = [
-        'NOT FOR', 'CONSTRUCTION', 'RECORD ONLY', 'PRELIMINARY', 'FOR REVIEW',
-        'PLANS', 'ISSUED', 'DOCUMENT', 'INCOMPLETE', 'RELEASED', 'TEMPORARILY',
-        'PROGRESS', 'INTENDED', 'INTENDICD', 'BIDDING', 'PURPOSES', 'DRAWINGS', 'PERMIT',
-        'REVIEW', 'ONLY', 'HARVARD', 'WATER', 'SYSTEM', 'PROJECT', 'PUBLIC', 'THIS', 'NOT',
-        'AUF', 'MASS', 'STAMP', 'SEAL', 'DATE', 'SIGNED', 'SIGNATURE', 'YSTEM', 'ECT',
-        'ANY', 'OND', 'OF', 'THE', 'AND', 'FOR', 'HIS', 'PROJECT', 'DESCRIPTION', 'INTERCONNECTION',
-        'DITHLIC', 'HARVARDDEVEN', 'HARVARD-DEVEN', 'PEMES', 'MAG', 'MAS', 'ATH', 'KN', 'KOS', 'OAK',
-        'COMMONWEALTH', 'MASSACHUSETTS', 'PE',
-    ]
-    titles = [
-        'CIVIL', 'ENGINEER', 'PROFESSIONAL', 'REGISTERED', 'LICENSE',
-        'CERTIFICATE', 'STRUCTURAL', 'STATE', 'OF', 'COMMONWEALTH',
-        'ENVIRONMENTAL', 'ENVIRONMENTAL]', 'NATIONAL', 'BOARD', 'REGISTRATION',
-        'MENTAL', 'MENTAL]', 'EN', 'WY', 'AL', 'S|', 'OS', 'FIC', 'AOS', 'II', 'O/', 'ENVI', 'RONMENTAL',
-    ]
-    return blacklist, titles
-
-
 def _is_valid_name_fragment(clean_l):
     """Return True if text looks like part of an engineer name."""
-    blacklist, titles = get_blacklist_and_titles()
     if not clean_l or len(clean_l) < 2:
         return False
     # Filter circular text artifacts: "XX OF XX", "XX OF MAS", etc.
-    if re.search(r'\bOF\b', clean_l):
+    if OF_WORD.search(clean_l):
         return False
     # Filter if it contains digits
-    if re.search(r'\d', clean_l):
+    if DIGIT.search(clean_l):
         return False
-    # Filter blacklist (exact match on whole line)
-    if clean_l in blacklist or clean_l in titles:
+    # Filter stamp boilerplate and seal titles (exact match on whole line)
+    if clean_l in VOCABULARY.name_rejects:
         return False
     # Filter lines that are just 1-2 chars (noise)
-    if len(re.sub(r'\s', '', clean_l)) < 3:
+    if len(WHITESPACE.sub('', clean_l)) < 3:
         return False
     return True
 
 
-def extract_engineer_name_near_idx(lines, anchor_idx, lines_data=None):
+class _NameFragments:
+    """Lines reduced to name characters (None where not a name), worked out on first lookup."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self._cache = {}
+
+    def __getitem__(self, i):
+        if i not in self._cache:
+            clean_l = NON_NAME_CHARS.sub('', clean_scattered_text(self.lines[i]).upper()).strip()
+            self._cache[i] = clean_l if _is_valid_name_fragment(clean_l) else None
+        return self._cache[i]
+
+
+def extract_engineer_name_near_idx(lines, anchor_idx, boxes=None, names=None):
     """Find engineer name lines near the license number line.
-    Uses spatial proximity if lines_data (with bbox) is provided."""
+    Uses spatial proximity if boxes (an (n, 4) array of line bboxes) is provided.
+    names: a _NameFragments over lines, shared between the licenses of one word list."""
+    if names is None:
+        names = _NameFragments(lines)
     candidates = []
 
     # Prefer spatial search if we have bbox data
-    if lines_data and anchor_idx < len(lines_data):
-        anchor_y = lines_data[anchor_idx]["bbox"][1]  # top-y of license line
-        anchor_x = lines_data[anchor_idx]["bbox"][0]
-
-        for i, ld in enumerate(lines_data):
-            if i == anchor_idx:
-                continue
-            lx, ly, lw, lh = ld["bbox"]
-            # Must be above the license line (smaller y) and within stamp width
-            dy = anchor_y - ly
-            dx = abs(lx - anchor_x)
-            if dy < 0 or dy > 400:  # above by up to 400px
-                continue
-            if dx > 300:  # horizontally close
-                continue
-            clean_l = re.sub(r'[^A-Z\s\.]', '', lines[i].upper()).strip()
-            if _is_valid_name_fragment(clean_l):
-                candidates.append((dy, clean_l, i))
+    if boxes is not None and anchor_idx < len(boxes):
+        anchor_x, anchor_y = boxes[anchor_idx, 0], boxes[anchor_idx, 1]
+        # Must be above the license line (smaller y) and within stamp width
+        dy = anchor_y - boxes[:, 1]
+        near = (dy >= 0) & (dy <= NAME_SEARCH_ABOVE) & (np.abs(boxes[:, 0] - anchor_x) <= NAME_SEARCH_SIDE)
+        near[anchor_idx] = False
+        candidates = [(int(dy[i]), names[i], i) for i in np.flatnonzero(near) if names[i] is not None]
 
         if candidates:
             # Sort by distance from license (closest first), take best 2
@@ -90,9 +123,8 @@ def extract_engineer_name_near_idx(lines, anchor_idx, lines_data=None):
         for i in [anchor_idx - offset, anchor_idx + offset]:
             if i < 0 or i >= len(lines):
                 continue
-            clean_l = re.sub(r'[^A-Z\s\.]', '', lines[i].upper()).strip()
-            if _is_valid_name_fragment(clean_l):
-                candidates.append((offset, clean_l, i))
+            if names[i] is not None:
+                candidates.append((offset, names[i], i))
         if len(candidates) >= 2:
             break
 
@@ -103,90 +135,260 @@ def extract_engineer_name_near_idx(lines, anchor_idx, lines_data=None):
 
 
 def extract_fields_multi(image):
-    # OCR with word-level boxes
-    # PSM 11 = sparse text, find as much text as possible (best for stamps with circular/rotated text)
-    # OEM 1 = LSTM neural net mode (better accuracy for varied fonts)
-    data = pytesseract.image_to_data(image, config=r'--oem 1 --psm 11', lang='eng')
-    # Also get raw text for debugging
-    raw_text = pytesseract.image_to_string(image, config=r'--oem 1 --psm 11', lang='eng')
+    # One recognition pass yields words, boxes and confidences; raw text is derived from it
+    words = get_ocr_engine().recognize(image)
+    raw_text = words_to_text(words)
     print(f"[OCR DEBUG] Raw text found: {raw_text[:200] if raw_text else 'NONE'}")
-    rows = data.split('\n')
-    if not rows:
-        return []
-    header = rows[0].split('\t')
-    try:
-        idx_text = header.index('text')
-        idx_left = header.index('left')
-        idx_top = header.index('top')
-        idx_width = header.index('width')
-        idx_height = header.index('height')
-        idx_line = header.index('line_num')
-        idx_block = header.index('block_num')
-    except ValueError:
+    return extract_fields_from_words(words)
+
+
+def _use_mosaic(engine):
+    return OCR_MOSAIC == "1" or (OCR_MOSAIC == "auto" and engine.launches_process)
+
+
+def _recognize_many(engine, crops, psm=OCR_PSM, mosaic_psm=None):
+    """
+    One word list per crop, from one engine call per crop or per mosaic.
+    mosaic_psm replaces psm for mosaics (a stack of single lines is a block).
+    """
+    if not _use_mosaic(engine) or len(crops) == 1:
+        return [engine.recognize(crop, psm=psm) for crop in crops]
+    per_crop = [None] * len(crops)
+    for group in plan_mosaics([crop.shape for crop in crops]):
+        mosaic, placements = build_mosaic([crops[i] for i in group])
+        for i, words in zip(group, split_words(engine.recognize(mosaic, psm=mosaic_psm or psm), placements)):
+            per_crop[i] = words
+    return per_crop
+
+
+def _stack_words(word_lists):
+    """Merge word lists from separate OCR calls, keeping their blocks apart and stacked top to bottom."""
+    merged, y_offset = [], 0
+    for k, words in enumerate(word_lists):
+        for w in words:
+            merged.append({**w, "block_num": w["block_num"] + 1000 * k, "top": w["top"] + y_offset})
+        y_offset += max((w["top"] + w["height"] for w in words), default=0) + 1000
+    return merged
+
+
+def extract_seal_fields_batched(images, circles):
+    """
+    Read seals whose circle (cx, cy, r, in each image's pixels) is known, cheapest
+    view first: the centre block (name, license) in block mode, then for seals still
+    without a license the polar-unwrapped ring strips in line mode. Returns one
+    result list per image, or None where neither view yielded a license.
+    """
+    engine = get_ocr_engine()
+    centers = [center_block(img, c[:2], c[2]) for img, c in zip(images, circles)]
+    usable = [i for i, block in enumerate(centers) if min(block.shape, default=0) >= 16]
+    results = [None] * len(images)
+    center_words = dict(zip(usable, _recognize_many(engine, [centers[i] for i in usable], psm=CENTER_PSM)))
+    for i, words in center_words.items():
+        engineers = extract_fields_from_words(words)
+        if engineers:
+            print(f"[OCR DEBUG] Seal {i} centre: {words_to_text(words)[:200]}")
+            results[i] = engineers
+            count("seal_center_read")
+
+    pending = [i for i in range(len(images)) if results[i] is None]
+    if pending:
+        strips = [ring_strips_for_ocr(images[i], circles[i][:2], circles[i][2]) for i in pending]
+        flat = [strip for seal in strips for strip in seal]
+        words = iter(_recognize_many(engine, flat, psm=RING_PSM, mosaic_psm=CENTER_PSM))
+        for i, seal in zip(pending, strips):
+            ring_words = [next(words) for _ in seal]
+            engineers = extract_fields_from_words(_stack_words([center_words.get(i, [])] + ring_words))
+            if engineers:
+                print(f"[OCR DEBUG] Seal {i} ring: {' | '.join(words_to_text(w) for w in ring_words)[:200]}")
+                results[i] = engineers
+                count("seal_ring_read")
+    return results
+
+
+def extract_fields_batched(images, circles=None):
+    """
+    extract_fields_multi for several crops (from one page or several) with a single
+    engine call per mosaic. circles[i], when given, is the seal circle (cx, cy, r) in
+    image i's pixels: those crops are read through extract_seal_fields_batched first,
+    and only fall back to sparse OCR of the whole crop when that finds no license.
+    Returns one result list per input image, in order.
+    """
+    if not images:
         return []
+    results = [None] * len(images)
+    if SEAL_UNWRAP and circles:
+        seals = [i for i, c in enumerate(circles) if c is not None]
+        if seals:
+            seal_results = extract_seal_fields_batched([images[i] for i in seals], [circles[i] for i in seals])
+            for i, engineers in zip(seals, seal_results):
+                results[i] = engineers
+
+    rest = [i for i, r in enumerate(results) if r is None]
+    fallbacks = sum(1 for i in rest if circles and circles[i] is not None)
+    if fallbacks:
+        count("seal_sparse_fallback", fallbacks)
+    if not rest:
+        return results
+
+    engine = get_ocr_engine()
+    if not _use_mosaic(engine) or len(rest) == 1:
+        for i in rest:
+            results[i] = extract_fields_multi(images[i])
+        return results
+
+    for i, words in zip(rest, _recognize_many(engine, [images[i] for i in rest])):
+        raw_text = words_to_text(words)
+        print(f"[OCR DEBUG] Raw text found (tile {i}): {raw_text[:200] if raw_text else 'NONE'}")
+        results[i] = extract_fields_from_words(words)
+    return results
+
+
+def ocr_pipelining():
+    """True when regions are rendered and OCR'd as a pipeline rather than in two phases."""
+    return OCR_THREADS > 0 and not _use_mosaic(get_ocr_engine())
+
+
+def _get_ocr_executor():
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = ThreadPoolExecutor(max_workers=OCR_THREADS, thread_name_prefix="ocr")
+    return _ocr_executor
+
+
+def warm_ocr_threads():
+    """Load an engine in every OCR thread now rather than on a request's first regions."""
+    if OCR_THREADS == 0:
+        return
+    # Each task holds its thread at the barrier until all have started, so each lands on its own thread
+    barrier = threading.Barrier(OCR_THREADS)
+
+    def load():
+        get_ocr_engine()
+        barrier.wait(timeout=120)
+
+    for future in [_get_ocr_executor().submit(load) for _ in range(OCR_THREADS)]:
+        future.result()
+
+
+def extract_fields_pipelined(renders, circles=None):
+    """
+    extract_fields_batched for crops not rendered yet: renders[i]() returns crop i.
+    The calling thread renders the crops one after another while OCR_THREADS threads
+    OCR the ones already rendered, so rendering of the next region overlaps OCR of the
+    previous ones; at most OCR_PIPELINE_DEPTH rendered crops wait at any time.
+    Returns one result list per render, in order.
+    """
+    circles = circles or [None] * len(renders)
+    executor = _get_ocr_executor()
+    slots = threading.BoundedSemaphore(OCR_PIPELINE_DEPTH)
+
+    def ocr(crop, circle):
+        try:
+            return extract_fields_batched([crop], [circle])[0]
+        finally:
+            slots.release()
+
+    futures = []
+    for render, circle in zip(renders, circles):
+        slots.acquire()
+        try:
+            crop = render()
+        except BaseException:
+            slots.release()
+            raise
+        # Copy the context so the OCR thread's counters land in this page's trace
+        futures.append(executor.submit(contextvars.copy_context().run, ocr, crop, circle))
+        del crop
+    return [f.result() for f in futures]
+
+
+def extract_fields_tiled(render_tile, width, height, max_pixels, overlap):
+    """
+    extract_fields_multi for an image too big to hold at once. render_tile(x, y, w, h)
+    is called for overlapping tiles of at most max_pixels (see app/core/tiling.py), one
+    at a time, and each tile is released before the next is rendered.
+    """
+    engine = get_ocr_engine()
+    words = []
+    for k, tile in enumerate(plan_tiles(width, height, max_pixels, overlap)):
+        image = render_tile(*tile[:4])
+        words.extend(words_in_core(engine.recognize(image), tile, k))
+        del image
+    words = merge_tile_lines(words)
+    raw_text = words_to_text(words)
+    print(f"[OCR DEBUG] Raw text found (tiled): {raw_text[:200] if raw_text else 'NONE'}")
+    return extract_fields_from_words(words)
+
+
+def group_lines(columns):
+    """
+    Tesseract lines from word columns (see ocr_engine.words_to_columns), ordered by
+    (block_num, line_num). Returns (texts, boxes, confs): each line's words joined in
+    reading order, an (n, 4) int array of (left, top, summed word width, tallest word)
+    and the mean confidence of its recognised words (0 when none).
+    """
+    if not columns["text"]:
+        return [], np.empty((0, 4), dtype=np.int64), np.empty(0)
+    block, line = columns["block_num"], columns["line_num"]
+    # Stable, so words keep their reading order within a line
+    order = np.lexsort((line, block))
+    block, line = block[order], line[order]
+    starts = np.flatnonzero(np.r_[True, (block[1:] != block[:-1]) | (line[1:] != line[:-1])])
+
+    boxes = np.stack([
+        np.minimum.reduceat(columns["left"][order], starts),
+        np.minimum.reduceat(columns["top"][order], starts),
+        np.add.reduceat(columns["width"][order], starts),
+        np.maximum.reduceat(columns["height"][order], starts),
+    ], axis=1)
+    conf = columns["conf"][order]
+    recognised = conf >= 0
+    n = np.add.reduceat(recognised.astype(np.int64), starts)
+    total = np.add.reduceat(np.where(recognised, conf, 0.0), starts)
+    confs = np.divide(total, n, out=np.zeros(len(starts)), where=n > 0)
+
+    text = columns["text"]
+    bounds = starts.tolist() + [len(order)]
+    order = order.tolist()
+    texts = [" ".join(text[k] for k in order[a:b]) for a, b in zip(bounds, bounds[1:])]
+    return texts, boxes, confs
+
 
-    line_map = {}
-    for row in rows[1:]:
-        cols = row.split('\t')
-        if len(cols) <= idx_text:
-            continue
-        text = cols[idx_text].strip()
-        if not text:
-            continue
-        key = (cols[idx_block], cols[idx_line])
-        word_info = {
-            "text": text,
-            "left": int(cols[idx_left]),
-            "top": int(cols[idx_top]),
-            "width": int(cols[idx_width]),
-            "height": int(cols[idx_height]),
-        }
-        if key not in line_map:
-            line_map[key] = []
-        line_map[key].append(word_info)
-
-    lines_data = []
-    for key in sorted(line_map.keys()):
-        words = line_map[key]
-        full_text = " ".join([w["text"] for w in words])
-        lx = min(w["left"] for w in words)
-        ly = min(w["top"] for w in words)
-        lw = sum(w["width"] for w in words)
-        lh = max(w["height"] for w in words)
-        lines_data.append({"text": full_text, "bbox": (lx, ly, lw, lh)})
-
-    cleaned_lines = [clean_scattered_text(ld["text"]) for ld in lines_data]
+def extract_fields_from_words(words):
+    """Find license numbers and nearby engineer names in an OCR word list."""
+    texts, boxes, confs = group_lines(words_to_columns(words))
+    # Only lines near a license are ever cleaned up as names
+    names = _NameFragments(texts)
 
     results = []
     processed_licenses = set()
-    # Match 4-6 digit license numbers; allow optional leading noise char
-    license_pattern = r'\b\d{4,6}\b'
 
-    for i, line_text in enumerate(cleaned_lines):
+    for i, line_text in enumerate(texts):
         # Clean line text: remove common OCR artifacts around numbers
-        # "0, 39479" → "39479", "No. 39479" → "39479"
-        cleaned_for_lic = re.sub(r'[Oo0][\s,\.]+', ' ', line_text)  # Remove leading O/0 with punctuation
-        cleaned_for_lic = re.sub(r'[Nn][Oo0]\.?\s*', ' ', cleaned_for_lic)  # Remove "No." prefix
+        cleaned_for_lic = LEADING_ZERO_NOISE.sub(' ', line_text)  # Remove leading O/0 with punctuation
+        cleaned_for_lic = NUMBER_PREFIX.sub(' ', cleaned_for_lic)  # Remove "No." prefix
 
-        matches = re.findall(license_pattern, cleaned_for_lic)
-        for lic in matches:
+        # License numbers in the vocabulary's OCR formats (4-6 digits by default)
+        for lic in VOCABULARY.ocr_license.findall(cleaned_for_lic):
             # Skip obvious years (19xx, 20xx) but only if exactly 4 digits
             # This allows partial reads like "1926" which might be "55926" with OCR error
-            if len(lic) == 4 and (lic.startswith('19') or lic.startswith('20')):
+            if len(lic) == 4 and VOCABULARY.is_year(lic):
                 continue
-            # Skip very small numbers (noise)
-            if int(lic) < 1000:
+            # Skip very small numbers (noise), e.g. "0042"; formats with letters or
+            # fewer digits are only ever matched because a state's vocabulary asks for them
+            if lic.isdigit() and len(lic) >= 4 and int(lic) < 1000:
                 continue
             if lic in processed_licenses:
                 continue
 
-            name = extract_engineer_name_near_idx(cleaned_lines, i, lines_data)
-            lx, ly, lw, lh = lines_data[i]["bbox"]
+            name = extract_engineer_name_near_idx(texts, i, boxes, names)
+            lx, ly, lw, lh = boxes[i].tolist()
 
             results.append({
                 "engineer_name": name,
                 "license_number": lic,
-                "relative_bbox": [lx - 50, ly - 200, lw + 100, lh + 400]
+                "relative_bbox": [lx - 50, ly - 200, lw + 100, lh + 400],
+                "confidence": float(confs[i]),  # mean word confidence of the license line
             })
             processed_licenses.add(lic)
 
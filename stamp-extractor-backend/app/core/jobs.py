@@ -0,0 +1,461 @@
+"""
+Asynchronous extraction jobs. POST /jobs queues a document's pages and returns at
+once; a runner in each API process feeds the pages to its worker pool and records
+every page's outcome, so clients poll (or watch a WebSocket) instead of holding a
+request open for minutes.
+
+The queue is SQLite (JOB_STORE_PATH), shared by every uvicorn process:
+  jobs         one row per job: document, lane, state, summary once done
+  job_pages    one row per selected page: pending -> running -> done | skipped | error
+  job_runners  heartbeat of each process running jobs
+
+A page is claimed inside one write transaction, so two processes never run it
+twice. Pages held by a runner whose heartbeat has gone stale (the process died)
+are claimed again, and a clean shutdown hands its pages back at once: jobs
+survive a restart and resume with the pages not yet done.
+
+Lanes: "interactive" jobs run first, up to JOB_INTERACTIVE_CONCURRENCY pages at a
+time; "bulk" jobs (backfills) get at most JOB_BULK_CONCURRENCY pages and only
+start a page while a worker is idle, so they never queue ahead of interactive work.
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.document_store import document_store, DocumentNotFound
+from app.core.metrics import record_trace, record_page_result, job_pages_finished
+from app.core.result_cache import result_cache
+from app.core.worker_pool import worker_pool, PoolSaturated
+
+JOB_STORE_PATH = os.environ.get(
+    "JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "stamp-extractor", "jobs.sqlite3")
+)
+# Finished jobs (done, cancelled, failed) and their page results are kept this long
+JOB_RESULT_TTL_HOURS = float(os.environ.get("JOB_RESULT_TTL_HOURS", "24"))
+# Set to 0 for an API process that accepts jobs but leaves running them to others
+JOB_RUNNER = os.environ.get("JOB_RUNNER", "1") == "1"
+JOB_INTERACTIVE_CONCURRENCY = max(1, int(os.environ.get("JOB_INTERACTIVE_CONCURRENCY", str(worker_pool.size))))
+JOB_BULK_CONCURRENCY = max(1, int(os.environ.get("JOB_BULK_CONCURRENCY", str(max(1, worker_pool.size // 2)))))
+# A runner missing this many heartbeats is presumed dead and its pages are claimed again
+JOB_HEARTBEAT_SECONDS = 10
+JOB_STALE_HEARTBEATS = 3
+# Pages that keep taking their worker down (e.g. OOM) are given up on after this many claims
+JOB_PAGE_MAX_ATTEMPTS = 3
+# How often the runner looks for new work when nothing wakes it, and WebSockets poll for progress
+JOB_POLL_SECONDS = 1.0
+
+JOB_PRIORITIES = ("interactive", "bulk")
+JOB_TRIAGE_MODES = ("skip", "off")
+FINISHED_STATES = ("done", "cancelled", "failed")
+
+
+def parse_page_selection(spec, page_count):
+    """
+    Sorted, deduped 0-indexed pages from a selection like "0-4,9,12-13" (ranges
+    inclusive); None or "" selects every page. Raises ValueError on bad input.
+    """
+    if not spec or not spec.strip():
+        return list(range(page_count))
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        first, sep, last = part.partition("-")
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError:
+            raise ValueError(f"Bad page selection: {part!r}")
+        if first < 0 or last >= page_count or first > last:
+            raise ValueError(f"Page range {part!r} outside 0-{page_count - 1}")
+        pages.update(range(first, last + 1))
+    return sorted(pages)
+
+
+class JobStore:
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, priority TEXT NOT NULL, triage TEXT NOT NULL,"
+                " state TEXT NOT NULL, pages_total INTEGER NOT NULL, created REAL NOT NULL,"
+                " started REAL, finished REAL, summary TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority, created)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_pages ("
+                " job_id TEXT NOT NULL, page INTEGER NOT NULL, state TEXT NOT NULL, owner TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT,"
+                " PRIMARY KEY (job_id, page))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS job_runners (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create(self, doc_id, pages, priority, triage):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (job_id, doc_id, priority, triage, state, pages_total, created)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, doc_id, priority, triage, len(pages), time.time()),
+            )
+            conn.executemany(
+                "INSERT INTO job_pages (job_id, page, state) VALUES (?, ?, 'pending')",
+                [(job_id, p) for p in pages],
+            )
+            conn.commit()
+        return job_id
+
+    def get(self, job_id):
+        """Progress of a job as a plain dict, or None once unknown or expired."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT doc_id, priority, triage, state, pages_total, created, started, finished, summary, error"
+                " FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(conn.execute(
+                "SELECT state, COUNT(*) FROM job_pages WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall())
+        doc_id, priority, triage, state, total, created, started, finished, summary, error = row
+        return {
+            "job_id": job_id,
+            "doc_id": doc_id,
+            "state": state,
+            "priority": priority,
+            "triage": triage,
+            "pages_total": total,
+            "pages_done": counts.get("done", 0),
+            "pages_skipped": counts.get("skipped", 0),
+            "pages_failed": counts.get("error", 0),
+            "pages_remaining": counts.get("pending", 0) + counts.get("running", 0),
+            "created": created,
+            "started": started,
+            "finished": finished,
+            "expires_at": finished + self.ttl_seconds if finished else None,
+            "error": error,
+            "summary": json.loads(summary) if summary else None,
+        }
+
+    def page_results(self, job_id):
+        """[{"page", "state", "result", "error"}] of every page of a job, in page order."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT page, state, result, error FROM job_pages WHERE job_id = ? ORDER BY page", (job_id,)
+            ).fetchall()
+        return [
+            {"page": page, "state": state, "result": json.loads(result) if result else None, "error": error}
+            for page, state, result, error in rows
+        ]
+
+    def cancel(self, job_id):
+        """Stop a queued or running job: no further pages start. False if it had already finished."""
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute(
+                "UPDATE jobs SET state = 'cancelled', finished = ? WHERE job_id = ? AND state IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+            conn.commit()
+        return cur.rowcount > 0
+
+    def claim(self, owner, priority, limit, stale_before):
+        """
+        Claim up to `limit` runnable pages of the given lane for owner, oldest job first:
+        pending pages, and running pages whose owner's heartbeat is older than stale_before.
+        Returns [(job_id, doc_id, page, triage, attempts)], attempts counting this claim.
+        """
+        with self._lock:
+            conn = self._connect()
+            # Taken before reading, so no other process can claim the same rows in between
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT p.job_id, j.doc_id, p.page, j.triage, p.attempts FROM job_pages p"
+                    " JOIN jobs j ON j.job_id = p.job_id"
+                    " LEFT JOIN job_runners r ON r.owner = p.owner"
+                    " WHERE j.priority = ? AND j.state IN ('queued', 'running')"
+                    " AND (p.state = 'pending' OR (p.state = 'running' AND (r.owner IS NULL OR r.heartbeat < ?)))"
+                    " ORDER BY j.created, p.page LIMIT ?",
+                    (priority, stale_before, limit),
+                ).fetchall()
+                claimed = []
+                for job_id, doc_id, page, triage, attempts in rows:
+                    conn.execute(
+                        "UPDATE job_pages SET state = 'running', owner = ?, attempts = attempts + 1"
+                        " WHERE job_id = ? AND page = ?",
+                        (owner, job_id, page),
+                    )
+                    claimed.append((job_id, doc_id, page, triage, attempts + 1))
+                conn.executemany(
+                    "UPDATE jobs SET state = 'running', started = ? WHERE job_id = ? AND state = 'queued'",
+                    [(time.time(), job_id) for job_id in {c[0] for c in claimed}],
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return claimed
+
+    def finish_page(self, job_id, page, owner, state, result=None, error=None):
+        """
+        Record a claimed page's outcome. Returns the job's pages still pending or
+        running, or None if the page was no longer this owner's (claimed again
+        after a missed heartbeat) or the job is no longer running.
+        """
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute(
+                "UPDATE job_pages SET state = ?, result = ?, error = ?, owner = NULL"
+                " WHERE job_id = ? AND page = ? AND owner = ? AND state = 'running'",
+                (state, json.dumps(result) if result is not None else None, error, job_id, page, owner),
+            )
+            remaining = None
+            if cur.rowcount:
+                running = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if running and running[0] == "running":
+                    remaining = conn.execute(
+                        "SELECT COUNT(*) FROM job_pages WHERE job_id = ? AND state IN ('pending', 'running')",
+                        (job_id,),
+                    ).fetchone()[0]
+            conn.commit()
+        return remaining
+
+    def release_page(self, job_id, page, owner, count_attempt=False):
+        """Hand a claimed page back to the queue; the attempt only counts if the page itself failed."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE job_pages SET state = 'pending', owner = NULL, attempts = MAX(0, attempts - ?)"
+                " WHERE job_id = ? AND page = ? AND owner = ? AND state = 'running'",
+                (0 if count_attempt else 1, job_id, page, owner),
+            )
+            conn.commit()
+
+    def release(self, owner):
+        """On shutdown: every page this owner still holds goes back to the queue."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE job_pages SET state = 'pending', owner = NULL, attempts = MAX(0, attempts - 1)"
+                " WHERE owner = ? AND state = 'running'",
+                (owner,),
+            )
+            conn.execute("DELETE FROM job_runners WHERE owner = ?", (owner,))
+            conn.commit()
+
+    def complete(self, job_id, summary):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET state = 'done', finished = ?, summary = ? WHERE job_id = ? AND state = 'running'",
+                (time.time(), json.dumps(summary), job_id),
+            )
+            conn.commit()
+
+    def fail(self, job_id, error):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', finished = ?, error = ? WHERE job_id = ? AND state IN ('queued', 'running')",
+                (time.time(), error, job_id),
+            )
+            conn.commit()
+
+    def heartbeat(self, owner):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO job_runners (owner, heartbeat) VALUES (?, ?)", (owner, now))
+            # Runners gone for a day hold nothing worth remembering
+            conn.execute("DELETE FROM job_runners WHERE heartbeat < ?", (now - 86400,))
+            conn.commit()
+
+    def purge(self):
+        """Drop finished jobs past their TTL, with their page results. Returns how many went."""
+        before = time.time() - self.ttl_seconds
+        with self._lock:
+            conn = self._connect()
+            expired = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE state IN ('done', 'cancelled', 'failed') AND finished < ?", (before,)
+            ).fetchall()]
+            conn.executemany("DELETE FROM job_pages WHERE job_id = ?", [(j,) for j in expired])
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+            conn.commit()
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            conn = self._connect()
+            jobs = conn.execute("SELECT priority, state, COUNT(*) FROM jobs GROUP BY priority, state").fetchall()
+            pages = conn.execute(
+                "SELECT j.priority, COUNT(*) FROM job_pages p JOIN jobs j ON j.job_id = p.job_id"
+                " WHERE j.state IN ('queued', 'running') AND p.state IN ('pending', 'running')"
+                " GROUP BY j.priority"
+            ).fetchall()
+        lanes = {lane: {"jobs": {}, "pages_remaining": 0} for lane in JOB_PRIORITIES}
+        for priority, state, n in jobs:
+            lanes.setdefault(priority, {"jobs": {}, "pages_remaining": 0})["jobs"][state] = n
+        for priority, n in pages:
+            lanes.setdefault(priority, {"jobs": {}, "pages_remaining": 0})["pages_remaining"] = n
+        return lanes
+
+
+class JobRunner:
+    """Claims job pages from the store and runs them on this process's worker pool."""
+
+    def __init__(self, store, pool):
+        self.store = store
+        self.pool = pool
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks = {}  # asyncio.Task -> lane
+        self._wake = asyncio.Event()
+        self._loop_task = None
+
+    def start(self):
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(self._loop_task, *self._tasks, return_exceptions=True)
+        # Unfinished pages are picked up again by the next runner, straight away
+        await asyncio.to_thread(self.store.release, self.owner)
+
+    def wake(self):
+        """New job or a page finished: look for work now instead of at the next poll."""
+        self._wake.set()
+
+    def stats(self):
+        running = {lane: 0 for lane in JOB_PRIORITIES}
+        for lane in self._tasks.values():
+            running[lane] += 1
+        return {"owner": self.owner, "pages_running": running}
+
+    async def _run(self):
+        last_beat = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_beat >= JOB_HEARTBEAT_SECONDS:
+                    await asyncio.to_thread(self.store.heartbeat, self.owner)
+                    purged = await asyncio.to_thread(self.store.purge)
+                    if purged:
+                        print(f"[JOBS] Purged {purged} expired jobs")
+                    last_beat = time.monotonic()
+                await self._fill()
+            except Exception as e:
+                # A locked or unreachable store must not stop the runner for good
+                print(f"[JOBS ERROR] {type(e).__name__}: {e}")
+            self._wake.clear()
+            waiters = [asyncio.ensure_future(self._wake.wait())]
+            await asyncio.wait(list(self._tasks) + waiters, timeout=JOB_POLL_SECONDS,
+                               return_when=asyncio.FIRST_COMPLETED)
+            waiters[0].cancel()
+
+    async def _fill(self):
+        stale_before = time.time() - JOB_HEARTBEAT_SECONDS * JOB_STALE_HEARTBEATS
+        started = 0
+        for lane in JOB_PRIORITIES:
+            running = sum(1 for l in self._tasks.values() if l == lane)
+            if lane == "interactive":
+                free = min(JOB_INTERACTIVE_CONCURRENCY - running, self.pool.free_slots - started)
+            else:
+                free = min(JOB_BULK_CONCURRENCY - running, self.pool.idle_workers - started)
+            if free <= 0:
+                continue
+            for claim in await asyncio.to_thread(self.store.claim, self.owner, lane, free, stale_before):
+                self._tasks[asyncio.create_task(self._run_page(lane, *claim))] = lane
+                started += 1
+
+    async def _run_page(self, lane, job_id, doc_id, page, triage, attempts):
+        try:
+            if attempts > JOB_PAGE_MAX_ATTEMPTS:
+                # Claimed again after taking its worker (or a whole runner) down each time
+                state, payload, error = "error", None, f"Gave up after {attempts - 1} attempts"
+            else:
+                state, payload, error = await self._process(doc_id, page, triage)
+        except PoolSaturated as e:
+            # Synchronous requests filled the pool meanwhile; give the page back and wait
+            await asyncio.to_thread(self.store.release_page, job_id, page, self.owner)
+            await asyncio.sleep(e.retry_after)
+            return
+        except BrokenProcessPool:
+            # The worker died on this page; it is retried up to JOB_PAGE_MAX_ATTEMPTS claims
+            await asyncio.to_thread(self.store.release_page, job_id, page, self.owner, True)
+            return
+        except DocumentNotFound:
+            await asyncio.to_thread(self.store.fail, job_id, "Document is no longer stored")
+            return
+        except Exception as e:
+            state, payload, error = "error", None, f"{type(e).__name__}: {e}"
+        finally:
+            self._tasks.pop(asyncio.current_task(), None)
+            self.wake()
+
+        job_pages_finished.inc(lane, state)
+        remaining = await asyncio.to_thread(self.store.finish_page, job_id, page, self.owner, state, payload, error)
+        if remaining == 0:
+            await self._complete(job_id)
+
+    async def _process(self, doc_id, page, triage_mode):
+        """(state, result payload, error) of one page; cached results and triage are used as in /extract-document."""
+        from app.core import pipeline, triage
+        if not document_store.has(doc_id):
+            raise DocumentNotFound(doc_id)
+        cached = await asyncio.to_thread(result_cache.get, doc_id, page, pipeline.PIPELINE_VERSION)
+        if cached is not None:
+            record_page_result(cached, cached=True)
+            return "done", cached, None
+
+        if triage_mode == "skip":
+            t = await asyncio.to_thread(result_cache.get, doc_id, page, triage.TRIAGE_VERSION)
+            if t is None:
+                t = await self.pool.run(triage.triage_page, doc_id, page)
+                record_trace(t.pop("trace"))
+                await asyncio.to_thread(result_cache.put, doc_id, page, triage.TRIAGE_VERSION, t)
+            if not t["likely"]:
+                return "skipped", {"page": page, "triage_score": t["score"]}, None
+
+        result = await self.pool.run(pipeline.extract_page, doc_id, page)
+        record_trace(result.pop("trace"))
+        record_page_result(result, cached=False)
+        await asyncio.to_thread(result_cache.put, doc_id, page, pipeline.PIPELINE_VERSION, result)
+        return "done", result, None
+
+    async def _complete(self, job_id):
+        from app.core import pipeline
+        pages = await asyncio.to_thread(self.store.page_results, job_id)
+        summary = pipeline.summarize_document([p["result"] for p in pages if p["state"] == "done"])
+        summary["pages_skipped"] = [p["page"] for p in pages if p["state"] == "skipped"]
+        summary["pages_failed"] = [p["page"] for p in pages if p["state"] == "error"]
+        await asyncio.to_thread(self.store.complete, job_id, summary)
+        print(f"[JOBS] Job {job_id[:12]}... done: {summary['pages_processed']} pages, "
+              f"{len(summary['engineers'])} engineers")
+
+
+job_store = JobStore(JOB_STORE_PATH, ttl_seconds=JOB_RESULT_TTL_HOURS * 3600)
+job_runner = JobRunner(job_store, worker_pool)
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 from PIL import Image
 
+from app.core.tracing import count
+
 LANDSCAPE_ASPECT_THRESHOLD = 1.3
 # 0.77 keeps us inside the title block column, away from the drawing area
 LANDSCAPE_SEARCH_X_START = 0.77
@@ -9,6 +11,20 @@ PORTRAIT_SEARCH_X_START = 0.55
 PORTRAIT_SEARCH_Y_START = 0.55
 
 BBOX_MARGIN = 40
+# Seal radius range and minimum centre distance, in pixels at the detection DPI (150)
+MIN_STAMP_RADIUS = 80  # Stamps are typically 160-600px diameter
+MAX_STAMP_RADIUS = 300
+MIN_STAMP_DISTANCE = 200  # Stamps should be at least 200px apart
+
+
+def title_block_window(page_width, page_height):
+    """(x, y, w, h) of the area searched for stamps: the right-hand title block column."""
+    aspect = page_width / page_height
+    if aspect > LANDSCAPE_ASPECT_THRESHOLD:
+        sx, sy = int(page_width * LANDSCAPE_SEARCH_X_START), 0
+    else:
+        sx, sy = int(page_width * PORTRAIT_SEARCH_X_START), int(page_height * PORTRAIT_SEARCH_Y_START)
+    return sx, sy, int(page_width) - sx, int(page_height) - sy
 
 
 def detect_stamp_region(page_image: Image.Image):
@@ -18,49 +34,96 @@ def detect_stamp_region(page_image: Image.Image):
     Falls back to contour detection if no circles found.
     """
     img_w, img_h = page_image.size
-    aspect = img_w / img_h
-
-    if aspect > LANDSCAPE_ASPECT_THRESHOLD:
-        sx, sy = int(img_w * LANDSCAPE_SEARCH_X_START), 0
-    else:
-        sx, sy = int(img_w * PORTRAIT_SEARCH_X_START), int(img_h * PORTRAIT_SEARCH_Y_START)
+    sx, sy, _, _ = title_block_window(img_w, img_h)
 
     search_crop = page_image.crop((sx, sy, img_w, img_h))
     gray = np.array(search_crop.convert("L"))
-    rw, rh = search_crop.size
+    return detect_stamp_region_in_window(gray, (sx, sy), (img_w, img_h))
+
+
+def detect_stamp_region_in_window(gray: np.ndarray, origin, page_size):
+    """
+    Same as detect_stamp_region, but takes only the grayscale title-block window
+    (as rendered by pdf_handler.render_region_gray) plus its top-left corner and
+    the full page size, so the rest of the page never has to be rendered.
+    """
+    return detect_stamp_seals_in_window(gray, origin, page_size)[0]
+
+
+def detect_stamp_seals_in_window(gray: np.ndarray, origin, page_size):
+    """
+    detect_stamp_region_in_window plus the circles behind the regions:
+    returns (bboxes, circles) with circles [(cx, cy, r)] in page pixels,
+    empty when the regions come from the heuristic fallback.
+    """
+    sx, sy = origin
+    img_w, img_h = page_size
 
     # First try: Detect circular stamps using HoughCircles
+    circles = find_seal_circles(gray)
+
+    # If circles found, use them
+    if circles:
+        result = []
+        found = []
+        for cx, cy, radius in circles:  # Up to 4 stamps
+            result.append(_circle_bbox(sx + cx, sy + cy, radius, img_w, img_h))
+            found.append((sx + cx, sy + cy, radius))
+        return result, found
+
+    # No circles found - use heuristic fallback
+    count("detection_fallback")
+    return [_heuristic_fallback(img_w, img_h)], []
+
+
+def find_seal_circles(gray: np.ndarray, scale=1.0, limit=4):
+    """
+    Up to `limit` seal-sized circles (cx, cy, r) found by HoughCircles in a grayscale
+    image rendered at scale x the detection DPI, in that image's pixels.
+    """
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
     circles = cv2.HoughCircles(
         blurred,
         cv2.HOUGH_GRADIENT,
         dp=1,
-        minDist=200,  # Stamps should be at least 200px apart
+        minDist=max(1, int(MIN_STAMP_DISTANCE * scale)),
         param1=50,
         param2=30,
-        minRadius=80,  # Stamps are typically 160-600px diameter
-        maxRadius=300
+        minRadius=max(1, int(MIN_STAMP_RADIUS * scale)),
+        maxRadius=int(MAX_STAMP_RADIUS * scale)
     )
+    if circles is None:
+        return []
+    circles = np.uint16(np.around(circles))
+    return [tuple(int(v) for v in circle) for circle in circles[0, :limit]]
 
-    # If circles found, use them
-    if circles is not None:
-        circles = np.uint16(np.around(circles))
-        result = []
-        for circle in circles[0, :]:
-            cx, cy, radius = circle
-            # Convert circle to bounding box
-            bx = max(0, sx + cx - radius - BBOX_MARGIN)
-            by = max(0, sy + cy - radius - BBOX_MARGIN)
-            size = (radius + BBOX_MARGIN) * 2
-            bw = min(size, img_w - bx)
-            bh = min(size, img_h - by)
-            result.append((bx, by, bw, bh))
-
-        if result:
-            return result[:4]  # Return up to 4 stamps
 
-    # No circles found - use heuristic fallback
-    return [_heuristic_fallback(img_w, img_h)]
+def _circle_bbox(cx, cy, radius, img_w, img_h):
+    """Page-pixel bounding box around a circle plus BBOX_MARGIN, clamped to the page."""
+    bx = max(0, cx - radius - BBOX_MARGIN)
+    by = max(0, cy - radius - BBOX_MARGIN)
+    size = (radius + BBOX_MARGIN) * 2
+    return bx, by, min(size, img_w - bx), min(size, img_h - by)
+
+
+def detect_stamp_region_from_circles(circles, page_size):
+    """
+    Stamp bboxes, in the same form as detect_stamp_region, from circles already known
+    in page pixels (e.g. pdf_handler.get_vector_circles). Only circles centred in the
+    title-block window count; of concentric rings (outer and inner seal border) the
+    largest is kept. Returns [] rather than a heuristic region when none qualify.
+    """
+    img_w, img_h = page_size
+    sx, sy, ww, wh = title_block_window(img_w, img_h)
+    kept = []
+    for cx, cy, r in sorted(circles, key=lambda c: -c[2]):
+        if not (sx <= cx < sx + ww and sy <= cy < sy + wh):
+            continue
+        if any((cx - kx) ** 2 + (cy - ky) ** 2 < MIN_STAMP_DISTANCE ** 2 for kx, ky, _ in kept):
+            continue
+        kept.append((cx, cy, r))
+    kept.sort(key=lambda c: (c[1], c[0]))
+    return [_circle_bbox(int(cx), int(cy), int(r), img_w, img_h) for cx, cy, r in kept[:4]]
 
 
 def _heuristic_fallback(page_width: int, page_height: int):
@@ -69,3 +132,10 @@ def _heuristic_fallback(page_width: int, page_height: int):
         return int(page_width * 0.77), int(page_height * 0.05), int(page_width * 0.22), int(page_height * 0.60)
     else:
         return int(page_width * 0.58), int(page_height * 0.65), int(page_width * 0.37), int(page_height * 0.30)
+
+
+def circle_in_region(region, circles):
+    """The largest of circles (cx, cy, r) centred inside region (x, y, w, h), or None."""
+    x, y, w, h = region
+    inside = [c for c in circles if x <= c[0] < x + w and y <= c[1] < y + h]
+    return max(inside, key=lambda c: c[2]) if inside else None
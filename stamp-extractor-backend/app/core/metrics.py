@@ -0,0 +1,126 @@
+"""
+Prometheus metrics for the API process, rendered in the text exposition format
+at /metrics. Stage timings arrive as traces returned by the workers, so this
+registry only lives in the main process (one per uvicorn worker).
+"""
+import threading
+
+# Seconds; stages range from sub-millisecond lookups to a minute of OCR
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labelnames, values):
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, n=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, n in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_str(names, labels + (bound,))} {n}")
+                lines.append(f"{self.name}_bucket{_label_str(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "stamp_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+stage_duration = Histogram(
+    "stamp_stage_duration_seconds", "Duration of pipeline stages (spans)", ("stage",))
+stamps_found = Counter(
+    "stamp_stamps_found_total", "Stamps returned, by the path that found them", ("source",))
+pipeline_events = Counter(
+    "stamp_pipeline_events_total", "Pipeline fallbacks and shortcuts (heuristic region, DPI escalation, ...)", ("event",))
+result_cache_lookups = Counter(
+    "stamp_result_cache_lookups_total", "Result cache lookups", ("result",))
+startup_phase_duration = Histogram(
+    "stamp_startup_phase_duration_seconds", "Duration of startup warm-up phases", ("phase",))
+job_pages_finished = Counter(
+    "stamp_job_pages_finished_total", "Job pages finished, by lane and outcome", ("priority", "state"))
+
+REGISTRY = [
+    http_request_duration, stage_duration, stamps_found, pipeline_events, result_cache_lookups,
+    startup_phase_duration, job_pages_finished,
+]
+
+
+def record_trace(trace):
+    """Feed a finished trace dict (spans + counters) into the stage histogram and event counter."""
+    if not trace:
+        return
+    for s in trace["spans"]:
+        stage_duration.observe(s["duration_ms"] / 1000, s["name"])
+    for event, n in trace["counters"].items():
+        pipeline_events.inc(event, n=n)
+
+
+def record_page_result(result, cached):
+    result_cache_lookups.inc("hit" if cached else "miss")
+    for stamp in result["stamps"]:
+        stamps_found.inc(stamp["source"])
+
+
+def _gauge(name, help_text, value):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+
+def render_metrics(pool_stats):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines += _gauge("stamp_worker_pool_workers", "Worker processes in the pool", pool_stats["workers"])
+    lines += _gauge("stamp_worker_pool_running", "Jobs currently running in the pool", pool_stats["running"])
+    lines += _gauge("stamp_worker_pool_queued", "Jobs waiting for a worker", pool_stats["queued"])
+    lines += [
+        "# HELP stamp_worker_pool_rejected_total Requests rejected with 503 because the pool was full",
+        "# TYPE stamp_worker_pool_rejected_total counter",
+        f"stamp_worker_pool_rejected_total {pool_stats['rejected']}",
+    ]
+    return "\n".join(lines) + "\n"
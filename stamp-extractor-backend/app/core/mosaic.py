@@ -0,0 +1,64 @@
+"""
+Mosaic batching for OCR: several grayscale crops are stacked into one padded
+image so the engine runs once, then the words are split back per crop.
+
+Tiles are stacked vertically with white gutters. Tesseract never joins words
+across a gutter into one line, and every word is assigned back to the tile
+holding its centre, in that tile's own coordinates, so each crop's result
+matches what OCR of the crop alone would give.
+"""
+import numpy as np
+
+MOSAIC_PADDING = 64  # white gutter between (and around) tiles, in pixels
+# Leptonica/Tesseract handle images up to 32k pixels a side; split into several mosaics past this
+MOSAIC_MAX_HEIGHT = 30000
+
+
+def plan_mosaics(shapes, padding=MOSAIC_PADDING, max_height=MOSAIC_MAX_HEIGHT):
+    """Group crop indices so each group's stacked height stays under max_height."""
+    groups, current, height = [], [], padding
+    for i, (h, _) in enumerate(shapes):
+        tile = h + padding
+        if current and height + tile > max_height:
+            groups.append(current)
+            current, height = [], padding
+        current.append(i)
+        height += tile
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_mosaic(crops, padding=MOSAIC_PADDING):
+    """
+    Stack uint8 grayscale crops top to bottom on a white canvas.
+    Returns (mosaic, placements) with placements[i] = (x, y, w, h) of crop i.
+    """
+    width = max(c.shape[1] for c in crops) + 2 * padding
+    height = sum(c.shape[0] for c in crops) + padding * (len(crops) + 1)
+    mosaic = np.full((height, width), 255, dtype=np.uint8)
+
+    placements = []
+    y = padding
+    for crop in crops:
+        h, w = crop.shape[:2]
+        mosaic[y:y + h, padding:padding + w] = crop
+        placements.append((padding, y, w, h))
+        y += h + padding
+    return mosaic, placements
+
+
+def split_words(words, placements):
+    """Assign each word to the tile containing its centre, in tile-local coordinates."""
+    per_tile = [[] for _ in placements]
+    tops = np.array([p[1] for p in placements])
+    for w in words:
+        cy = w["top"] + w["height"] / 2
+        i = int(np.searchsorted(tops, cy, side="right")) - 1
+        if i < 0:
+            continue
+        x, y, tw, th = placements[i]
+        if cy > y + th:
+            continue  # in a gutter: noise, not part of any crop
+        per_tile[i].append({**w, "left": w["left"] - x, "top": w["top"] - y})
+    return per_tile
@@ -0,0 +1,148 @@
+"""
+OCR backends. Both return the same word list from a single recognition pass:
+[{"text", "left", "top", "width", "height", "conf", "block_num", "par_num", "line_num"}, ...]
+
+- tesserocr: libtesseract loaded in-process; the LSTM model stays resident for the
+  life of the worker, and images are handed over without a temp file.
+- pytesseract: forks the tesseract CLI per call. Kept as a fallback and for benchmarks.
+"""
+import itertools
+import operator
+import os
+import threading
+
+import numpy as np
+import pytesseract
+
+# auto = tesserocr when it is installed, otherwise pytesseract
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "auto")
+OCR_LANG = "eng"
+# PSM 11 = sparse text, find as much text as possible (best for stamps with circular/rotated text)
+# OEM 1 = LSTM neural net mode (better accuracy for varied fonts)
+OCR_PSM = 11
+OCR_OEM = 1
+
+TSV_COLUMNS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+]
+# Numeric fields of a word, as columns for array-wise line grouping
+WORD_COLUMNS = ("left", "top", "width", "height", "conf", "block_num", "par_num", "line_num")
+_word_numbers = operator.itemgetter(*WORD_COLUMNS)
+
+
+def parse_tsv(tsv, has_header=True):
+    """Parse Tesseract TSV output into word dicts, skipping empty (non-word) rows."""
+    rows = tsv.split('\n')
+    if has_header:
+        if not rows:
+            return []
+        header = rows[0].split('\t')
+        rows = rows[1:]
+    else:
+        header = TSV_COLUMNS
+    try:
+        idx = {name: header.index(name) for name in TSV_COLUMNS}
+    except ValueError:
+        return []
+
+    words = []
+    for row in rows:
+        cols = row.split('\t')
+        if len(cols) <= idx["text"]:
+            continue
+        text = cols[idx["text"]].strip()
+        if not text:
+            continue
+        words.append({
+            "text": text,
+            "left": int(cols[idx["left"]]),
+            "top": int(cols[idx["top"]]),
+            "width": int(cols[idx["width"]]),
+            "height": int(cols[idx["height"]]),
+            "conf": float(cols[idx["conf"]]),
+            "block_num": int(cols[idx["block_num"]]),
+            "par_num": int(cols[idx["par_num"]]),
+            "line_num": int(cols[idx["line_num"]]),
+        })
+    return words
+
+
+def words_to_columns(words):
+    """
+    A word list as columns: {"text": [str]} plus one array per WORD_COLUMNS (conf
+    float64, the rest int64), so lines can be grouped and measured array-wise.
+    """
+    numbers = itertools.chain.from_iterable(map(_word_numbers, words))
+    table = np.fromiter(numbers, dtype=np.float64, count=len(words) * len(WORD_COLUMNS))
+    table = table.reshape(-1, len(WORD_COLUMNS))
+    columns = {"text": [w["text"] for w in words]}
+    for k, name in enumerate(WORD_COLUMNS):
+        columns[name] = table[:, k] if name == "conf" else table[:, k].astype(np.int64)
+    return columns
+
+
+def words_to_text(words):
+    """Rebuild plain text (one line per Tesseract line) from a word list."""
+    lines = {}
+    for w in words:
+        lines.setdefault((w["block_num"], w["par_num"], w["line_num"]), []).append(w["text"])
+    return '\n'.join(" ".join(lines[key]) for key in sorted(lines))
+
+
+class PytesseractBackend:
+    name = "pytesseract"
+    launches_process = True
+
+    def recognize(self, image, psm=OCR_PSM):
+        tsv = pytesseract.image_to_data(image, config=f'--oem {OCR_OEM} --psm {psm}', lang=OCR_LANG)
+        return parse_tsv(tsv, has_header=True)
+
+
+class TesserocrBackend:
+    name = "tesserocr"
+    launches_process = False
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=OCR_LANG, psm=OCR_PSM, oem=OCR_OEM)
+
+    def recognize(self, image, psm=OCR_PSM):
+        from PIL import Image
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        self._api.SetPageSegMode(psm)
+        self._api.SetImage(image)
+        self._api.Recognize()
+        words = parse_tsv(self._api.GetTSVText(0), has_header=False)
+        self._api.Clear()
+        return words
+
+    def close(self):
+        self._api.End()
+
+
+# One engine per thread: a tesserocr API must not be used from two threads at once
+_local = threading.local()
+
+
+def create_ocr_engine(backend=OCR_BACKEND):
+    if backend == "pytesseract":
+        return PytesseractBackend()
+    if backend == "tesserocr":
+        return TesserocrBackend()
+    try:
+        return TesserocrBackend()
+    except (ImportError, RuntimeError) as e:
+        print(f"[OCR] tesserocr unavailable ({type(e).__name__}: {e}), using pytesseract")
+        return PytesseractBackend()
+
+
+def get_ocr_engine():
+    """Per-thread engine, created on first use and kept for the life of the thread."""
+    engine = getattr(_local, "engine", None)
+    if engine is None:
+        engine = _local.engine = create_ocr_engine()
+        print(f"[OCR] Using {engine.name} backend ({threading.current_thread().name})")
+    return engine
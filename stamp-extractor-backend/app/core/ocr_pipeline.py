@@ -1,14 +1,38 @@
+"""
+Seal-shaped preprocessing for OCR. A seal's ring text follows the circle, which
+only Tesseract's slow sparse mode (PSM 11) picks up, and badly. Given the seal's
+circle, the ring band is polar-unwrapped into straight strips that read in
+single-line mode, and the centre (name, discipline, license) is cut out as a
+plain block with the ring whited out.
+"""
+import os
+
 import cv2
 import numpy as np
-import pytesseract
-from PIL import Image
+from app.core.ocr_engine import get_ocr_engine, words_to_text
+
+# Read seals with a known circle centre-block-first, then from the unwrapped ring,
+# before falling back to sparse OCR of the whole crop
+SEAL_UNWRAP = os.environ.get("SEAL_UNWRAP", "1") == "1"
+
+# Fractions of the detected (outer) radius: ring text sits between the outer
+# border and the inner circle, the centre block inside the inner circle
+RING_INNER = 0.70
+RING_OUTER = 0.98
+CENTER_RADIUS = 0.70
+# Unwrapped strips are upscaled to at least this height before OCR
+RING_STRIP_MIN_HEIGHT = 64
+
+CENTER_PSM = 6  # a single uniform block of text
+RING_PSM = 7  # a single text line
 
-def preprocess_for_ocr(image: Image.Image):
+
+def preprocess_for_ocr(image, min_size=800):
     """
     Returns (processed_image_ndarray, scale_factor)
     Minimal preprocessing - upscale only, let Tesseract handle the rest.
     """
-    img = np.array(image)
+    img = np.asarray(image)
 
     # Grayscale
     if len(img.shape) == 3:
@@ -16,12 +40,12 @@ def preprocess_for_ocr(image: Image.Image):
     else:
         gray = img
 
-    # Upscale: make sure shorter dimension >= 800 px for better OCR accuracy
+    # Upscale: make sure shorter dimension >= min_size px for better OCR accuracy
     h, w = gray.shape
     min_dim = min(h, w)
     scale = 1.0
-    if min_dim < 800:
-        scale = 800 / min_dim
+    if min_dim < min_size:
+        scale = min_size / min_dim
         new_w = int(w * scale)
         new_h = int(h * scale)
         gray = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
@@ -34,9 +58,52 @@ def preprocess_for_ocr(image: Image.Image):
 
     return sharpened, scale
 
+
+def unwrap_ring(gray, center, radius, inner=RING_INNER, outer=RING_OUTER):
+    """
+    The seal's ring band as two straight strips, [upper arc, lower arc], each
+    turned so its text runs left to right, upright: upper-arc lettering has its
+    tops outward, lower-arc lettering its tops inward.
+    """
+    r = float(radius)
+    # Rows step through the angle (clockwise on screen, from +x), columns through the radius;
+    # the angular resolution matches the circumference at the text line so glyphs keep their width
+    text_r = r * (inner + outer) / 2
+    angular = max(360, int(2 * np.pi * text_r))
+    polar = cv2.warpPolar(
+        np.ascontiguousarray(gray), (int(r), angular), tuple(float(v) for v in center), r,
+        cv2.WARP_POLAR_LINEAR | cv2.INTER_LINEAR | cv2.WARP_FILL_OUTLIERS,
+    )
+    band = polar[:, int(r * inner):int(r * outer)]
+    half = angular // 2
+    # 180°..360° runs over the top from left to right; radius grows downward, so flip to put tops up
+    upper = band[half:].T[::-1, :]
+    # 0°..180° runs under the bottom from right to left; reverse it, tops (inward) are already up
+    lower = band[:half].T[:, ::-1]
+    return [np.ascontiguousarray(upper), np.ascontiguousarray(lower)]
+
+
+def center_block(gray, center, radius, ratio=CENTER_RADIUS):
+    """Square crop around the seal centre with everything outside the inner disc whited out."""
+    cx, cy = (int(round(v)) for v in center)
+    half = int(radius * ratio)
+    h, w = gray.shape[:2]
+    x0, y0 = max(0, cx - half), max(0, cy - half)
+    x1, y1 = min(w, cx + half), min(h, cy + half)
+    block = np.array(gray[y0:y1, x0:x1], dtype=np.uint8)
+    if block.size == 0:
+        return block
+    mask = np.zeros(block.shape, dtype=np.uint8)
+    cv2.circle(mask, (cx - x0, cy - y0), half, 255, -1)
+    block[mask == 0] = 255
+    return block
+
+
+def ring_strips_for_ocr(gray, center, radius):
+    """unwrap_ring, upscaled and sharpened for OCR."""
+    return [preprocess_for_ocr(strip, RING_STRIP_MIN_HEIGHT)[0] for strip in unwrap_ring(gray, center, radius)]
+
+
 def run_ocr(image: np.ndarray) -> str:
     # PSM 11 = sparse text, find as much text as possible (best for stamps)
-    # OEM 1 = LSTM neural net mode (better accuracy for varied fonts/rotation)
-    config = r'--oem 1 --psm 11'
-    text = pytesseract.image_to_string(image, config=config, lang='eng')
-    return text
+    return words_to_text(get_ocr_engine().recognize(image, psm=11))
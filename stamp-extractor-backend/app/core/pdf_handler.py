@@ -1,10 +1,26 @@
+import ctypes
+import math
+import os
 import re
+from collections import OrderedDict
+
 import fitz
+import numpy as np
 from PIL import Image
 
+from app.core.spatial_index import GridIndex
+from app.core.tracing import count
+from app.core.vocabulary import VOCABULARY
+
+NON_NAME_CHARS = re.compile(r'[^A-Z\s\.]')
+OF_WORD = re.compile(r'\bOF\b')
+
 def open_pdf(file_bytes):
     return fitz.open(stream=file_bytes, filetype="pdf")
 
+def open_pdf_file(path):
+    return fitz.open(path, filetype="pdf")
+
 def get_page_dimensions(doc, page_number):
     page = doc[page_number]
     rect = page.rect
@@ -15,85 +31,325 @@ def render_page_to_image(doc, page_number, dpi=300):
     pix = page.get_pixmap(dpi=dpi)
     return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
 
+def pixmap_to_array(pix):
+    """
+    View a Pixmap's samples as a uint8 array, (h, w) for gray or (h, w, n), without
+    copying. The array's buffer holds a reference to the pixmap, keeping it alive.
+    """
+    buf = (ctypes.c_ubyte * (pix.stride * pix.height)).from_address(pix.samples_ptr)
+    buf._pixmap = pix
+    arr = np.ndarray((pix.height, pix.width, pix.n), dtype=np.uint8, buffer=buf,
+                     strides=(pix.stride, pix.n, 1))
+    return arr[:, :, 0] if pix.n == 1 else arr
+
+def render_region_gray(doc, page_number, dpi, bbox):
+    """
+    Render only bbox (x, y, w, h in screen pixels at dpi) of a page, directly in
+    grayscale, and return it as a zero-copy uint8 array.
+    """
+    x, y, w, h = bbox
+    scale = dpi / 72.0
+    clip = fitz.Rect(x / scale, y / scale, (x + w) / scale, (y + h) / scale)
+    pix = doc[page_number].get_pixmap(
+        matrix=fitz.Matrix(scale, scale), clip=clip, colorspace=fitz.csGRAY, alpha=False
+    )
+    return pixmap_to_array(pix)
+
+def get_page_pixel_size(doc, page_number, dpi):
+    """Size of the rendered page in pixels (rotation applied)."""
+    rect = doc[page_number].rect
+    return int(rect.width * dpi / 72.0), int(rect.height * dpi / 72.0)
+
+# Vector seal outlines: a path is a circle (or a long arc of one) when its outline
+# points sit within this RMS distance of the fitted circle, relative to the radius,
+CIRCLE_FIT_TOLERANCE = 0.03
+# and they cover at least this much of it
+CIRCLE_MIN_COVERAGE_DEG = 270
+CIRCLE_MIN_POINTS = 8
+
+
+def _outline_points(items):
+    """Points on a path's outline (segment ends, plus each Bezier curve's midpoint), or None."""
+    points = []
+    for item in items:
+        kind = item[0]
+        if kind == "c":
+            (x1, y1), (x2, y2), (x3, y3), (x4, y4) = item[1:5]
+            points += [(x1, y1), ((x1 + 3 * x2 + 3 * x3 + x4) / 8, (y1 + 3 * y2 + 3 * y3 + y4) / 8), (x4, y4)]
+        elif kind == "l":
+            points += [item[1], item[2]]
+        else:
+            return None  # rectangles and quads are never part of a seal ring
+    return points
+
+
+def _fit_circle(points):
+    """Least-squares circle through points: (cx, cy, r, coverage_deg), or None if they are not on one."""
+    pts = np.asarray(points, dtype=np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+    a = np.column_stack([x, y, np.ones_like(x)])
+    (d, e, f), *_ = np.linalg.lstsq(a, -(x * x + y * y), rcond=None)
+    cx, cy = -d / 2, -e / 2
+    r_sq = cx * cx + cy * cy - f
+    if r_sq <= 0:
+        return None
+    r = np.sqrt(r_sq)
+    dist = np.hypot(x - cx, y - cy)
+    if np.sqrt(np.mean((dist - r) ** 2)) > CIRCLE_FIT_TOLERANCE * r:
+        return None
+    angles = np.sort(np.degrees(np.arctan2(y - cy, x - cx)))
+    gaps = np.diff(np.concatenate([angles, angles[:1] + 360]))
+    return cx, cy, r, 360 - gaps.max()
+
+
+def get_vector_circles(doc, page_number, dpi, min_radius, max_radius):
+    """
+    Circles (and near-full arcs) drawn as vector paths, e.g. CAD-drawn seal rings,
+    as (cx, cy, r) in screen pixels at dpi with min_radius <= r <= max_radius.
+    No rendering involved.
+    """
+    page = doc[page_number]
+    scale = dpi / 72.0
+    m = page.rotation_matrix
+    circles = []
+    for path in page.get_cdrawings():
+        x0, y0, x1, y1 = path["rect"]
+        # Cheap reject on the bounding box before fitting
+        extent = max(x1 - x0, y1 - y0) * scale
+        if extent < min_radius or extent > 2.2 * max_radius:
+            continue
+        points = _outline_points(path["items"])
+        if not points or len(points) < CIRCLE_MIN_POINTS:
+            continue
+        fit = _fit_circle(points)
+        if fit is None or fit[3] < CIRCLE_MIN_COVERAGE_DEG:
+            continue
+        cx, cy, r, _ = fit
+        r *= scale
+        if not min_radius <= r <= max_radius:
+            continue
+        centre = fitz.Point(cx, cy) * m
+        circles.append((centre.x * scale, centre.y * scale, float(r)))
+    return circles
+
+# Decoded embedded images, keyed by (document, xref): a seal pasted into every
+# sheet of a set is usually one XObject, so it is decoded once per worker
+IMAGE_CACHE_MAX_MB = int(os.environ.get("IMAGE_CACHE_MAX_MB", "128"))
+
+_image_cache = OrderedDict()  # (doc name, xref) -> uint8 grayscale array, native orientation
+_image_cache_bytes = 0
+
+
+def get_image_placements(doc, page_number, dpi=150):
+    """
+    Images placed on the page, as dicts:
+      xref    image XObject (0 for inline images, which cannot be decoded on their own)
+      bbox    screen-space (x, y, w, h) at dpi, rotation applied
+      size    native (width, height) in pixels
+      dpi     native resolution as placed on the page
+      matrix  maps the image's unit square (0, 0 = top-left pixel) to screen pixels at dpi
+    """
+    page = doc[page_number]
+    scale = dpi / 72.0
+    to_screen = page.rotation_matrix * fitz.Matrix(scale, scale)
+    placements = []
+    for info in page.get_image_info(xrefs=True):
+        m = fitz.Matrix(info["transform"]) * to_screen
+        r = fitz.Rect(info["bbox"]) * page.rotation_matrix
+        placed_width_in = math.hypot(m.a, m.b) / dpi
+        placements.append({
+            "xref": info["xref"],
+            "bbox": (int(r.x0 * scale), int(r.y0 * scale), int(r.width * scale), int(r.height * scale)),
+            "size": (info["width"], info["height"]),
+            "dpi": info["width"] / placed_width_in if placed_width_in else 0,
+            "matrix": tuple(m),
+        })
+    return placements
+
+
+def get_image_bboxes(doc, page_number, dpi=150):
+    """Screen-space (x, y, w, h) of every image placed on the page, at the given DPI."""
+    return [p["bbox"] for p in get_image_placements(doc, page_number, dpi)]
+
+
+def _decode_image_gray(doc, xref):
+    """Native pixels of an image XObject as a grayscale array, cached by (document, xref)."""
+    global _image_cache_bytes
+    key = (doc.name, xref) if doc.name else None
+    if key is not None and key in _image_cache:
+        _image_cache.move_to_end(key)
+        count("image_decode_cache_hit")
+        return _image_cache[key]
+
+    count("image_decode_cache_miss")
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    arr = pixmap_to_array(pix)
+
+    # An image bigger than the whole budget is used once and dropped, never cached
+    if key is not None and arr.nbytes <= IMAGE_CACHE_MAX_MB * 1024 * 1024:
+        _image_cache[key] = arr
+        _image_cache_bytes += arr.nbytes
+        while _image_cache_bytes > IMAGE_CACHE_MAX_MB * 1024 * 1024:
+            _, old = _image_cache.popitem(last=False)
+            _image_cache_bytes -= old.nbytes
+    return arr
+
+
+def _upright(arr, matrix):
+    """Turn native image pixels the way they are displayed on the page (any multiple of 90 degrees or mirror)."""
+    a, b, c, d = matrix[:4]
+    ux, uy, vx, vy = a, b, c, d  # screen direction of the image's x axis (u) and y axis (v)
+    if abs(uy) > abs(ux):
+        arr = arr.T
+        ux, uy, vx, vy = vx, vy, ux, uy
+    if ux < 0:
+        arr = arr[:, ::-1]
+    if vy < 0:
+        arr = arr[::-1, :]
+    return np.ascontiguousarray(arr)
+
+
+def get_placed_image_gray(doc, placement, roi=None, max_dpi=None, max_pixels=None):
+    """
+    Native pixels of a placed image, without rendering the page: grayscale, turned
+    upright as displayed, optionally cropped to roi (screen x, y, w, h at the dpi the
+    placement was made for) and downsampled to max_dpi. Returns (array, dpi) or
+    (None, 0) if the image cannot be decoded on its own, or if it has more than
+    max_pixels native pixels: the whole image is decoded before any crop.
+    """
+    if not placement["xref"]:
+        return None, 0
+    width, height = placement["size"]
+    if max_pixels and width * height > max_pixels:
+        count("image_decode_oversized")
+        return None, 0
+    try:
+        arr = _decode_image_gray(doc, placement["xref"])
+    except (RuntimeError, ValueError):
+        return None, 0
+
+    if roi is not None:
+        # Screen roi -> the image's unit square -> pixel rows/columns
+        inv = ~fitz.Matrix(placement["matrix"])
+        x, y, w, h = roi
+        corners = [fitz.Point(px, py) * inv for px, py in ((x, y), (x + w, y), (x, y + h), (x + w, y + h))]
+        height, width = arr.shape
+        col0 = max(0, int(min(p.x for p in corners) * width))
+        col1 = min(width, math.ceil(max(p.x for p in corners) * width))
+        row0 = max(0, int(min(p.y for p in corners) * height))
+        row1 = min(height, math.ceil(max(p.y for p in corners) * height))
+        if col1 <= col0 or row1 <= row0:
+            return None, 0
+        arr = arr[row0:row1, col0:col1]
+
+    dpi = placement["dpi"]
+    if max_dpi and dpi > max_dpi:
+        f = max_dpi / dpi
+        img = Image.fromarray(np.ascontiguousarray(arr))
+        arr = np.asarray(img.resize((max(1, int(img.width * f)), max(1, int(img.height * f))), Image.Resampling.BOX))
+        dpi = max_dpi
+    return _upright(arr, placement["matrix"]), dpi
+
 def crop_bbox(image, bbox):
     x, y, w, h = bbox
     return image.crop((x, y, x + w, y + h))
 
-def get_stamp_bboxes_from_pdf(doc, page_number, dpi=150):
+NAME_SEARCH_RADIUS = 200  # screen px around a license number searched for name words
+PAGE_WORDS_CACHE_SIZE = 64
+
+_page_words_cache = OrderedDict()  # (doc name, page, dpi) -> (texts, name_texts, GridIndex)
+
+
+def _name_text(text):
+    """Uppercased word if it could be part of an engineer name, else None."""
+    txt = NON_NAME_CHARS.sub('', text.upper()).strip()
+    if not txt or len(txt) < 2:
+        return None
+    if txt in VOCABULARY.text_layer_name_blacklist or txt.isdigit():
+        return None
+    if OF_WORD.search(txt):
+        return None
+    return txt
+
+
+def get_page_words(doc, page_number, dpi=150):
     """
-    Use the PDF text layer to find stamp positions and engineer names.
-    Returns list of dicts: {bbox: (x,y,w,h), license: str, name: str|None}
-    Falls back to image-based detection if no licenses found.
+    Text-layer words of a page in screen space, plus a spatial index over their centres.
+    Returns (texts, name_texts, GridIndex). Cached per (document, page, dpi) for
+    documents opened from a file, whose name is the content-addressed path.
     """
+    key = (doc.name, page_number, dpi) if doc.name else None
+    if key is not None and key in _page_words_cache:
+        _page_words_cache.move_to_end(key)
+        return _page_words_cache[key]
+
     page = doc[page_number]
     scale = dpi / 72.0
-    rotation = page.rotation
-    mb = page.mediabox
-
-    def to_screen(x_nat, y_nat):
-        if rotation == 270:
-            return y_nat * scale, (mb.width - x_nat) * scale
-        elif rotation == 90:
-            return (mb.height - y_nat) * scale, x_nat * scale
-        elif rotation == 180:
-            return (mb.width - x_nat) * scale, (mb.height - y_nat) * scale
-        else:
-            return x_nat * scale, y_nat * scale
-
     words = page.get_text("words")
-    license_pattern = re.compile(r'^\d{5}$')
-    skip_licenses = {'01085', '01086'}  # Skip town permit numbers, not engineer stamps
+    texts = [w[4].strip() for w in words]
+    name_texts = [_name_text(t) for t in texts]
+
+    # Word centres in unrotated page space, mapped to rotated screen space
+    if words:
+        coords = np.array([w[:4] for w in words], dtype=np.float64)
+        mx = (coords[:, 0] + coords[:, 2]) / 2
+        my = (coords[:, 1] + coords[:, 3]) / 2
+    else:
+        mx = my = np.empty(0)
+    m = page.rotation_matrix
+    sx = (mx * m.a + my * m.c + m.e) * scale
+    sy = (mx * m.b + my * m.d + m.f) * scale
 
-    # Build a list of all words with screen coordinates
-    word_list = []
-    for w in words:
-        sx, sy = to_screen((w[0] + w[2]) / 2, (w[1] + w[3]) / 2)
-        word_list.append({"text": w[4].strip(), "sx": sx, "sy": sy})
+    entry = (texts, name_texts, GridIndex(sx, sy, cell_size=NAME_SEARCH_RADIUS))
+    if key is not None:
+        _page_words_cache[key] = entry
+        while len(_page_words_cache) > PAGE_WORDS_CACHE_SIZE:
+            _page_words_cache.popitem(last=False)
+    return entry
 
-    name_blacklist = {
-        'CIVIL', 'ENGINEER', 'PROFESSIONAL', 'REGISTERED', 'LICENSE',
-        'STRUCTURAL', 'ENVIRONMENTAL', 'COMMONWEALTH', 'MASSACHUSETTS',
-        'NO.', 'NO', 'PE', 'OF', 'THE', 'AND', 'FOR',
-    }
+
+def get_stamp_bboxes_from_pdf(doc, page_number, dpi=150):
+    """
+    Use the PDF text layer to find stamp positions and engineer names.
+    Returns list of dicts: {bbox: (x,y,w,h), license: str, name: str|None}
+    Falls back to image-based detection if no licenses found.
+    """
+    texts, name_texts, index = get_page_words(doc, page_number, dpi)
+    # License formats, year prefixes and numbers to skip (e.g. town permits) come from the vocabulary
+    license_pattern = VOCABULARY.text_layer_license
 
     found = []
     seen_licenses = set()
 
-    for w in word_list:
-        lic = w["text"]
-        if not license_pattern.match(lic):
+    for i, lic in enumerate(texts):
+        if not license_pattern.fullmatch(lic):
             continue
-        if lic.startswith('19') or lic.startswith('20') or lic in skip_licenses:
+        if VOCABULARY.is_year(lic) or lic in VOCABULARY.skip_licenses:
             continue
         if lic in seen_licenses:
             continue
         seen_licenses.add(lic)
 
-        cx, cy = w["sx"], w["sy"]
+        cx, cy = index.xs[i], index.ys[i]
         radius = int(280 * (dpi / 150))
         bx = max(0, int(cx) - radius)
         by = max(0, int(cy) - radius)
         bbox = (bx, by, radius * 2, radius * 2)
 
         # Find name words near this license (within ~200px in screen space)
+        idx, dist = index.query_radius(cx, cy, NAME_SEARCH_RADIUS)
         nearby_names = []
-        for ww in word_list:
-            if ww is w:
-                continue
-            dist = ((ww["sx"] - cx) ** 2 + (ww["sy"] - cy) ** 2) ** 0.5
-            if dist > 200:
-                continue
-            txt = re.sub(r'[^A-Z\s\.]', '', ww["text"].upper()).strip()
-            if not txt or len(txt) < 2:
-                continue
-            if txt in name_blacklist or txt.isdigit():
-                continue
-            if re.search(r'\bOF\b', txt):
+        for j in np.lexsort((idx, dist)):  # closest first, ties in reading order
+            k = idx[j]
+            if k == i or name_texts[k] is None:
                 continue
-            nearby_names.append((dist, txt))
+            nearby_names.append(name_texts[k])
 
-        nearby_names.sort(key=lambda x: x[0])
-        unique_names = list(dict.fromkeys(n[1] for n in nearby_names))
+        unique_names = list(dict.fromkeys(nearby_names))
         name = " ".join(unique_names[:3]) if unique_names else None
 
         found.append({"bbox": bbox, "license": lic, "name": name})
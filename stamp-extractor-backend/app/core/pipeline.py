@@ -0,0 +1,603 @@
+"""
+CPU-bound page work (rendering, circle detection, OCR).
+These functions run inside the worker pool processes, so they take a doc_id
+instead of a fitz.Document and return plain picklable values.
+"""
+import ast
+import hashlib
+import json
+import os
+import time
+
+from app.core import (
+    extractor, layout_detector, mosaic, ocr_engine, ocr_pipeline, pdf_handler, stamp_fingerprints, tiling,
+    vocabulary,
+)
+from app.core.document_store import document_store, InvalidPage
+from app.core.tracing import start_trace, span, count
+from app.core.pdf_handler import (
+    render_region_gray, get_stamp_bboxes_from_pdf, get_image_placements,
+    get_placed_image_gray, get_page_pixel_size, get_vector_circles,
+)
+from app.core.layout_detector import (
+    detect_stamp_seals_in_window, detect_stamp_region_from_circles, title_block_window, circle_in_region,
+    MIN_STAMP_RADIUS, MAX_STAMP_RADIUS,
+)
+from app.core.extractor import (
+    extract_fields_batched, extract_fields_pipelined, extract_fields_tiled, ocr_pipelining,
+)
+from app.core.stamp_fingerprints import fingerprint_store, SIGNATURE_DPI
+
+DETECT_DPI = 150  # Low DPI for fast region detection
+# OCR resolution ladder: start cheap, escalate only when no license is read or
+# the license line's mean word confidence is below OCR_MIN_CONFIDENCE
+OCR_DPI_LADDER = [int(d) for d in os.environ.get("OCR_DPI_LADDER", "300,450,600").split(",")]
+OCR_MIN_CONFIDENCE = float(os.environ.get("OCR_MIN_CONFIDENCE", "70"))
+# Largest region rendered for OCR in one piece (8-bit grayscale, so also its size in bytes);
+# bigger ones, e.g. the heuristic fallback region of a large sheet, are OCR'd tile by tile
+OCR_REGION_MAX_PIXELS = int(float(os.environ.get("OCR_REGION_MAX_MPIX", "16")) * 1_000_000)
+# Tiles overlap by this much, so any word up to an inch long is read whole in some tile
+OCR_TILE_OVERLAP_IN = 1.0
+
+# Skip the raster path when text-layer stamps already explain the title block
+TEXT_LAYER_SHORT_CIRCUIT = os.environ.get("TEXT_LAYER_SHORT_CIRCUIT", "1") == "1"
+# A detected region counts as covered when this fraction of it lies inside a text-layer stamp box
+TEXT_LAYER_COVERAGE = float(os.environ.get("TEXT_LAYER_COVERAGE", "0.5"))
+
+# Look for seal rings among the page's vector paths before rendering for HoughCircles
+VECTOR_DETECTION = os.environ.get("VECTOR_DETECTION", "1") == "1"
+
+# OCR images placed in the title block (scanned or pasted-in seals) from their own
+# pixels at native resolution, instead of rendering the page around them
+IMAGE_OCR = os.environ.get("IMAGE_OCR", "1") == "1"
+# An image is OCR'd whole as a seal when it is at most this big (screen px at DETECT_DPI);
+# larger ones (a scanned sheet) go through region detection, OCR'd from native pixels per region
+STAMP_IMAGE_MAX_SIDE = 4 * MAX_STAMP_RADIUS
+# A detected region is read from an image's native pixels when this fraction of it lies inside the image
+IMAGE_REGION_COVERAGE = 0.95
+
+
+def _core_sources():
+    """
+    Paths of this module and every app.core module it imports, directly or through
+    other app.core modules (imports inside functions included), found by parsing
+    their source so a newly added module cannot be left out.
+    """
+    core_dir = os.path.dirname(os.path.abspath(__file__))
+    seen, todo = set(), ["pipeline"]
+    while todo:
+        name = todo.pop()
+        path = os.path.join(core_dir, f"{name}.py")
+        if name in seen or not os.path.exists(path):
+            continue
+        seen.add(name)
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module == "app.core":
+                todo.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and (node.module or "").startswith("app.core."):
+                todo.append(node.module.split(".")[2])
+            elif isinstance(node, ast.Import):
+                todo.extend(alias.name.split(".")[2] for alias in node.names if alias.name.startswith("app.core."))
+    return [os.path.join(core_dir, f"{name}.py") for name in sorted(seen)]
+
+
+def _pipeline_version():
+    """
+    Fingerprint of everything that can change an extraction result: the tunables
+    below plus the source of every app.core module the pipeline runs (_core_sources).
+    Cached results from any other version are simply never looked up again.
+    """
+    config = {
+        "detect_dpi": DETECT_DPI,
+        "ocr_dpi_ladder": OCR_DPI_LADDER,
+        "ocr_min_confidence": OCR_MIN_CONFIDENCE,
+        "ocr_region_max_pixels": OCR_REGION_MAX_PIXELS,
+        "text_layer_short_circuit": TEXT_LAYER_SHORT_CIRCUIT,
+        "text_layer_coverage": TEXT_LAYER_COVERAGE,
+        "vector_detection": VECTOR_DETECTION,
+        "image_ocr": IMAGE_OCR,
+        "ocr_backend": ocr_engine.OCR_BACKEND,
+        "ocr_mosaic": extractor.OCR_MOSAIC,
+        "seal_unwrap": ocr_pipeline.SEAL_UNWRAP,
+        "stamp_reuse": stamp_fingerprints.STAMP_REUSE,
+        "stamp_reuse_min_similarity": stamp_fingerprints.STAMP_REUSE_MIN_SIMILARITY,
+        "vocabulary": vocabulary.VOCABULARY.fingerprint,
+    }
+    h = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+    for path in _core_sources():
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+PIPELINE_VERSION = _pipeline_version()
+
+
+def _open_page_document(doc_id, page):
+    doc = document_store.open(doc_id)
+    if page < 0 or page >= len(doc):
+        raise InvalidPage(f"Invalid page number: {page}")
+    return doc
+
+
+def _intersection_area(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    return max(0, iw) * max(0, ih)
+
+
+def _covered_by_text_layer(region, text_bboxes):
+    """True if most of the region already lies inside a text-layer stamp box."""
+    area = region[2] * region[3]
+    if not area:
+        return False
+    return any(_intersection_area(region, tb) / area >= TEXT_LAYER_COVERAGE for tb in text_bboxes)
+
+
+def _in_title_block(doc, page, bbox):
+    """True if the centre of bbox (screen pixels at DETECT_DPI) lies in the title-block window."""
+    x, y, w, h = title_block_window(*get_page_pixel_size(doc, page, DETECT_DPI))
+    cx, cy = bbox[0] + bbox[2] / 2, bbox[1] + bbox[3] / 2
+    return x <= cx < x + w and y <= cy < y + h
+
+
+def _title_block_images(doc, page):
+    """Placements of the images in the search window: a scanned or pasted-in seal can hide there."""
+    page_w, page_h = get_page_pixel_size(doc, page, DETECT_DPI)
+    window = title_block_window(page_w, page_h)
+    return [p for p in get_image_placements(doc, page, DETECT_DPI) if _intersection_area(p["bbox"], window)]
+
+
+def extract_page(doc_id, page):
+    """
+    Full stamp extraction for one page.
+    Returns {"page", "stamps", "raster_skipped", "ocr_regions_skipped", "trace"} where
+    each stamp matches StampInfo and records the path that produced it in "source",
+    and "trace" holds the timing spans (not part of the cached result).
+    """
+    with start_trace() as trace:
+        result = _extract_page(doc_id, page)
+    result["trace"] = trace.to_dict()
+    return result
+
+
+def _extract_page(doc_id, page):
+    start = time.perf_counter()
+    with span("pdf_open"):
+        doc = _open_page_document(doc_id, page)
+
+    stamps_found = []
+    seen_licenses = set()
+    # Seals already read on other pages of this document, reused instead of OCR'd again
+    with span("fingerprint_load"):
+        seals = fingerprint_store.reads_for(doc_id, PIPELINE_VERSION, page)
+
+    # ── Step 1: PDF text layer — exact positions + names, no OCR needed ──
+    print(f"[EXTRACT] Step 1: Checking PDF text layer...")
+    with span("text_layer_scan"):
+        pdf_stamps = get_stamp_bboxes_from_pdf(doc, page, dpi=DETECT_DPI)
+    print(f"[EXTRACT] Found {len(pdf_stamps)} stamps in PDF text layer")
+
+    for ps in pdf_stamps:
+        rx, ry, rw, rh = ps["bbox"]
+        lic = ps["license"]
+        name = ps["name"]
+        if lic in seen_licenses:
+            continue
+        seen_licenses.add(lic)
+        stamps_found.append({
+            "symbol_type": "approval_stamp",
+            "bounding_box": [rx, ry, rw, rh],
+            "engineer_name": name,
+            "license_number": lic,
+            "source": "text_layer",
+        })
+
+    text_bboxes = [ps["bbox"] for ps in pdf_stamps]
+    with span("image_placement_check"):
+        images = _title_block_images(doc, page)
+    covered = list(text_bboxes)
+    unread_images = images
+
+    # ── Step 1b: images in the title block — OCR'd from their native pixels, no render ──
+    if images and IMAGE_OCR:
+        image_stamps, unread_images = _extract_from_images(doc, page, images, text_bboxes, seen_licenses, seals)
+        stamps_found.extend(image_stamps)
+        covered += [s["bounding_box"] for s in image_stamps]
+
+    # The stamps found so far may explain the title block: only if every text-layer stamp is a
+    # named seal inside it (a bare 5-digit number may be a zip code or job number) and no image
+    # there is left unread (a scanned or pasted-in seal has no text layer). Even then, seal
+    # rings they do not cover are still read.
+    explained = (
+        TEXT_LAYER_SHORT_CIRCUIT and bool(covered) and not unread_images
+        and all(ps["name"] and _in_title_block(doc, page, ps["bbox"]) for ps in pdf_stamps)
+    )
+    raster_stamps, regions_skipped, raster_skipped = _extract_from_raster(
+        doc, page, covered, seen_licenses, seals, images, bool(unread_images), explained)
+    stamps_found.extend(raster_stamps)
+
+    elapsed = time.perf_counter() - start
+    print(f"[EXTRACT] Complete! Found {len(stamps_found)} total stamps in {elapsed:.2f}s\n")
+
+    return {
+        "page": page,
+        "stamps": stamps_found,
+        "raster_skipped": raster_skipped,
+        "ocr_regions_skipped": regions_skipped,
+    }
+
+
+def _seal_sized(placement):
+    w, h = placement["bbox"][2:]
+    return min(w, h) >= MIN_STAMP_RADIUS and max(w, h) <= STAMP_IMAGE_MAX_SIDE
+
+
+def _confident(engineers):
+    return bool(engineers) and min(e["confidence"] for e in engineers) >= OCR_MIN_CONFIDENCE
+
+
+def _match_known_seals(seals, crops):
+    """
+    Look each (crop, dpi) up among the seals already read on other pages of the document.
+    Returns (signatures, {index: (entry, similarity)} for the crops that matched).
+    """
+    signatures, matched = [], {}
+    with span("fingerprint_match", crops=len(crops)):
+        for i, (crop, dpi) in enumerate(crops):
+            sig, entry, sim = seals.match(crop, dpi)
+            signatures.append(sig)
+            if entry is not None:
+                matched[i] = (entry, sim)
+    if matched:
+        count("stamp_reused", len(matched))
+    return signatures, matched
+
+
+def _reuse_fields(entry, sim):
+    return {"reused_from_page": entry["page"], "reuse_similarity": round(sim, 3)}
+
+
+def _extract_from_images(doc, page, images, text_bboxes, seen_licenses, seals):
+    """
+    OCR seal-sized images in the title block straight from their native pixels
+    (capped at the top of the DPI ladder), all in one batch. Images already covered
+    by text-layer stamps are left alone; images matching a seal read on another page
+    reuse that read. Returns (stamps, images_left_unread).
+    """
+    stamps_found = []
+    unread = []
+    candidates = []
+    for p in images:
+        if not _seal_sized(p) or _covered_by_text_layer(p["bbox"], text_bboxes):
+            unread.append(p)
+            continue
+        arr, dpi = get_placed_image_gray(doc, p, max_dpi=OCR_DPI_LADDER[-1], max_pixels=OCR_REGION_MAX_PIXELS)
+        if arr is None:
+            unread.append(p)
+            continue
+        candidates.append((p, arr, dpi))
+    if not candidates:
+        return stamps_found, images
+
+    signatures, matched = _match_known_seals(seals, [(arr, dpi) for _, arr, dpi in candidates])
+    to_ocr = [i for i in range(len(candidates)) if i not in matched]
+    reads = {i: (entry["engineers"], entry["dpi"], _reuse_fields(entry, sim)) for i, (entry, sim) in matched.items()}
+    if to_ocr:
+        print(f"[EXTRACT] Step 1b: OCR on {len(to_ocr)} title-block images at native resolution...")
+        with span("image_ocr", images=len(to_ocr)):
+            per_image = extract_fields_batched([candidates[i][1] for i in to_ocr])
+        count("image_ocr", len(to_ocr))
+        for i, engineers in zip(to_ocr, per_image):
+            p, arr, dpi = candidates[i]
+            print(f"[EXTRACT]   Image xref {p['xref']} @ {dpi:.0f} DPI ({arr.shape[1]}x{arr.shape[0]}): "
+                  f"{len(engineers)} stamps")
+            reads[i] = (engineers, int(dpi), {})
+            if _confident(engineers):
+                seals.remember(signatures[i], engineers, int(dpi))
+
+    for i, (p, _, _) in enumerate(candidates):
+        engineers, dpi, reuse = reads[i]
+        if reuse:
+            print(f"[EXTRACT]   Image xref {p['xref']}: same seal as page {reuse['reused_from_page']} "
+                  f"(similarity {reuse['reuse_similarity']}), reusing its read")
+        if not engineers:
+            unread.append(p)
+            continue
+        for eng in engineers:
+            lic = eng["license_number"]
+            if lic in seen_licenses:
+                continue
+            seen_licenses.add(lic)
+            stamps_found.append({
+                "symbol_type": "approval_stamp",
+                "bounding_box": list(p["bbox"]),
+                "engineer_name": eng["engineer_name"],
+                "license_number": lic,
+                "source": "image",
+                "ocr_dpi": dpi,
+                "ocr_confidence": round(eng["confidence"], 1),
+                **reuse,
+            })
+    return stamps_found, unread
+
+
+def _scaled(region, dpi):
+    """A region at DETECT_DPI in screen pixels at dpi."""
+    return tuple(int(v * dpi / DETECT_DPI) for v in region)
+
+
+def _extract_from_raster(doc, page, text_bboxes, seen_licenses, seals, images=(), images_unread=False,
+                         explained=False):
+    """
+    Circle detection + high-DPI OCR. Regions already covered by stamps found so far
+    (text_bboxes) are not OCR'd, nor are regions matching a seal read on another page;
+    regions inside a title-block image are read from its native pixels first.
+    explained: the stamps found so far account for the title block, so when every vector
+    seal ring is covered by them nothing is rendered.
+    Returns (stamps, number_of_regions_skipped, raster_skipped).
+    """
+    stamps_found = []
+    regions_skipped = 0
+
+    page_w, page_h = get_page_pixel_size(doc, page, DETECT_DPI)
+
+    # ── Step 2a: CAD-drawn seals — ring outlines straight from the vector paths, no render ──
+    img_bboxes = []
+    circles = []  # seal circles behind the regions, page pixels at DETECT_DPI
+    window, window_gray = None, None
+    if VECTOR_DETECTION:
+        with span("vector_detection"):
+            circles = get_vector_circles(doc, page, DETECT_DPI, MIN_STAMP_RADIUS, MAX_STAMP_RADIUS)
+            img_bboxes = detect_stamp_region_from_circles(circles, (page_w, page_h))
+        # An unread scan next to a vector seal still needs the raster detector
+        if img_bboxes and images_unread:
+            img_bboxes, circles = [], []
+
+    if explained and img_bboxes and all(_covered_by_text_layer(r, text_bboxes) for r in img_bboxes):
+        print(f"[EXTRACT] Text layer and images account for every seal in the title block, skipping raster path")
+        count("raster_skipped")
+        count("ocr_region_skipped", len(img_bboxes))
+        return stamps_found, len(img_bboxes), True
+
+    if img_bboxes:
+        print(f"[EXTRACT] Step 2: Found {len(img_bboxes)} vector seal outlines, skipping raster detection")
+        count("vector_detection")
+    else:
+        # ── Step 2b: Detect stamp regions at LOW DPI (fast), title-block window only ──
+        window = title_block_window(page_w, page_h)
+        print(f"[EXTRACT] Step 2: Rendering title-block window at {DETECT_DPI} DPI for region detection...")
+        with span("low_res_render", dpi=DETECT_DPI):
+            window_gray = render_region_gray(doc, page, DETECT_DPI, window)
+        print(f"[EXTRACT] Low-res window: {window_gray.shape[1]}x{window_gray.shape[0]} of {page_w}x{page_h}")
+
+        print(f"[EXTRACT] Step 3: Detecting stamp regions...")
+        with span("circle_detection"):
+            img_bboxes, circles = detect_stamp_seals_in_window(window_gray, window[:2], (page_w, page_h))
+        print(f"[EXTRACT] Found {len(img_bboxes)} regions")
+
+    # ── Step 3: Render and OCR ONLY the detected regions, climbing the DPI ladder ──
+    print(f"[EXTRACT] Step 4: OCR on regions, DPI ladder {OCR_DPI_LADDER}...")
+
+    pending = []
+    for i, region_bbox in enumerate(img_bboxes):
+        rx, ry, rw, rh = (int(v) for v in region_bbox)
+        if _covered_by_text_layer((rx, ry, rw, rh), text_bboxes):
+            print(f"[EXTRACT]   Region {i+1}: covered by text layer, skipping OCR")
+            regions_skipped += 1
+            count("ocr_region_skipped")
+            continue
+        pending.append((i, (rx, ry, rw, rh)))
+
+    del window_gray
+
+    # Seals repeat from sheet to sheet: a region around a seal circle matching one already read on
+    # another page reuses that read. Compared at SIGNATURE_DPI, where license digits are told apart;
+    # renders of seals not matched are kept for the ladder rung at that DPI
+    ocr_results, reused, signatures, prerendered = {}, {}, {}, {}
+    seal_regions = [(i, region) for i, region in pending if circle_in_region(region, circles)]
+    if seal_regions and seals.store.enabled:
+        with span("fingerprint_render", dpi=SIGNATURE_DPI, regions=len(seal_regions)):
+            crops = [render_region_gray(doc, page, SIGNATURE_DPI, _scaled(region, SIGNATURE_DPI))
+                     for _, region in seal_regions]
+        sigs, matched = _match_known_seals(seals, [(crop, SIGNATURE_DPI) for crop in crops])
+        for k, (i, _) in enumerate(seal_regions):
+            signatures[i] = sigs[k]
+            if k not in matched:
+                prerendered[(i, SIGNATURE_DPI)] = crops[k]
+                continue
+            entry, sim = matched[k]
+            print(f"[EXTRACT]   Region {i+1}: same seal as page {entry['page']} (similarity {sim:.3f}), skipping OCR")
+            ocr_results[i] = (entry["engineers"], entry["dpi"])
+            reused[i] = _reuse_fields(entry, sim)
+        del crops
+
+    to_ocr = [(i, region) for i, region in pending if i not in reused]
+    seal_circles = {i: circle_in_region(region, circles) for i, region in to_ocr}
+    ladder_results = _ocr_regions_with_ladder(doc, page, to_ocr, images, seal_circles, prerendered)
+    for i, (engineers, ocr_dpi) in ladder_results.items():
+        if _confident(engineers):
+            seals.remember(signatures.get(i), engineers, ocr_dpi)
+    ocr_results.update(ladder_results)
+
+    for i, (rx, ry, rw, rh) in pending:
+        engineers, ocr_dpi = ocr_results[i]
+        for eng in engineers:
+            lic = eng["license_number"]
+            if lic in seen_licenses:
+                continue
+            seen_licenses.add(lic)
+
+            # Bbox is relative to low-res coords (DETECT_DPI)
+            stamps_found.append({
+                "symbol_type": "approval_stamp",
+                "bounding_box": [rx, ry, rw, rh],  # Use region bbox at DETECT_DPI
+                "engineer_name": eng["engineer_name"],
+                "license_number": lic,
+                "source": "ocr",
+                "ocr_dpi": ocr_dpi,
+                "ocr_confidence": round(eng["confidence"], 1),
+                **reused.get(i, {}),
+            })
+
+    return stamps_found, regions_skipped, False
+
+
+def _ocr_regions_from_images(doc, regions, images, results):
+    """
+    Read regions lying inside a placed image (e.g. a full-sheet scan) from the image's
+    native pixels, when those are at least as sharp as the first ladder rung.
+    Fills results for confident reads and returns the regions still pending.
+    """
+    native = []
+    for i, region in regions:
+        area = region[2] * region[3]
+        image = next((
+            p for p in images
+            if area and p["dpi"] >= OCR_DPI_LADDER[0]
+            and _intersection_area(region, p["bbox"]) / area >= IMAGE_REGION_COVERAGE
+        ), None)
+        if image is None:
+            continue
+        # The native crop is one array, and the whole image is decoded first:
+        # an oversized crop or image is left to the tiled render path
+        native_scale = min(image["dpi"], OCR_DPI_LADDER[-1]) / DETECT_DPI
+        if area * native_scale ** 2 > OCR_REGION_MAX_PIXELS:
+            continue
+        arr, dpi = get_placed_image_gray(
+            doc, image, roi=region, max_dpi=OCR_DPI_LADDER[-1], max_pixels=OCR_REGION_MAX_PIXELS)
+        if arr is not None:
+            native.append((i, region, arr, dpi))
+    if not native:
+        return regions
+
+    with span("image_ocr", regions=len(native)):
+        per_region = extract_fields_batched([arr for _, _, arr, _ in native])
+    count("image_ocr", len(native))
+
+    done = set()
+    for (i, _, arr, dpi), engineers in zip(native, per_region):
+        confidence = min((e["confidence"] for e in engineers), default=0.0)
+        print(f"[EXTRACT]   Region {i+1} from image pixels @ {dpi:.0f} DPI ({arr.shape[1]}x{arr.shape[0]}): "
+              f"{len(engineers)} stamps, confidence {confidence:.0f}")
+        if engineers:
+            results[i] = (engineers, int(dpi))
+            if confidence >= OCR_MIN_CONFIDENCE:
+                done.add(i)
+    return [(i, region) for i, region in regions if i not in done]
+
+
+def _circle_in_crop(circle, region, dpi_scale):
+    """A circle at DETECT_DPI page pixels in the pixels of region's crop rendered at DETECT_DPI * dpi_scale."""
+    if circle is None:
+        return None
+    cx, cy, r = circle
+    return ((cx - region[0]) * dpi_scale, (cy - region[1]) * dpi_scale, r * dpi_scale)
+
+
+def _ocr_regions_with_ladder(doc, page, regions, images=(), seal_circles=None, prerendered=None):
+    """
+    OCR regions [(index, (x, y, w, h) at DETECT_DPI)] rung by rung up OCR_DPI_LADDER.
+    Regions inside a placed image are tried on its native pixels first. At each rung,
+    every region still lacking a confident license read is rendered and OCR'd together
+    in one mosaic; regions with a known seal circle ({index: (cx, cy, r)} at DETECT_DPI)
+    are read from its centre and unwrapped ring first. prerendered ({(index, dpi): crop})
+    holds regions already rendered at a rung's DPI. Returns {index: (engineers, dpi_used)}.
+    """
+    seal_circles = seal_circles or {}
+    prerendered = prerendered or {}
+
+    def render(i, dpi, bbox):
+        crop = prerendered.pop((i, dpi), None)
+        return crop if crop is not None else render_region_gray(doc, page, dpi, bbox)
+
+    results = {i: ([], OCR_DPI_LADDER[-1]) for i, _ in regions}
+    pending = list(regions)
+    if images and IMAGE_OCR:
+        pending = _ocr_regions_from_images(doc, pending, images, results)
+    for rung, dpi in enumerate(OCR_DPI_LADDER):
+        if not pending:
+            break
+        if rung:
+            count("ocr_dpi_escalation", len(pending))
+        dpi_scale = dpi / DETECT_DPI
+        scaled = [(i, region, _scaled(region, dpi)) for i, region in pending]
+        whole = [r for r in scaled if r[2][2] * r[2][3] <= OCR_REGION_MAX_PIXELS]
+        tiled = [r for r in scaled if r[2][2] * r[2][3] > OCR_REGION_MAX_PIXELS]
+
+        # Render ONLY these regions at this rung's DPI, in grayscale
+        circles = [_circle_in_crop(seal_circles.get(i), region, dpi_scale) for i, region, _ in whole]
+        if ocr_pipelining():
+            # Region k+1 renders while OCR threads read region k
+            with span("region_render_ocr", dpi=dpi, regions=len(whole)):
+                per_region = extract_fields_pipelined(
+                    [lambda i=i, bbox=bbox: render(i, dpi, bbox) for i, _, bbox in whole],
+                    circles,
+                )
+        else:
+            with span("region_render", dpi=dpi, regions=len(whole)):
+                crops = [render(i, dpi, bbox) for i, _, bbox in whole]
+            with span("region_ocr", dpi=dpi, regions=len(whole)):
+                per_region = extract_fields_batched(crops, circles)
+            del crops
+
+        # Oversized regions: rendered and OCR'd a tile at a time, never held whole
+        for i, region, (x, y, w, h) in tiled:
+            count("ocr_tiled")
+            with span("region_ocr_tiled", dpi=dpi):
+                per_region.append(extract_fields_tiled(
+                    lambda tx, ty, tw, th: render_region_gray(doc, page, dpi, (x + tx, y + ty, tw, th)),
+                    w, h, OCR_REGION_MAX_PIXELS, int(OCR_TILE_OVERLAP_IN * dpi),
+                ))
+
+        still_pending = []
+        for (i, region, (_, _, w, h)), engineers in zip(whole + tiled, per_region):
+            confidence = min((e["confidence"] for e in engineers), default=0.0)
+            print(f"[EXTRACT]   Region {i+1} @ {dpi} DPI ({w}x{h}"
+                  f"{', tiled' if w * h > OCR_REGION_MAX_PIXELS else ''}): "
+                  f"{len(engineers)} stamps, confidence {confidence:.0f}")
+            if engineers:
+                results[i] = (engineers, dpi)
+            if not engineers or confidence < OCR_MIN_CONFIDENCE:
+                still_pending.append((i, region))
+        pending = still_pending
+    return results
+
+
+def summarize_document(page_results):
+    """
+    Document-level rollup of per-page extraction results.
+    The same seal appears on most sheets of a set, so licenses are deduped and
+    each keeps the pages it was found on plus the most frequently read name.
+    """
+    by_license = {}
+    for result in page_results:
+        for stamp in result["stamps"]:
+            lic = stamp["license_number"]
+            if not lic:
+                continue
+            entry = by_license.setdefault(lic, {"names": {}, "pages": set()})
+            entry["pages"].add(result["page"])
+            name = stamp["engineer_name"]
+            if name:
+                entry["names"][name] = entry["names"].get(name, 0) + 1
+
+    engineers = []
+    for lic, entry in sorted(by_license.items()):
+        names = sorted(entry["names"].items(), key=lambda kv: (-kv[1], kv[0]))
+        engineers.append({
+            "license_number": lic,
+            "engineer_name": names[0][0] if names else None,
+            "pages": sorted(entry["pages"]),
+        })
+
+    return {
+        "pages_processed": len(page_results),
+        "pages_with_stamps": sorted(r["page"] for r in page_results if r["stamps"]),
+        "pages_raster_skipped": sum(1 for r in page_results if r["raster_skipped"]),
+        "engineers": engineers,
+    }
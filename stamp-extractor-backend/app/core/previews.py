@@ -0,0 +1,79 @@
+"""
+Page previews as image files on disk, keyed by doc_id and PREVIEW_VERSION. A
+document is immutable under its SHA-256, so a preview requested with the current
+version in its URL never goes stale and can be served with a long-lived, immutable
+Cache-Control; without it, clients revalidate against the ETag.
+"""
+import os
+import tempfile
+
+from app.core.document_store import document_store, DOCUMENT_STORE_DIR, InvalidPage
+
+PREVIEW_DIR = os.environ.get("PREVIEW_DIR", os.path.join(os.path.dirname(DOCUMENT_STORE_DIR), "previews"))
+PREVIEW_DPI = 100  # Very low DPI for fast page previews
+PREVIEW_THUMB_SIZE = 256  # longest edge of thumbnail-strip images, in pixels
+PREVIEW_QUALITY = 70
+PREVIEW_SIZES = ("viewer", "thumb")
+PREVIEW_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+# Part of every file name, ETag and versioned preview URL, so changing the settings above
+# never serves stale images from disk or from a browser cache
+PREVIEW_VERSION = f"{PREVIEW_DPI}d{PREVIEW_THUMB_SIZE}t{PREVIEW_QUALITY}q"
+# Cache lifetime of previews requested without the current version, revalidated by ETag after
+PREVIEW_UNVERSIONED_MAX_AGE = 300
+# Render previews for every page in the background right after upload
+PREVIEW_PRERENDER = os.environ.get("PREVIEW_PRERENDER", "1") == "1"
+
+
+def preview_path(doc_id, page, size, fmt):
+    return os.path.join(PREVIEW_DIR, doc_id, f"{page}-{size}-{PREVIEW_VERSION}.{fmt}")
+
+
+def preview_etag(doc_id, page, size, fmt):
+    return f'"{doc_id[:16]}-{page}-{size}-{PREVIEW_VERSION}-{fmt}"'
+
+
+def has_previews(doc_id, page, fmt="jpeg"):
+    return all(os.path.exists(preview_path(doc_id, page, size, fmt)) for size in PREVIEW_SIZES)
+
+
+def read_preview(doc_id, page, size, fmt):
+    """Cached preview bytes, or None if not rendered yet."""
+    try:
+        with open(preview_path(doc_id, page, size, fmt), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, image, fmt):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if fmt == "webp":
+                image.save(f, format="WEBP", quality=PREVIEW_QUALITY)
+            else:
+                image.save(f, format="JPEG", quality=PREVIEW_QUALITY)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_previews(doc_id, page, fmt="jpeg"):
+    """
+    Render one page once at PREVIEW_DPI and write every preview size for it.
+    Runs in the worker pool. Returns the viewer image's (width, height).
+    """
+    from app.core.pdf_handler import render_page_to_image
+    doc = document_store.open(doc_id)
+    if page < 0 or page >= len(doc):
+        raise InvalidPage(f"Invalid page number: {page}")
+    page_img = render_page_to_image(doc, page, dpi=PREVIEW_DPI)
+    _write_atomic(preview_path(doc_id, page, "viewer", fmt), page_img, fmt)
+
+    thumb = page_img.copy()
+    thumb.thumbnail((PREVIEW_THUMB_SIZE, PREVIEW_THUMB_SIZE))
+    _write_atomic(preview_path(doc_id, page, "thumb", fmt), thumb, fmt)
+    return page_img.width, page_img.height
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Extraction results keyed by (PDF SHA-256, page, pipeline version), so resubmitted
+# drawing sets skip render + OCR. Shared by all uvicorn workers through SQLite.
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "stamp-extractor", "results.sqlite3")
+)
+RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "1") == "1"
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " doc_id TEXT NOT NULL, page INTEGER NOT NULL, version TEXT NOT NULL,"
+                " payload TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL,"
+                " PRIMARY KEY (doc_id, page, version))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, doc_id, page, version):
+        """Cached result dict, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload FROM results WHERE doc_id = ? AND page = ? AND version = ?",
+                (doc_id, page, version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE results SET accessed = ? WHERE doc_id = ? AND page = ? AND version = ?",
+                (time.time(), doc_id, page, version),
+            )
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, doc_id, page, version, result):
+        if not self.enabled:
+            return
+        payload = json.dumps(result)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (doc_id, page, version, payload, size, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, page, version, payload, len(payload), time.time()),
+            )
+            self.stores += 1
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        # Least recently used rows go first once the payloads exceed the size budget
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT rowid, size FROM results ORDER BY accessed").fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if total <= target:
+                break
+            doomed.append((rowid,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE rowid = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "max_bytes": self.max_bytes,
+        }
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024, enabled=RESULT_CACHE_ENABLED
+)
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform-grid spatial index over 2D points, backed by NumPy arrays.
+    Points are bucketed by cell and sorted by cell id, so a radius query only
+    looks at the cells overlapping the query circle instead of every point.
+    """
+
+    def __init__(self, xs, ys, cell_size):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.cell_size = float(cell_size)
+
+        cx = np.floor(self.xs / self.cell_size).astype(np.int64)
+        cy = np.floor(self.ys / self.cell_size).astype(np.int64)
+        self._cell_x_min = int(cx.min()) if len(cx) else 0
+        self._cell_y_min = int(cy.min()) if len(cy) else 0
+        self._cols = (int(cx.max()) - self._cell_x_min + 1) if len(cx) else 1
+        self._rows = (int(cy.max()) - self._cell_y_min + 1) if len(cy) else 1
+
+        cell_ids = (cy - self._cell_y_min) * self._cols + (cx - self._cell_x_min)
+        self._order = np.argsort(cell_ids, kind="stable")
+        self._sorted_cells = cell_ids[self._order]
+
+    def __len__(self):
+        return len(self.xs)
+
+    def query_radius(self, x, y, radius):
+        """Indices of points within radius of (x, y) and their distances, unsorted."""
+        if not len(self.xs):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        c0 = max(int(np.floor((x - radius) / self.cell_size)) - self._cell_x_min, 0)
+        c1 = min(int(np.floor((x + radius) / self.cell_size)) - self._cell_x_min, self._cols - 1)
+        r0 = max(int(np.floor((y - radius) / self.cell_size)) - self._cell_y_min, 0)
+        r1 = min(int(np.floor((y + radius) / self.cell_size)) - self._cell_y_min, self._rows - 1)
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Cells in one grid row are contiguous in the sorted order
+        chunks = []
+        for row in range(r0, r1 + 1):
+            lo = np.searchsorted(self._sorted_cells, row * self._cols + c0, side="left")
+            hi = np.searchsorted(self._sorted_cells, row * self._cols + c1, side="right")
+            if hi > lo:
+                chunks.append(self._order[lo:hi])
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = np.concatenate(chunks)
+        dist = np.hypot(self.xs[candidates] - x, self.ys[candidates] - y)
+        keep = dist <= radius
+        return candidates[keep], dist[keep]
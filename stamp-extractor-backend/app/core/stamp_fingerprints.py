@@ -0,0 +1,227 @@
+"""
+Cross-page reuse of seal reads. A drawing set repeats the same two or three seals
+on every sheet, so each confidently OCR'd seal crop is stored under its document
+with a signature of its ink; a crop on a later page whose signature agrees closely
+enough reuses that read instead of being OCR'd again. Kept in SQLite so every
+worker process sees the seals the others have already read.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+STAMP_FINGERPRINT_PATH = os.environ.get(
+    "STAMP_FINGERPRINT_PATH", os.path.join(tempfile.gettempdir(), "stamp-extractor", "fingerprints.sqlite3")
+)
+STAMP_REUSE = os.environ.get("STAMP_REUSE", "1") == "1"
+# Share of the ink that must agree in every window of two aligned crops for one to reuse the other's read
+STAMP_REUSE_MIN_SIMILARITY = float(os.environ.get("STAMP_REUSE_MIN_SIMILARITY", "0.85"))
+
+# Signatures are the crop's ink at OCR resolution: seals from one state template differ
+# only in their lettering, and a single license digit is a few pixels of stroke there
+# (at the detection DPI, 6 and 8 are within a pixel of each other)
+SIGNATURE_DPI = 300
+# Ink is compared in a window slid over every pixel, so one changed digit cannot hide among
+# the unchanged text or straddle two blocks; windows with less ink than this are margins
+SIGNATURE_WINDOW = 8
+SIGNATURE_MIN_WINDOW_INK = 20
+# Crops of the same seal differ by a few pixels of framing; much larger differences are other seals
+SIGNATURE_MAX_SIZE_RATIO = 1.1
+SIGNATURE_MAX_INK_RATIO = 1.25
+# A set rarely carries more than a handful of distinct seals; oldest rows go first past these
+MAX_FINGERPRINTS_PER_DOC = 64
+MAX_FINGERPRINTS = 100000
+# The global cap is enforced when a process opens the store and every this many inserts
+# after, not on each insert: finding the cutoff walks MAX_FINGERPRINTS index entries
+TRIM_EVERY = 256
+
+
+def seal_signature(gray, dpi=SIGNATURE_DPI):
+    """Ink mask (bool array) of a uint8 grayscale crop rendered at dpi, resampled to SIGNATURE_DPI."""
+    gray = np.asarray(gray, dtype=np.uint8)
+    if abs(dpi - SIGNATURE_DPI) > 1:
+        f = SIGNATURE_DPI / dpi
+        gray = cv2.resize(gray, (max(1, round(gray.shape[1] * f)), max(1, round(gray.shape[0] * f))),
+                          interpolation=cv2.INTER_AREA if f < 1 else cv2.INTER_LINEAR)
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return ink.astype(bool)
+
+
+def _comparable(a, b):
+    """Cheap check before aligning: crops of one seal have about the same size and amount of ink."""
+    (ah, aw), (bh, bw) = a.shape, b.shape
+    size_ratio = max(ah / bh, bh / ah, aw / bw, bw / aw)
+    ink_a, ink_b = np.count_nonzero(a), np.count_nonzero(b)
+    if not ink_a or not ink_b:
+        return False
+    return size_ratio <= SIGNATURE_MAX_SIZE_RATIO and max(ink_a, ink_b) / min(ink_a, ink_b) <= SIGNATURE_MAX_INK_RATIO
+
+
+def _pad(mask, shape):
+    out = np.zeros(shape, dtype=np.uint8)
+    out[:mask.shape[0], :mask.shape[1]] = mask
+    return out
+
+
+def _window_sums(x, window):
+    return cv2.boxFilter(x.astype(np.float32), -1, (window, window), normalize=False)
+
+
+def similarity(a, b):
+    """
+    Agreement of two signatures: aligned by phase correlation, ink of either with no ink
+    of the other within a pixel counts as a miss, and the result is 1 - the largest
+    share of missed ink in any SIGNATURE_WINDOW window.
+    """
+    if not _comparable(a, b):
+        return 0.0
+    shape = (max(a.shape[0], b.shape[0]), max(a.shape[1], b.shape[1]))
+    a, b = _pad(a, shape), _pad(b, shape)
+    (dx, dy), _ = cv2.phaseCorrelate(a.astype(np.float32), b.astype(np.float32))
+    shift = np.float32([[1, 0, -dx], [0, 1, -dy]])
+    b = cv2.warpAffine(b, shift, (shape[1], shape[0]), flags=cv2.INTER_NEAREST)
+    kernel = np.ones((3, 3), np.uint8)
+    miss = (a & (cv2.dilate(b, kernel) ^ 1)) | (b & (cv2.dilate(a, kernel) ^ 1))
+    missed = _window_sums(miss, SIGNATURE_WINDOW)
+    inked = _window_sums(a | b, SIGNATURE_WINDOW)
+    counted = inked >= SIGNATURE_MIN_WINDOW_INK
+    if not counted.any():
+        return 0.0
+    return 1.0 - float((missed[counted] / inked[counted]).max())
+
+
+def _pack_signature(sig):
+    # Height and width first, then the ink bits
+    return np.array(sig.shape, dtype="<u4").tobytes() + np.packbits(sig).tobytes()
+
+
+def _unpack_signature(blob):
+    h, w = np.frombuffer(blob[:8], dtype="<u4")
+    return np.unpackbits(np.frombuffer(blob[8:], dtype=np.uint8), count=int(h) * int(w)).reshape(h, w).astype(bool)
+
+
+class SealReads:
+    """
+    The stored seal reads of one document, loaded once per page. match() finds the
+    read for a crop seen on another page; remember() stores a fresh confident read.
+    """
+
+    def __init__(self, store, doc_id, version, page):
+        self.store = store
+        self.doc_id = doc_id
+        self.version = version
+        self.page = page
+        self.entries = store.load(doc_id, version)
+
+    def match(self, crop, dpi=SIGNATURE_DPI):
+        """
+        (signature, entry, similarity) for a crop rendered at dpi, entry being the closest
+        stored read within STAMP_REUSE_MIN_SIMILARITY ({"engineers", "dpi", "page"}) or None.
+        """
+        if not self.store.enabled:
+            return None, None, 0.0
+        sig = seal_signature(crop, dpi)
+        best, best_sim = None, 0.0
+        for entry in self.entries:
+            sim = similarity(sig, entry["signature"])
+            if sim > best_sim:
+                best, best_sim = entry, sim
+        if best is None or best_sim < STAMP_REUSE_MIN_SIMILARITY:
+            return sig, None, best_sim
+        return sig, best, best_sim
+
+    def remember(self, sig, engineers, dpi):
+        if sig is None or not engineers:
+            return
+        # Two pages can read the same seal at once; one stored copy is enough
+        if any(similarity(sig, e["signature"]) >= STAMP_REUSE_MIN_SIMILARITY for e in self.entries):
+            return
+        entry = {"signature": sig, "engineers": engineers, "dpi": dpi, "page": self.page}
+        self.entries.append(entry)
+        self.store.add(self.doc_id, self.version, entry)
+
+
+class FingerprintStore:
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " doc_id TEXT NOT NULL, version TEXT NOT NULL, hash BLOB NOT NULL,"
+                " engineers TEXT NOT NULL, dpi INTEGER NOT NULL, page INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS fingerprints_doc ON fingerprints (doc_id, version)")
+            conn.execute("CREATE INDEX IF NOT EXISTS fingerprints_created ON fingerprints (created)")
+            self._trim(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _trim(self, conn):
+        # Everything older than the MAX_FINGERPRINTS-th newest row goes
+        row = conn.execute(
+            "SELECT created FROM fingerprints ORDER BY created DESC LIMIT 1 OFFSET ?", (MAX_FINGERPRINTS,)
+        ).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM fingerprints WHERE created <= ?", (row[0],))
+
+    def load(self, doc_id, version):
+        """Stored reads of a document: [{"signature", "engineers", "dpi", "page"}]."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT hash, engineers, dpi, page FROM fingerprints WHERE doc_id = ? AND version = ?",
+                (doc_id, version),
+            ).fetchall()
+        return [
+            {
+                "signature": _unpack_signature(sig),
+                "engineers": json.loads(engineers),
+                "dpi": dpi,
+                "page": page,
+            }
+            for sig, engineers, dpi, page in rows
+        ]
+
+    def add(self, doc_id, version, entry):
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO fingerprints (doc_id, version, hash, engineers, dpi, page, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, version, _pack_signature(entry["signature"]), json.dumps(entry["engineers"]),
+                 int(entry["dpi"]), entry["page"], time.time()),
+            )
+            conn.execute(
+                "DELETE FROM fingerprints WHERE doc_id = ? AND version = ? AND rowid NOT IN ("
+                " SELECT rowid FROM fingerprints WHERE doc_id = ? AND version = ?"
+                " ORDER BY created DESC LIMIT ?)",
+                (doc_id, version, doc_id, version, MAX_FINGERPRINTS_PER_DOC),
+            )
+            self._inserts += 1
+            if self._inserts % TRIM_EVERY == 0:
+                self._trim(conn)
+            conn.commit()
+
+    def reads_for(self, doc_id, version, page):
+        return SealReads(self, doc_id, version, page)
+
+
+fingerprint_store = FingerprintStore(STAMP_FINGERPRINT_PATH, enabled=STAMP_REUSE)
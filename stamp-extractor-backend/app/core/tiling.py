@@ -0,0 +1,106 @@
+"""
+Tiled OCR for regions too big to render whole: the heuristic title-block region
+of an ARCH E sheet at 600 DPI is ~80 megapixels. The region is cut into tiles of
+at most max_pixels that overlap by `overlap` pixels; each word is kept from the
+one tile whose core (the tile minus half of each overlap with a neighbour) holds
+its centre, so a word no longer than the overlap is always read whole, exactly once.
+Lines that a tile edge cut in two are then joined back up by geometry.
+"""
+import math
+
+
+def _axis_spans(length, tile, overlap):
+    """[(start, size, core_lo, core_hi)] covering [0, length) with tiles of `tile` overlapping by `overlap`."""
+    if length <= tile:
+        return [(0, length, 0, length)]
+    stride = max(1, tile - overlap)
+    starts = list(range(0, length - tile, stride)) + [length - tile]
+    spans = []
+    for k, start in enumerate(starts):
+        # Core boundaries sit in the middle of the overlap with each neighbour
+        lo = 0 if k == 0 else (starts[k - 1] + tile + start) / 2
+        hi = length if k == len(starts) - 1 else (start + tile + starts[k + 1]) / 2
+        spans.append((start, tile, lo, hi))
+    return spans
+
+
+def plan_tiles(width, height, max_pixels, overlap):
+    """
+    Tiles (x, y, w, h, core) covering a width x height image, each at most max_pixels,
+    where core = (x0, y0, x1, y1) is the part of the image that tile answers for.
+    """
+    if width * height <= max_pixels:
+        return [(0, 0, width, height, (0, 0, width, height))]
+    side = int(math.sqrt(max_pixels))
+    tile_w = min(width, side)
+    tile_h = min(height, max_pixels // tile_w)
+    # Keep the stride positive on thin tiles
+    overlap = min(overlap, tile_w // 2, tile_h // 2)
+    tiles = []
+    for y, h, y0, y1 in _axis_spans(height, tile_h, overlap):
+        for x, w, x0, x1 in _axis_spans(width, tile_w, overlap):
+            tiles.append((x, y, w, h, (x0, y0, x1, y1)))
+    return tiles
+
+
+def words_in_core(words, tile, tile_index):
+    """A tile's words whose centre lies in its core, shifted to image coordinates and tagged with the tile."""
+    x, y, _, _, (x0, y0, x1, y1) = tile
+    kept = []
+    for w in words:
+        cx = x + w["left"] + w["width"] / 2
+        cy = y + w["top"] + w["height"] / 2
+        if x0 <= cx < x1 and y0 <= cy < y1:
+            kept.append({**w, "left": w["left"] + x, "top": w["top"] + y, "tile": tile_index})
+    return kept
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def merge_tile_lines(words):
+    """
+    Renumber words from several tiles into one set of lines: Tesseract's lines are
+    kept within a tile, and lines from different tiles are joined when they sit at
+    the same height and end where the other begins. Returns the words in reading
+    order with block_num 1, par_num 1 and line_num running top to bottom.
+    """
+    groups = {}
+    for w in words:
+        groups.setdefault((w["tile"], w["block_num"], w["par_num"], w["line_num"]), []).append(w)
+    keys = list(groups)
+    boxes = []
+    for key in keys:
+        g = groups[key]
+        left = min(w["left"] for w in g)
+        top = min(w["top"] for w in g)
+        right = max(w["left"] + w["width"] for w in g)
+        bottom = max(w["top"] + w["height"] for w in g)
+        boxes.append((left, top, right, bottom))
+
+    parent = list(range(len(keys)))
+    for i in range(len(keys)):
+        for j in range(i + 1, len(keys)):
+            if keys[i][0] == keys[j][0]:
+                continue
+            a, b = boxes[i], boxes[j]
+            height = min(a[3] - a[1], b[3] - b[1])
+            v_overlap = min(a[3], b[3]) - max(a[1], b[1])
+            gap = max(0, b[0] - a[2], a[0] - b[2])
+            if height > 0 and v_overlap >= 0.5 * height and gap <= 1.5 * max(a[3] - a[1], b[3] - b[1]):
+                parent[_find(parent, j)] = _find(parent, i)
+
+    lines = {}
+    for i, key in enumerate(keys):
+        lines.setdefault(_find(parent, i), []).extend(groups[key])
+    ordered = sorted(lines.values(), key=lambda ws: (min(w["top"] for w in ws), min(w["left"] for w in ws)))
+    merged = []
+    for line_num, line_words in enumerate(ordered, start=1):
+        for w in sorted(line_words, key=lambda w: w["left"]):
+            merged.append({**{k: v for k, v in w.items() if k != "tile"},
+                           "block_num": 1, "par_num": 1, "line_num": line_num})
+    return merged
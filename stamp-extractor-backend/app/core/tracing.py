@@ -0,0 +1,84 @@
+"""
+Lightweight per-request tracing. A Trace collects timed spans and event counters
+for one unit of work; code anywhere below it calls span()/count() without having
+the trace passed in. Traces are plain dicts once finished, so a worker process can
+return its trace with the page result and the main process feeds it to /metrics.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self._origin = time.perf_counter()
+        # OCR threads of a worker count into the same trace (see extractor.extract_fields_pipelined)
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end, attrs):
+        self.spans.append({
+            "name": name,
+            "offset_ms": round((start - self._origin) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+            **attrs,
+        })
+
+    def count(self, event, n=1):
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + n
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self._origin) * 1000, 2)
+
+    def merge(self, other, offset_ms=0.0):
+        """
+        Add a finished trace dict (e.g. from a worker) to this one. Its spans are
+        shifted by offset_ms, the point in this trace where the other one started.
+        """
+        if not other:
+            return
+        for s in other["spans"]:
+            self.spans.append({**s, "offset_ms": round(s["offset_ms"] + offset_ms, 2)})
+        self.spans.sort(key=lambda s: s["offset_ms"])
+        for event, n in other["counters"].items():
+            self.count(event, n)
+
+    def to_dict(self):
+        return {"spans": self.spans, "counters": self.counters}
+
+
+@contextmanager
+def start_trace():
+    """Make a new Trace current for the enclosed block."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as a span of the current trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(name, start, time.perf_counter(), attrs)
+
+
+def count(event, n=1):
+    """Bump an event counter (fallbacks, escalations, ...) on the current trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.count(event, n)
@@ -0,0 +1,116 @@
+"""
+Page triage for bulk runs: a cheap stamp-likelihood score per page, so cover sheets,
+indexes and detail sheets without a seal can be skipped (or left for last) without
+rendering them for OCR. The signals are the ones the extraction pipeline itself
+starts from, checked cheapest first and only until the page is known to be likely:
+
+  text_layer   five-digit license numbers in the text layer, with or without a name
+  images       images placed in the title-block window, seal-sized or not
+  vector       seal-sized circles among the vector paths of the window
+  raster       HoughCircles on the window rendered at TRIAGE_DPI
+
+Runs in the worker pool, one page per task, like pipeline.extract_page.
+"""
+import hashlib
+import json
+import os
+
+from app.core import pipeline
+from app.core.tracing import start_trace, span
+from app.core.pdf_handler import get_stamp_bboxes_from_pdf, get_page_pixel_size, get_vector_circles, render_region_gray
+from app.core.layout_detector import (
+    detect_stamp_region_from_circles, find_seal_circles, title_block_window, MIN_STAMP_RADIUS, MAX_STAMP_RADIUS,
+)
+
+# Pages scoring below this are skipped by bulk extraction unless triage is turned off
+TRIAGE_MIN_SCORE = float(os.environ.get("TRIAGE_MIN_SCORE", "0.3"))
+# The window render for the raster check: a seal is still a 20-70 px ring at this DPI
+TRIAGE_DPI = 36
+
+# Evidence weights, combined as 1 - prod(1 - weight) over the signals found. A lone
+# five-digit number may be a job or sheet number; any image in the window is kept
+# (a scanned sheet can hide a seal the coarse circle check misses)
+SIGNAL_WEIGHTS = {
+    "named_license": 0.9,
+    "license": 0.5,
+    "vector_circle": 0.8,
+    "raster_circle": 0.6,
+    "seal_image": 0.6,
+    "image": 0.3,
+}
+
+
+def _triage_version():
+    """Triage results are cached next to extraction results; any change to either re-triages."""
+    config = {"triage_dpi": TRIAGE_DPI, "weights": SIGNAL_WEIGHTS}
+    h = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+    h.update(pipeline.PIPELINE_VERSION.encode())
+    with open(__file__, "rb") as f:
+        h.update(f.read())
+    return "triage-" + h.hexdigest()[:16]
+
+
+TRIAGE_VERSION = _triage_version()
+
+
+def _score(signals):
+    miss = 1.0
+    for name, weight in SIGNAL_WEIGHTS.items():
+        if signals.get(name):
+            miss *= 1.0 - weight
+    return round(1.0 - miss, 3)
+
+
+def triage_page(doc_id, page):
+    """
+    Stamp likelihood of one page. Returns {"page", "score", "likely", "signals", "trace"}:
+    signals counts each kind of evidence, None for checks not run because the page
+    was already likely; "trace" holds the timing spans (not part of the cached result).
+    """
+    with start_trace() as trace:
+        result = _triage_page(doc_id, page)
+    result["trace"] = trace.to_dict()
+    return result
+
+
+def _triage_page(doc_id, page):
+    with span("pdf_open"):
+        doc = pipeline._open_page_document(doc_id, page)
+    signals = dict.fromkeys(SIGNAL_WEIGHTS)
+
+    def decided():
+        return _score(signals) >= TRIAGE_MIN_SCORE
+
+    with span("triage_text_layer"):
+        # Shares the worker's page-words cache with a later extract_page of the same page
+        licenses = get_stamp_bboxes_from_pdf(doc, page, dpi=pipeline.DETECT_DPI)
+    signals["named_license"] = sum(1 for s in licenses if s["name"])
+    signals["license"] = len(licenses) - signals["named_license"]
+
+    if not decided():
+        with span("triage_images"):
+            images = pipeline._title_block_images(doc, page)
+        signals["seal_image"] = sum(1 for p in images if pipeline._seal_sized(p))
+        signals["image"] = len(images) - signals["seal_image"]
+
+    page_w, page_h = get_page_pixel_size(doc, page, pipeline.DETECT_DPI)
+    if not decided() and pipeline.VECTOR_DETECTION:
+        with span("triage_vector"):
+            circles = get_vector_circles(doc, page, pipeline.DETECT_DPI, MIN_STAMP_RADIUS, MAX_STAMP_RADIUS)
+        signals["vector_circle"] = len(detect_stamp_region_from_circles(circles, (page_w, page_h)))
+
+    if not decided():
+        scale = TRIAGE_DPI / pipeline.DETECT_DPI
+        sx, sy, ww, wh = title_block_window(page_w, page_h)
+        window = (int(sx * scale), int(sy * scale), max(1, int(ww * scale)), max(1, int(wh * scale)))
+        with span("triage_raster"):
+            gray = render_region_gray(doc, page, TRIAGE_DPI, window)
+            signals["raster_circle"] = len(find_seal_circles(gray, scale=scale))
+
+    score = _score(signals)
+    return {"page": page, "score": score, "likely": score >= TRIAGE_MIN_SCORE, "signals": signals}
+
+
+def rank_pages(results):
+    """Triage results, most likely first (page order among equal scores)."""
+    return sorted(results, key=lambda r: (-r["score"], r["page"]))
@@ -0,0 +1,74 @@
+"""
+Stamp vocabulary: the words that are never part of an engineer's name, the license
+number formats and the numbers to ignore, per licensing state. Loaded from JSON
+(stamp_vocabulary.json next to this file, or STAMP_VOCABULARY_PATH) and compiled
+once at import into frozensets and regexes, shared by the text-layer and OCR paths.
+
+File layout: {"common": {...}, "states": {"MA": {...}, ...}}, each section with any of
+  license_formats            {"text_layer": [regex], "ocr": [regex]}, matched whole
+                             (text layer) or between word boundaries (OCR)
+  year_prefixes              numbers starting like a year are dates, not licenses
+  skip_licenses              numbers that look like licenses but are not (town permits, ...)
+  name_blacklist             OCR lines that are stamp boilerplate or ring-text misreads
+  title_words                OCR lines that are a seal's title (discipline, board, ...)
+  text_layer_name_blacklist  text-layer words never taken as part of a name
+The common section and every state in STAMP_STATES are merged.
+"""
+import hashlib
+import json
+import os
+import re
+
+STAMP_VOCABULARY_PATH = os.environ.get(
+    "STAMP_VOCABULARY_PATH", os.path.join(os.path.dirname(__file__), "stamp_vocabulary.json")
+)
+# Licensing states whose vocabulary is applied, comma-separated keys of the file's "states"
+STAMP_STATES = [s.strip().upper() for s in os.environ.get("STAMP_STATES", "MA").split(",") if s.strip()]
+
+
+class Vocabulary:
+    def __init__(self, data, states):
+        unknown = [s for s in states if s not in data.get("states", {})]
+        if unknown:
+            raise ValueError(f"No stamp vocabulary for state(s) {unknown}")
+        sections = [data.get("common", {})] + [data["states"][s] for s in states]
+
+        def merged(key):
+            return [v for section in sections for v in section.get(key, [])]
+
+        def formats(kind):
+            return list(dict.fromkeys(p for section in sections for p in section.get("license_formats", {}).get(kind, [])))
+
+        self.states = tuple(states)
+        self.year_prefixes = tuple(dict.fromkeys(merged("year_prefixes")))
+        self.skip_licenses = frozenset(merged("skip_licenses"))
+        self.name_blacklist = frozenset(merged("name_blacklist"))
+        self.title_words = frozenset(merged("title_words"))
+        # Only ever checked together: one set lookup per candidate line
+        self.name_rejects = self.name_blacklist | self.title_words
+        self.text_layer_name_blacklist = frozenset(merged("text_layer_name_blacklist"))
+        self.text_layer_license = re.compile("|".join(f"(?:{p})" for p in formats("text_layer")))
+        self.ocr_license = re.compile(r"\b(?:" + "|".join(f"(?:{p})" for p in formats("ocr")) + r")\b")
+
+        # Part of the pipeline version: a vocabulary edit changes extraction results
+        canonical = {
+            "states": self.states,
+            "year_prefixes": self.year_prefixes,
+            "skip_licenses": sorted(self.skip_licenses),
+            "name_rejects": sorted(self.name_rejects),
+            "text_layer_name_blacklist": sorted(self.text_layer_name_blacklist),
+            "text_layer_license": self.text_layer_license.pattern,
+            "ocr_license": self.ocr_license.pattern,
+        }
+        self.fingerprint = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()[:16]
+
+    def is_year(self, number):
+        return number.startswith(self.year_prefixes)
+
+
+def load_vocabulary(path=STAMP_VOCABULARY_PATH, states=STAMP_STATES):
+    with open(path, encoding="utf-8") as f:
+        return Vocabulary(json.load(f), states)
+
+
+VOCABULARY = load_vocabulary()
@@ -0,0 +1,149 @@
+"""
+Startup warm-up. A cold container pays for importing OpenCV, MuPDF and the OCR
+bindings, spawning the worker pool and loading Tesseract's LSTM model on its first
+extraction. The lifespan runs warm_up() in the background instead: the API answers
+health checks straight away, and /ready reports 200 once every phase has finished.
+
+Phases, each timed and logged:
+  imports      the pipeline's heavy modules, in the API process
+  worker_pool  every pool worker imports the pipeline, loads the OCR engine and runs
+               detection + OCR on a tiny built-in image (see warm_worker)
+"""
+import asyncio
+import importlib
+import os
+import time
+
+from app.core.metrics import startup_phase_duration
+from app.core.worker_pool import worker_pool, PoolSaturated
+
+# Set to 0 to skip warm-up: /ready then reports ready at once and the first requests pay the cold start
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+
+# Imported off the app import path, so health checks do not wait on MuPDF, OpenCV or Tesseract
+# bindings (document_store and previews import pdf_handler only when first used)
+HEAVY_MODULES = ("numpy", "cv2", "fitz", "app.core.pipeline", "app.core.triage")
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.phase = None
+        self.phases_ms = {}
+        self.error = None
+        self.workers_warmed = 0
+
+    def to_dict(self):
+        return {
+            "ready": self.ready,
+            "phase": self.phase,
+            "phases_ms": self.phases_ms,
+            "workers_warmed": self.workers_warmed,
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
+
+
+def warm_worker():
+    """
+    Runs in a pool worker: import the pipeline, load the OCR engine and run the
+    detector, a MuPDF render and one OCR call on tiny built-in images.
+    Returns (pid, {phase: ms}).
+    """
+    phases = {}
+    start = time.perf_counter()
+
+    def lap(name):
+        nonlocal start
+        now = time.perf_counter()
+        phases[name] = round((now - start) * 1000, 1)
+        start = now
+
+    import cv2
+    import fitz
+    import numpy as np
+    from PIL import Image, ImageDraw
+    from app.core import pipeline
+    from app.core.layout_detector import detect_stamp_region_in_window, MIN_STAMP_RADIUS
+    from app.core.extractor import warm_ocr_threads
+    from app.core.ocr_engine import get_ocr_engine
+    lap("imports")
+
+    doc = fitz.open()
+    doc.new_page(width=72, height=72)
+    doc[0].get_pixmap(dpi=pipeline.DETECT_DPI, colorspace=fitz.csGRAY)
+    lap("render")
+
+    size = 4 * MIN_STAMP_RADIUS
+    ring = np.full((size, size), 255, dtype=np.uint8)
+    cv2.circle(ring, (size // 2, size // 2), MIN_STAMP_RADIUS + 10, 0, 3)
+    detect_stamp_region_in_window(ring, (0, 0), (size, size))
+    lap("detection")
+
+    engine = get_ocr_engine()
+    warm_ocr_threads()
+    lap("ocr_engine_load")
+
+    text = Image.new("L", (120, 24), 255)
+    ImageDraw.Draw(text).text((4, 6), "No. 12345", fill=0)
+    engine.recognize(text.resize((480, 96)))
+    lap("ocr")
+    return os.getpid(), phases
+
+
+async def _phase(name, coro):
+    readiness.phase = name
+    start = time.perf_counter()
+    result = await coro
+    seconds = time.perf_counter() - start
+    readiness.phases_ms[name] = round(seconds * 1000, 1)
+    startup_phase_duration.observe(seconds, name)
+    print(f"[STARTUP] {name}: {seconds * 1000:.0f} ms")
+    return result
+
+
+async def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        await asyncio.to_thread(importlib.import_module, name)
+
+
+async def _warm_one_worker():
+    while True:
+        try:
+            return await worker_pool.run(warm_worker)
+        except PoolSaturated as e:
+            # Early traffic already fills the pool, and is warming the workers as it goes
+            await asyncio.sleep(e.retry_after)
+
+
+async def _warm_pool():
+    # One task per worker: each keeps its worker busy for the model load, so they spread across the pool
+    results = await asyncio.gather(*(_warm_one_worker() for _ in range(worker_pool.size)))
+    pids = {pid for pid, _ in results}
+    readiness.workers_warmed = len(pids)
+    slowest = max(results, key=lambda r: sum(r[1].values()))[1]
+    print(f"[STARTUP]   {len(pids)}/{worker_pool.size} workers warmed, slowest: "
+          + ", ".join(f"{k} {v:.0f} ms" for k, v in slowest.items()))
+
+
+async def warm_up():
+    """Run every startup phase, then mark the service ready (or record why it is not)."""
+    if not WARMUP:
+        readiness.ready = True
+        return
+    start = time.perf_counter()
+    try:
+        await _phase("imports", _import_heavy_modules())
+        await _phase("worker_pool", _warm_pool())
+    except Exception as e:
+        # A pool that cannot load the OCR engine cannot extract; stay not-ready so traffic goes elsewhere
+        readiness.error = f"{type(e).__name__}: {e}"
+        print(f"[STARTUP ERROR] {readiness.phase}: {readiness.error}")
+        return
+    readiness.phase = None
+    readiness.ready = True
+    total = time.perf_counter() - start
+    readiness.phases_ms["total"] = round(total * 1000, 1)
+    print(f"[STARTUP] Ready in {total * 1000:.0f} ms")
@@ -0,0 +1,174 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Rendering, HoughCircles and Tesseract are CPU-bound and would otherwise block
+# the event loop, so they run in a process pool. Size it to the container's cores.
+WORKER_POOL_SIZE = max(1, int(os.environ.get("WORKER_POOL_SIZE", str(os.cpu_count() or 1))))
+# Requests waiting for a free worker; beyond this the server answers 503
+WORKER_QUEUE_DEPTH = max(0, int(os.environ.get("WORKER_QUEUE_DEPTH", str(WORKER_POOL_SIZE * 2))))
+WORKER_RETRY_AFTER_SECONDS = int(os.environ.get("WORKER_RETRY_AFTER_SECONDS", "5"))
+# How often a started map_unordered checks for a free slot when the pool is full with other work
+SLOT_POLL_SECONDS = 0.1
+
+
+class PoolSaturated(RuntimeError):
+    def __init__(self, retry_after):
+        super().__init__("Worker pool is saturated")
+        self.retry_after = retry_after
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+def _invoke(fn, args):
+    # Runs in the worker. Some library exceptions (e.g. pytesseract's) cannot be
+    # unpickled in the parent, which would mark the whole pool as broken.
+    try:
+        return fn(*args)
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise WorkerError(f"{type(e).__name__}: {e}") from None
+        raise
+
+
+class WorkerPool:
+    def __init__(self, size, queue_depth, retry_after):
+        self.size = size
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self._executor = None
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.size + self.queue_depth
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn, not fork: the parent runs uvicorn threads and holds open fitz documents
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    @property
+    def idle_workers(self):
+        return max(0, self.size - self._in_flight)
+
+    @property
+    def free_slots(self):
+        """Tasks that can still be submitted (running or queued) before PoolSaturated."""
+        return max(0, self.capacity - self._in_flight)
+
+    def ensure_capacity(self):
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturated(self.retry_after)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in a worker process, or raise PoolSaturated if the queue is full."""
+        self.ensure_capacity()
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), _invoke, fn, args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next request
+            self._executor = None
+            raise
+        finally:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def map_unordered(self, fn, arg_tuples, concurrency=None):
+        """
+        Run fn(*args) for every tuple in arg_tuples, keeping at most `concurrency`
+        tasks in the pool and never taking it past capacity, and yield (args, result, error)
+        as each one finishes. Raises PoolSaturated up front if the pool is already full;
+        once running, waits for a free slot instead.
+        """
+        self.ensure_capacity()
+
+        concurrency = max(1, concurrency or self.size)
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        remaining = iter(arg_tuples)
+        next_args = next(remaining, None)
+        pending = {}  # asyncio future -> (concurrent future, args)
+
+        def fill():
+            nonlocal next_args
+            # Other requests share the queue: stop at capacity, not only at `concurrency`
+            while next_args is not None and len(pending) < concurrency and self._in_flight < self.capacity:
+                self._in_flight += 1
+                cf = executor.submit(_invoke, fn, next_args)
+                pending[asyncio.wrap_future(cf)] = (cf, next_args)
+                next_args = next(remaining, None)
+
+        try:
+            fill()
+            while pending or next_args is not None:
+                if not pending:
+                    # All of ours finished while other requests filled the pool
+                    await asyncio.sleep(SLOT_POLL_SECONDS)
+                    fill()
+                    continue
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    _, args = pending.pop(fut)
+                    self._in_flight -= 1
+                    self.completed += 1
+                    error = fut.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        self._executor = None
+                        raise error
+                    yield args, (None if error else fut.result()), error
+                    fill()
+        finally:
+            # Client went away or a worker died: drop whatever has not started yet;
+            # tasks already running in a worker hold their slot until they finish
+            for fut, (cf, _) in pending.items():
+                if cf.cancel():
+                    self._in_flight -= 1
+                else:
+                    cf.add_done_callback(lambda _: self._release_from_thread(loop))
+                fut.cancel()
+
+    def _release_from_thread(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # loop closed at shutdown
+
+    def _release(self):
+        self._in_flight -= 1
+        self.completed += 1
+
+    def stats(self):
+        running = min(self._in_flight, self.size)
+        return {
+            "workers": self.size,
+            "queue_depth": self.queue_depth,
+            "running": running,
+            "queued": self._in_flight - running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+worker_pool = WorkerPool(WORKER_POOL_SIZE, WORKER_QUEUE_DEPTH, WORKER_RETRY_AFTER_SECONDS)
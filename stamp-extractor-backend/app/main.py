@@ -1,8 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.middleware import RequestMetricsMiddleware, UploadSizeLimitMiddleware
 from app.routes import router
+from app.core.document_store import MAX_UPLOAD_MB
+from app.core.jobs import job_runner, JOB_RUNNER
+from app.core.warmup import warm_up
+from app.core.worker_pool import worker_pool
 
-app = FastAPI(title="Structural Stamp Extractor API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: health checks are answered at once, /ready flips when done
+    warmup_task = asyncio.create_task(warm_up())
+    # Picks up queued jobs, including pages left unfinished by the previous process
+    if JOB_RUNNER:
+        job_runner.start()
+    yield
+    warmup_task.cancel()
+    await job_runner.stop()
+    worker_pool.shutdown()
+
+
+app = FastAPI(title="Structural Stamp Extractor API", lifespan=lifespan)
+
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_MB * 1024 * 1024)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,52 +1,281 @@
+import asyncio
 import base64
+import json
 from io import BytesIO
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from app.core.pdf_handler import open_pdf, render_page_to_image, crop_bbox, get_stamp_bboxes_from_pdf
-from app.core.layout_detector import detect_stamp_region
-from app.core.ocr_pipeline import preprocess_for_ocr
-from app.core.extractor import extract_fields_with_boxes
+from typing import Optional
+from fastapi import (
+    APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Request, Response, WebSocket, WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.document_store import document_store, DocumentNotFound, InvalidPage, UploadTooLarge
+from app.core.jobs import (
+    job_store, job_runner, parse_page_selection,
+    JOB_PRIORITIES, JOB_TRIAGE_MODES, JOB_POLL_SECONDS, JOB_RUNNER, FINISHED_STATES,
+)
+from app.core.metrics import record_trace, record_page_result, render_metrics
+from app.core.previews import (
+    render_previews, read_preview, has_previews, preview_etag,
+    PREVIEW_SIZES, PREVIEW_FORMATS, PREVIEW_PRERENDER, PREVIEW_VERSION, PREVIEW_UNVERSIONED_MAX_AGE,
+)
+from app.core.result_cache import result_cache
+from app.core.tracing import start_trace, span
+from app.core.warmup import readiness
+from app.core.worker_pool import worker_pool, PoolSaturated
 from app.schemas import StampResponse, StampInfo
-from PIL import Image
 
 router = APIRouter()
-PREVIEW_DPI = 100  # Very low DPI for fast page previews
-DETECT_DPI = 150  # Low DPI for fast region detection
-OCR_DPI = 600     # High DPI for accurate OCR on cropped regions only
+
+TRIAGE_MODES = ("skip", "order", "off")
+
+def _pipeline():
+    # OpenCV and the OCR bindings come in with the pipeline: imported by the startup
+    # warm-up (or the first request that needs it), not on the app import path
+    from app.core import pipeline
+    return pipeline
+
+def _triage():
+    from app.core import triage
+    return triage
 
 @router.get("/")
 async def root():
+    # Liveness: answers as soon as the app is imported, warm or not
     return {"message": "Stamp Extractor API - Precise Multi-Stamp Ready", "status": "ok"}
 
+@router.get("/ready")
+async def ready():
+    # Readiness: 200 once the pipeline is imported and every worker has loaded the OCR engine
+    return JSONResponse(readiness.to_dict(), status_code=200 if readiness.ready else 503)
+
+@router.get("/stats")
+async def stats():
+    # Pool occupancy is what we size containers by; document LRU is the main process's
+    return {
+        "worker_pool": worker_pool.stats(),
+        "documents": document_store.stats(),
+        "result_cache": {**result_cache.stats(), "pipeline_version": _pipeline().PIPELINE_VERSION},
+        "jobs": {**job_store.stats(), "runner": job_runner.stats() if JOB_RUNNER else None},
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text format; stage spans come back from the workers with each page result
+    return PlainTextResponse(render_metrics(worker_pool.stats()), media_type="text/plain; version=0.0.4")
+
+async def _resolve_document(file: Optional[UploadFile], doc_id: Optional[str]):
+    """
+    Returns the doc_id for either a stored doc_id or a fresh upload.
+    Uploads are stored too, so repeated uploads of the same PDF reuse the opened document.
+    """
+    if doc_id:
+        if not document_store.has(doc_id):
+            raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+        return doc_id
+    if file is None:
+        raise HTTPException(status_code=400, detail="Provide either a PDF file or a doc_id")
+    doc_id, _ = await _store_upload(file)
+    return doc_id
+
+async def _store_upload(file: UploadFile):
+    """Copy an upload into the document store in chunks, off the event loop. Returns (doc_id, size_bytes)."""
+    try:
+        return await run_in_threadpool(document_store.put_file, file.file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def _busy(e: PoolSaturated):
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, retry later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+async def _run_in_pool(fn, *args):
+    """Dispatch CPU-bound work to the worker pool, mapping pool errors to HTTP responses."""
+    try:
+        return await worker_pool.run(fn, *args)
+    except PoolSaturated as e:
+        raise _busy(e)
+    except InvalidPage:
+        raise HTTPException(status_code=400, detail="Invalid page number")
+
+async def _triage_pages(doc_id, pages):
+    """
+    Triage results for pages, from the result cache or else the worker pool, in no
+    particular order. A page whose triage fails counts as likely, so it is never skipped for it.
+    """
+    triage = _triage()
+    results = []
+    tasks = []
+    for p in pages:
+        cached = await run_in_threadpool(result_cache.get, doc_id, p, triage.TRIAGE_VERSION)
+        if cached is None:
+            tasks.append((doc_id, p))
+        else:
+            results.append(cached)
+
+    async for (_, page), result, error in worker_pool.map_unordered(triage.triage_page, tasks):
+        if error is not None:
+            print(f"[TRIAGE ERROR] {doc_id[:12]}... page {page}: {type(error).__name__}: {error}")
+            results.append({"page": page, "score": 1.0, "likely": True, "signals": {}, "error": str(error)})
+            continue
+        record_trace(result.pop("trace"))
+        await run_in_threadpool(result_cache.put, doc_id, page, triage.TRIAGE_VERSION, result)
+        results.append(result)
+    return results
+
+def _stream_event(kind, payload, fmt):
+    if fmt == "sse":
+        return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": kind, **payload}) + "\n"
+
+async def _prerender_previews(doc_id, page_count):
+    """
+    Fill the preview cache for every page, one page at a time and only while a
+    worker is idle, so page flips are instant without delaying interactive requests.
+    """
+    for page in range(page_count):
+        if has_previews(doc_id, page):
+            continue
+        while worker_pool.idle_workers == 0:
+            await asyncio.sleep(0.5)
+        try:
+            await worker_pool.run(render_previews, doc_id, page)
+        except PoolSaturated as e:
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            print(f"[PREVIEW ERROR] {doc_id[:12]}... page {page}: {type(e).__name__}: {e}")
+            return
+    print(f"[PREVIEW] Pre-rendered {page_count} pages of {doc_id[:12]}...")
+
+@router.post("/documents")
+async def upload_document(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    try:
+        doc_id, size = await _store_upload(file)
+        doc = document_store.open(doc_id)
+        print(f"[DOCUMENT] Stored {doc_id[:12]}... ({size/1024:.1f} KB, {len(doc)} pages)")
+        if PREVIEW_PRERENDER:
+            background_tasks.add_task(_prerender_previews, doc_id, len(doc))
+        return {"doc_id": doc_id, "page_count": len(doc), "size_bytes": size, "preview_version": PREVIEW_VERSION}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.head("/documents/{doc_id}")
+async def has_document(doc_id: str):
+    # Cheap existence check so clients can skip re-uploading a known SHA-256
+    if not document_store.has(doc_id):
+        return Response(status_code=404)
+    return Response(status_code=200)
+
+@router.get("/documents/{doc_id}")
+async def get_document(doc_id: str):
+    try:
+        return {"doc_id": doc_id, "size_bytes": document_store.size_of(doc_id), "preview_version": PREVIEW_VERSION}
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+
+@router.get("/documents/{doc_id}/pages/{page}/preview")
+async def get_page_preview(doc_id: str, page: int, request: Request, size: str = "viewer", format: str = "jpeg",
+                           v: Optional[str] = None):
+    """
+    Raw preview image bytes. size: "viewer" (PREVIEW_DPI) or "thumb" (thumbnail strip);
+    format: "jpeg" or "webp". Served with an ETag; with v set to the current
+    PREVIEW_VERSION (returned on upload) the URL names one exact image, so it is also
+    cached as immutable. Without it, caches revalidate after a few minutes.
+    """
+    if size not in PREVIEW_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {list(PREVIEW_SIZES)}")
+    if format not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(PREVIEW_FORMATS)}")
+    try:
+        # Opening parses the PDF on a cache miss: off the event loop
+        doc = await run_in_threadpool(document_store.open, doc_id)
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+    # Checked before the ETag: a deterministic ETag must not turn a bad page into a 304
+    if page < 0 or page >= len(doc):
+        raise HTTPException(status_code=400, detail="Invalid page number")
+
+    etag = preview_etag(doc_id, page, size, format)
+    if v == PREVIEW_VERSION:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = f"public, max-age={PREVIEW_UNVERSIONED_MAX_AGE}"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data = await run_in_threadpool(read_preview, doc_id, page, size, format)
+    if data is None:
+        await _run_in_pool(render_previews, doc_id, page, format)
+        data = await run_in_threadpool(read_preview, doc_id, page, size, format)
+    return Response(content=data, media_type=PREVIEW_FORMATS[format], headers=headers)
+
+@router.get("/documents/{doc_id}/triage")
+async def get_document_triage(doc_id: str, first_page: int = 0, last_page: Optional[int] = None):
+    """
+    Stamp likelihood of every page (or an inclusive page range) from cheap signals:
+    text-layer license numbers, title-block images and vector circles, and a
+    coarse circle check. Pages come most likely first.
+    """
+    if not document_store.has(doc_id):
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+    page_count = len(document_store.open(doc_id))
+    if last_page is None:
+        last_page = page_count - 1
+    if first_page < 0 or last_page >= page_count or first_page > last_page:
+        raise HTTPException(status_code=400, detail="Invalid page range")
+
+    triage = _triage()
+    try:
+        results = triage.rank_pages(await _triage_pages(doc_id, range(first_page, last_page + 1)))
+    except PoolSaturated as e:
+        raise _busy(e)
+    likely = sorted(r["page"] for r in results if r["likely"])
+    print(f"[TRIAGE] {doc_id[:12]}...: {len(likely)}/{len(results)} pages likely to carry a stamp")
+    return {
+        "doc_id": doc_id,
+        "min_score": triage.TRIAGE_MIN_SCORE,
+        "likely_pages": likely,
+        "pages": results,
+    }
+
 @router.post("/get-info")
-async def get_pdf_info(file: UploadFile = File(...)):
+async def get_pdf_info(file: Optional[UploadFile] = File(None), doc_id: Optional[str] = Form(None)):
     try:
-        contents = await file.read()
-        doc = open_pdf(contents)
-        return {"page_count": len(doc)}
+        doc_id = await _resolve_document(file, doc_id)
+        doc = document_store.open(doc_id)
+        return {"page_count": len(doc), "doc_id": doc_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/get-page-image")
-async def get_page_image(file: UploadFile = File(...), page: int = Form(...)):
+async def get_page_image(
+    file: Optional[UploadFile] = File(None),
+    page: int = Form(...),
+    doc_id: Optional[str] = Form(None),
+):
     import traceback
     try:
         print(f"[IMAGE] Request for page {page}")
-        contents = await file.read()
-        print(f"[IMAGE] PDF loaded: {len(contents)/1024:.1f} KB")
-
-        doc = open_pdf(contents)
-        if page < 0 or page >= len(doc):
-            raise HTTPException(status_code=400, detail="Invalid page number")
+        doc_id = await _resolve_document(file, doc_id)
+        print(f"[IMAGE] PDF ready: {doc_id[:12]}...")
 
-        print(f"[IMAGE] Rendering page {page} at {PREVIEW_DPI} DPI...")
-        page_img = render_page_to_image(doc, page, dpi=PREVIEW_DPI)
+        jpeg_bytes = await run_in_threadpool(read_preview, doc_id, page, "viewer", "jpeg")
+        if jpeg_bytes is None:
+            await _run_in_pool(render_previews, doc_id, page)
+            jpeg_bytes = await run_in_threadpool(read_preview, doc_id, page, "viewer", "jpeg")
+        from PIL import Image
+        width, height = Image.open(BytesIO(jpeg_bytes)).size
+        img_str = base64.b64encode(jpeg_bytes).decode()
 
-        buffered = BytesIO()
-        page_img.save(buffered, format="JPEG", quality=70, optimize=True)
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-
-        print(f"[IMAGE] Success! Page {page}: {page_img.size}, {len(img_str)/1024:.1f} KB base64")
-        return {"image": f"data:image/jpeg;base64,{img_str}", "width": page_img.width, "height": page_img.height}
+        print(f"[IMAGE] Success! Page {page}: ({width}, {height}), {len(img_str)/1024:.1f} KB base64")
+        return {"image": f"data:image/jpeg;base64,{img_str}", "width": width, "height": height}
     except HTTPException:
         raise
     except Exception as e:
@@ -55,111 +284,254 @@ async def get_page_image(file: UploadFile = File(...), page: int = Form(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/extract-stamp", response_model=StampResponse)
-async def extract_stamp(file: UploadFile = File(...), page: int = Form(...)):
+async def extract_stamp(
+    file: Optional[UploadFile] = File(None),
+    page: int = Form(...),
+    doc_id: Optional[str] = Form(None),
+    debug: bool = Form(False),
+):
     try:
-        import time
-        start = time.time()
         print(f"\n[EXTRACT] Starting extraction for page {page}...")
 
-        contents = await file.read()
-        print(f"[EXTRACT] PDF loaded ({len(contents)/1024:.1f} KB)")
+        with start_trace() as trace:
+            with span("upload_read", uploaded=file is not None and not doc_id):
+                doc_id = await _resolve_document(file, doc_id)
+            print(f"[EXTRACT] PDF ready ({doc_id[:12]}...)")
+
+            with span("result_cache_lookup"):
+                pipeline = _pipeline()
+                result = await run_in_threadpool(result_cache.get, doc_id, page, pipeline.PIPELINE_VERSION)
+            cached = result is not None
+            if cached:
+                print(f"[EXTRACT] Cache hit for page {page}")
+            else:
+                # Includes the wait for a free worker; the worker's own spans are merged below
+                with span("worker"):
+                    worker_start_ms = trace.elapsed_ms()
+                    result = await _run_in_pool(pipeline.extract_page, doc_id, page)
+                trace.merge(result.pop("trace"), offset_ms=worker_start_ms)
+                await run_in_threadpool(result_cache.put, doc_id, page, pipeline.PIPELINE_VERSION, result)
+
+            with span("response_build"):
+                response = {
+                    "page": result["page"],
+                    "stamps": [StampInfo(**s) for s in result["stamps"]],
+                    "raw_text": "Check logs",
+                    "units": "pixels",
+                    "raster_skipped": result["raster_skipped"],
+                    "ocr_regions_skipped": result["ocr_regions_skipped"],
+                    "cached": cached,
+                }
+
+        record_trace(trace.to_dict())
+        record_page_result(result, cached)
+        if debug:
+            response["spans"] = trace.spans
+        return response
 
-        doc = open_pdf(contents)
-        if page < 0 or page >= len(doc): raise HTTPException(status_code=400, detail="Invalid page number")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        import cv2
-        import numpy as np
-        import fitz
+@router.post("/extract-document")
+async def extract_document(
+    file: Optional[UploadFile] = File(None),
+    doc_id: Optional[str] = Form(None),
+    first_page: int = Form(0),
+    last_page: Optional[int] = Form(None),
+    format: str = Form("ndjson"),
+    debug: bool = Form(False),
+    triage: str = Form("skip"),
+):
+    """
+    Runs the per-page pipeline over a page range (inclusive) across the worker pool
+    and streams each page's stamps as it finishes, ending with a deduped summary.
+    format: "ndjson" (one JSON object per line) or "sse" (text/event-stream).
+    debug: include each page's worker spans in its event.
+    triage: "skip" (pages unlikely to carry a stamp are not extracted, the rest run
+    most likely first), "order" (every page, most likely first) or "off" (every
+    page, page order, no triage pass).
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    if triage not in TRIAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"triage must be one of {list(TRIAGE_MODES)}")
 
-        stamps_found = []
-        seen_licenses = set()
+    doc_id = await _resolve_document(file, doc_id)
+    page_count = len(document_store.open(doc_id))
+    if last_page is None:
+        last_page = page_count - 1
+    if first_page < 0 or last_page >= page_count or first_page > last_page:
+        raise HTTPException(status_code=400, detail="Invalid page range")
 
-        # ── Step 1: PDF text layer — exact positions + names, no OCR needed ──
-        print(f"[EXTRACT] Step 1: Checking PDF text layer...")
-        pdf_stamps = get_stamp_bboxes_from_pdf(doc, page, dpi=DETECT_DPI)
-        print(f"[EXTRACT] Found {len(pdf_stamps)} stamps in PDF text layer")
+    try:
+        worker_pool.ensure_capacity()
+    except PoolSaturated as e:
+        raise _busy(e)
+
+    pipeline = _pipeline()
+    pages = range(first_page, last_page + 1)
+    print(f"[DOCUMENT] Extracting {len(pages)} pages of {doc_id[:12]}...")
+
+    def page_event(result, trace=None):
+        stamps = [StampInfo(**s).model_dump() for s in result["stamps"]]
+        payload = {
+            "page": result["page"],
+            "stamps": stamps,
+            "units": "pixels",
+            "raster_skipped": result["raster_skipped"],
+            "ocr_regions_skipped": result["ocr_regions_skipped"],
+        }
+        if debug and trace:
+            payload["spans"] = trace["spans"]
+        return _stream_event("page", payload, format)
 
-        for ps in pdf_stamps:
-            rx, ry, rw, rh = ps["bbox"]
-            lic = ps["license"]
-            name = ps["name"]
-            if lic in seen_licenses:
+    async def events():
+        page_results = []
+        skipped = []
+        tasks = []
+        for p in pages:
+            cached = await run_in_threadpool(result_cache.get, doc_id, p, pipeline.PIPELINE_VERSION)
+            if cached is None:
+                tasks.append((doc_id, p))
                 continue
-            seen_licenses.add(lic)
-            stamps_found.append(StampInfo(
-                symbol_type="approval_stamp",
-                bounding_box=[rx, ry, rw, rh],
-                engineer_name=name,
-                license_number=lic
-            ))
-
-        # ── Step 2: Detect stamp regions at LOW DPI (fast) ──
-        print(f"[EXTRACT] Step 2: Rendering page at {DETECT_DPI} DPI for region detection...")
-        page_img_lowres = render_page_to_image(doc, page, dpi=DETECT_DPI)
-        print(f"[EXTRACT] Low-res page: {page_img_lowres.size}")
-
-        print(f"[EXTRACT] Step 3: Detecting stamp regions...")
-        img_bboxes = detect_stamp_region(page_img_lowres)
-        print(f"[EXTRACT] Found {len(img_bboxes)} regions")
-
-        # ── Step 3: Render and OCR ONLY the detected regions at HIGH DPI ──
-        print(f"[EXTRACT] Step 4: OCR on regions at {OCR_DPI} DPI...")
-        pdf_page = doc[page]
-        dpi_scale = OCR_DPI / DETECT_DPI
-
-        for i, region_bbox in enumerate(img_bboxes):
-            rx, ry, rw, rh = region_bbox
-
-            # Scale bbox to high DPI coordinates
-            rx_hd = int(rx * dpi_scale)
-            ry_hd = int(ry * dpi_scale)
-            rw_hd = int(rw * dpi_scale)
-            rh_hd = int(rh * dpi_scale)
-
-            # Render ONLY this region at high DPI
-            # Convert pixels back to PDF coordinates
-            scale_to_pdf = 72.0 / OCR_DPI
-            pdf_rect = fitz.Rect(
-                rx_hd * scale_to_pdf,
-                ry_hd * scale_to_pdf,
-                (rx_hd + rw_hd) * scale_to_pdf,
-                (ry_hd + rh_hd) * scale_to_pdf
-            )
-
-            # Render cropped region at high DPI
-            mat = fitz.Matrix(OCR_DPI / 72.0, OCR_DPI / 72.0)
-            pix = pdf_page.get_pixmap(matrix=mat, clip=pdf_rect)
-            cropped_hd = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-            print(f"[EXTRACT]   Region {i+1}: {cropped_hd.size}")
-
-            # Run OCR on high-res crop
-            engineers = extract_fields_with_boxes(cropped_hd)
-            print(f"[EXTRACT]   Region {i+1} OCR found {len(engineers)} stamps")
-            for eng in engineers:
-                lic = eng["license_number"]
-                if lic in seen_licenses:
+            record_page_result(cached, cached=True)
+            page_results.append(cached)
+            yield page_event(cached)
+
+        # Cached pages are free either way; only the ones still to extract are triaged
+        ranked = None
+        if triage != "off" and tasks:
+            try:
+                ranked = _triage().rank_pages(await _triage_pages(doc_id, [p for _, p in tasks]))
+            except PoolSaturated:
+                # The headers are sent: extract every page rather than cut the stream off
+                print(f"[DOCUMENT] Pool saturated, extracting {len(tasks)} pages without triage")
+        if ranked is not None:
+            tasks = []
+            for t in ranked:
+                if triage == "skip" and not t["likely"]:
+                    skipped.append(t["page"])
+                    yield _stream_event("skipped", {"page": t["page"], "triage_score": t["score"]}, format)
+                else:
+                    tasks.append((doc_id, t["page"]))
+            print(f"[DOCUMENT] Triage: {len(tasks)} pages to extract, {len(skipped)} skipped")
+
+        # Each worker keeps the PDF in its own document LRU, so it is opened once per process
+        finished = set()
+        try:
+            async for (_, page), result, error in worker_pool.map_unordered(pipeline.extract_page, tasks):
+                finished.add(page)
+                if error is not None:
+                    yield _stream_event("error", {"page": page, "error": str(error)}, format)
                     continue
-                seen_licenses.add(lic)
-                rel_x, rel_y, rel_w, rel_h = eng["relative_bbox"]
-
-                # Bbox is relative to low-res coords (DETECT_DPI)
-                stamps_found.append(StampInfo(
-                    symbol_type="approval_stamp",
-                    bounding_box=[rx, ry, rw, rh],  # Use region bbox at DETECT_DPI
-                    engineer_name=eng["engineer_name"],
-                    license_number=lic
-                ))
-
-        elapsed = time.time() - start
-        print(f"[EXTRACT] Complete! Found {len(stamps_found)} total stamps in {elapsed:.2f}s\n")
-
-        return {
-            "page": page,
-            "stamps": stamps_found,
-            "raw_text": "Check logs",
-            "units": "pixels"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+                trace = result.pop("trace")
+                record_trace(trace)
+                record_page_result(result, cached=False)
+                await run_in_threadpool(result_cache.put, doc_id, page, pipeline.PIPELINE_VERSION, result)
+                page_results.append(result)
+                yield page_event(result, trace)
+        except PoolSaturated as e:
+            # Filled up while triage ran or cached pages streamed; the stream still ends with a summary
+            for _, page in tasks:
+                if page not in finished:
+                    yield _stream_event(
+                        "error", {"page": page, "error": "Server busy, retry later", "retry_after": e.retry_after}, format)
+        summary = pipeline.summarize_document(page_results)
+        summary["pages_skipped"] = sorted(skipped)
+        yield _stream_event("summary", summary, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    response: Response,
+    file: Optional[UploadFile] = File(None),
+    doc_id: Optional[str] = Form(None),
+    pages: Optional[str] = Form(None),
+    priority: str = Form("interactive"),
+    triage: str = Form("skip"),
+):
+    """
+    Queue extraction of a document's pages and return at once with a job_id.
+    pages: selection like "0-4,9" (0-indexed, inclusive ranges), default every page.
+    priority: "interactive" or "bulk" (backfills; only uses idle workers).
+    triage: "skip" (pages unlikely to carry a stamp are not extracted) or "off".
+    """
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(JOB_PRIORITIES)}")
+    if triage not in JOB_TRIAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"triage must be one of {list(JOB_TRIAGE_MODES)}")
+    doc_id = await _resolve_document(file, doc_id)
+    try:
+        selected = parse_page_selection(pages, len(document_store.open(doc_id)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = await run_in_threadpool(job_store.create, doc_id, selected, priority, triage)
+    job_runner.wake()
+    print(f"[JOBS] Queued {job_id[:12]}...: {len(selected)} pages of {doc_id[:12]}... ({priority})")
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return await run_in_threadpool(job_store.get, job_id)
+
+async def _get_job(job_id):
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job_id: {job_id}")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    # Progress counts while running; the document summary once done
+    return await _get_job(job_id)
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str):
+    """Every page's outcome so far: stamps for done pages, triage score for skipped ones, errors."""
+    job = await _get_job(job_id)
+    pages = []
+    for p in await run_in_threadpool(job_store.page_results, job_id):
+        entry = {"page": p["page"], "state": p["state"]}
+        if p["state"] == "done":
+            entry["stamps"] = [StampInfo(**s).model_dump() for s in p["result"]["stamps"]]
+            entry["units"] = "pixels"
+        elif p["state"] == "skipped":
+            entry["triage_score"] = p["result"]["triage_score"]
+        elif p["state"] == "error":
+            entry["error"] = p["error"]
+        pages.append(entry)
+    return {**job, "pages": pages}
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    # Pages already running finish and are kept; no further page starts
+    await _get_job(job_id)
+    cancelled = await run_in_threadpool(job_store.cancel, job_id)
+    job = await _get_job(job_id)
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Job already {job['state']}")
+    print(f"[JOBS] Cancelled {job_id[:12]}...")
+    return job
+
+@router.websocket("/jobs/{job_id}/events")
+async def job_events(websocket: WebSocket, job_id: str):
+    """Pushes the job's progress whenever it changes, then closes once the job has finished."""
+    await websocket.accept()
+    last = None
+    try:
+        while True:
+            job = await run_in_threadpool(job_store.get, job_id)
+            if job is None:
+                await websocket.send_json({"type": "error", "error": f"Unknown or expired job_id: {job_id}"})
+                break
+            if job != last:
+                await websocket.send_json({"type": "progress", **job})
+                last = job
+            if job["state"] in FINISHED_STATES:
+                break
+            await asyncio.sleep(JOB_POLL_SECONDS)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
@@ -1,14 +1,23 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class StampInfo(BaseModel):
     symbol_type: str
     bounding_box: List[int]
     engineer_name: Optional[str]
     license_number: Optional[str]
+    source: str = "ocr"  # "text_layer", "image" or "ocr": which path produced this stamp
+    ocr_dpi: Optional[int] = None  # rung of the OCR DPI ladder that produced the read
+    ocr_confidence: Optional[float] = None  # mean Tesseract word confidence of the license line
+    reused_from_page: Optional[int] = None  # page whose read of the same seal was reused instead of OCR
+    reuse_similarity: Optional[float] = None  # ink agreement with that page's seal crop, worst window (0-1)
 
 class StampResponse(BaseModel):
     page: int
     stamps: List[StampInfo]
     raw_text: Optional[str]
     units: str
+    raster_skipped: bool = False  # text layer covered the title block, no render/OCR ran
+    ocr_regions_skipped: int = 0  # detected regions not OCR'd because text-layer stamps covered them
+    cached: bool = False  # served from the result cache
+    spans: Optional[List[Dict[str, Any]]] = None  # per-stage timings, only with debug=true
@@ -0,0 +1,86 @@
+"""
+One OCR call per detected region vs. one call per page on a mosaic of all regions.
+Uses the scanned-seal sheets of the synthetic set, where the raster path runs,
+and checks that both paths read the same licenses and names per region.
+
+    python -m benchmarks.bench_mosaic --runs 3
+    OCR_BACKEND=pytesseract python -m benchmarks.bench_mosaic
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import fitz
+
+from app.core import extractor
+from app.core.extractor import extract_fields_batched, extract_fields_multi
+from app.core.layout_detector import detect_stamp_region_in_window, title_block_window
+from app.core.ocr_engine import get_ocr_engine
+from app.core.pdf_handler import get_page_pixel_size, render_region_gray
+from benchmarks.synthetic import make_benchmark_set
+
+DETECT_DPI = 150
+OCR_DPI = 300
+
+
+def page_crops(doc, page):
+    page_w, page_h = get_page_pixel_size(doc, page, DETECT_DPI)
+    window = title_block_window(page_w, page_h)
+    gray = render_region_gray(doc, page, DETECT_DPI, window)
+    regions = detect_stamp_region_in_window(gray, window[:2], (page_w, page_h))
+    scale = OCR_DPI / DETECT_DPI
+    return [
+        render_region_gray(doc, page, OCR_DPI, tuple(int(v * scale) for v in region))
+        for region in regions
+    ]
+
+
+def summary(results):
+    return [sorted((e["license_number"], e["engineer_name"]) for e in engineers) for engineers in results]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/tmp/bench_mosaic_set.pdf")
+    args = parser.parse_args()
+
+    extractor.OCR_MOSAIC = "1"  # force the mosaic path whatever the backend
+    truth = make_benchmark_set(args.path, sheets=("ansi-b",), rotations=(0, 90))
+    doc = fitz.open(args.path)
+    pages = [e["page"] for e in truth if not e["text_layer"] and not e["dense"]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        get_ocr_engine()
+        crops_by_page = [page_crops(doc, p) for p in pages]
+    regions = sum(len(c) for c in crops_by_page)
+    print(f"{get_ocr_engine().name}: {len(pages)} pages, {regions} regions, {args.runs} runs\n")
+
+    timings = {"per region": 0.0, "mosaic": 0.0}
+    outputs = {}
+    for _ in range(args.runs):
+        for name, fn in (
+            ("per region", lambda crops: [extract_fields_multi(c) for c in crops]),
+            ("mosaic", extract_fields_batched),
+        ):
+            results = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                for crops in crops_by_page:
+                    results.extend(fn(crops))
+                timings[name] += time.perf_counter() - start
+            outputs[name] = summary(results)
+
+    for name, total in timings.items():
+        print(f"{name:12s} {total / args.runs * 1000:9.1f} ms per set  "
+              f"({total / args.runs / regions * 1000:.1f} ms per region)")
+    print(f"\nspeedup: {timings['per region'] / timings['mosaic']:.2f}x")
+    same = sum(a == b for a, b in zip(outputs["per region"], outputs["mosaic"]))
+    print(f"identical per-region results: {same}/{regions}")
+    for i, (a, b) in enumerate(zip(outputs["per region"], outputs["mosaic"])):
+        if a != b:
+            print(f"  region {i}: per region {a} / mosaic {b}")
+
+
+if __name__ == "__main__":
+    main()
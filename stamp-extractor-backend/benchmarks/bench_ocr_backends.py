@@ -0,0 +1,73 @@
+"""
+Side-by-side timing of the OCR backends on the same stamp crop.
+
+    python -m benchmarks.bench_ocr_backends                      # synthetic seal
+    python -m benchmarks.bench_ocr_backends plans.pdf 4 --runs 10  # 600 DPI title-block crop
+"""
+import argparse
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.ocr_engine import create_ocr_engine, words_to_text
+
+
+def synthetic_seal(size=1400):
+    img = Image.new("L", (size, size), 255)
+    draw = ImageDraw.Draw(img)
+    c = size // 2
+    draw.ellipse((40, 40, size - 40, size - 40), outline=0, width=8)
+    draw.ellipse((180, 180, size - 180, size - 180), outline=0, width=4)
+    font = ImageFont.load_default(size=64)
+    draw.text((c, c - 80), "THOMAS MAHANNA", fill=0, font=font, anchor="mm")
+    draw.text((c, c + 40), "CIVIL", fill=0, font=font, anchor="mm")
+    draw.text((c, c + 140), "No. 39479", fill=0, font=font, anchor="mm")
+    return img
+
+
+def pdf_crop(path, page):
+    import fitz
+    doc = fitz.open(path)
+    pdf_page = doc[page]
+    r = pdf_page.rect
+    clip = fitz.Rect(r.x0 + r.width * 0.77, r.y0, r.x1, r.y0 + r.height * 0.6)
+    pix = pdf_page.get_pixmap(dpi=600, clip=clip)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("page", nargs="?", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    image = pdf_crop(args.pdf, args.page) if args.pdf else synthetic_seal()
+    print(f"Image: {image.size[0]}x{image.size[1]}, {args.runs} runs per backend\n")
+
+    for backend in ("tesserocr", "pytesseract"):
+        try:
+            start = time.perf_counter()
+            engine = create_ocr_engine(backend)
+            init_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"{backend:12s} unavailable: {type(e).__name__}: {e}")
+            continue
+
+        timings = []
+        words = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            words = engine.recognize(image)
+            timings.append(time.perf_counter() - start)
+
+        text = words_to_text(words).replace("\n", " | ")
+        print(f"{backend:12s} init {init_s*1000:7.1f} ms   "
+              f"median {statistics.median(timings)*1000:7.1f} ms   "
+              f"min {min(timings)*1000:7.1f} ms   words {len(words)}")
+        print(f"{'':12s} {text[:100]}")
+
+
+if __name__ == "__main__":
+    main()
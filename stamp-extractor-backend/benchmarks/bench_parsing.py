@@ -0,0 +1,170 @@
+"""
+Post-OCR parsing on large word sets, no Tesseract needed: line grouping and the
+license/name search with dicts per line and the vocabulary rebuilt as lists per
+candidate line vs. the columnar line grouping and compiled vocabulary in
+app/core/extractor.py. TSV parsing is timed too, for its share of the stage.
+The synthetic TSV mimics a tiled title block: stamp lines (name, license)
+scattered through title-block and note text, many lines per block.
+
+    python -m benchmarks.bench_parsing --words 50000 --stamps 40
+"""
+import argparse
+import random
+import re
+import time
+
+from app.core.extractor import clean_scattered_text, extract_fields_from_words
+from app.core.ocr_engine import parse_tsv, TSV_COLUMNS
+from app.core.vocabulary import VOCABULARY
+
+FIRST_NAMES = ["THOMAS", "MARIA", "JAMES", "LINDA", "ROBERT", "SUSAN", "DAVID", "KAREN"]
+LAST_NAMES = ["MAHANNA", "OKAFOR", "LINDQVIST", "BERNARD", "CHEN", "ROSSI", "PATEL", "NOVAK"]
+FILLER = [
+    "REVISION", "DESCRIPTION", "ISSUED", "FOR", "PERMIT", "DRAWN", "BY", "CHECKED", "SCALE", "AS", "NOTED",
+    "SHEET", "TYP.", "SEE", "DETAIL", "CONC.", "SLAB", "#5@12\"", "EQ.", "CLR.", "W12x26", "EL.", "2019",
+    "CIVIL", "ENGINEER", "COMMONWEALTH", "OF", "MASSACHUSETTS", "PROFESSIONAL", "T O M", "N0.", "0,",
+]
+
+
+def make_tsv(n_words, n_stamps, seed=0):
+    """Tesseract TSV (with header) of about n_words words, n_stamps of them seal name + license lines."""
+    rnd = random.Random(seed)
+    rows = ["\t".join(TSV_COLUMNS)]
+    block = line = 0
+    words = 0
+
+    def add_line(texts, x, y, conf=None):
+        nonlocal line, words
+        line += 1
+        for k, text in enumerate(texts):
+            c = conf if conf is not None else rnd.choice([-1, 35.5, 71.25, 88, 96.5])
+            rows.append("\t".join(map(str, [
+                5, 1, block, 1, line, k + 1, x + 80 * k, y, 70, 24, c, text])))
+            words += 1
+
+    stamp_every = max(1, n_words // max(1, n_stamps * 3))
+    while words < n_words:
+        block += 1
+        line = 0
+        bx, by = rnd.randint(0, 20000), rnd.randint(0, 20000)
+        for k in range(rnd.randint(4, 12)):
+            if rnd.randrange(stamp_every) == 0:
+                add_line([rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)], bx, by + 40 * k, conf=91)
+                add_line(["No.", str(rnd.randint(30000, 89999))], bx, by + 40 * k + 60, conf=93)
+            else:
+                add_line([rnd.choice(FILLER) for _ in range(rnd.randint(1, 6))], bx, by + 40 * k)
+    return "\n".join(rows)
+
+
+def _baseline_valid_name(clean_l):
+    # Vocabulary rebuilt as lists for every candidate line, inline regexes
+    blacklist, titles = list(VOCABULARY.name_blacklist), list(VOCABULARY.title_words)
+    if not clean_l or len(clean_l) < 2:
+        return False
+    if re.search(r'\bOF\b', clean_l) or re.search(r'\d', clean_l):
+        return False
+    if clean_l in blacklist or clean_l in titles:
+        return False
+    return len(re.sub(r'\s', '', clean_l)) >= 3
+
+
+def _baseline_name_near(lines, anchor_idx, lines_data):
+    candidates = []
+    anchor_x, anchor_y = lines_data[anchor_idx]["bbox"][:2]
+    for i, ld in enumerate(lines_data):
+        if i == anchor_idx:
+            continue
+        lx, ly, _, _ = ld["bbox"]
+        dy = anchor_y - ly
+        if dy < 0 or dy > 400 or abs(lx - anchor_x) > 300:
+            continue
+        clean_l = re.sub(r'[^A-Z\s\.]', '', lines[i].upper()).strip()
+        if _baseline_valid_name(clean_l):
+            candidates.append((dy, clean_l, i))
+    if candidates:
+        candidates.sort(key=lambda x: x[0])
+        best = sorted(candidates[:4], key=lambda x: x[2])
+        return " ".join(c[1] for c in best[:2])
+    for offset in range(1, 7):
+        for i in [anchor_idx - offset, anchor_idx + offset]:
+            if 0 <= i < len(lines):
+                clean_l = re.sub(r'[^A-Z\s\.]', '', lines[i].upper()).strip()
+                if _baseline_valid_name(clean_l):
+                    candidates.append((offset, clean_l, i))
+        if len(candidates) >= 2:
+            break
+    if not candidates:
+        return None
+    return " ".join(c[1] for c in sorted(candidates[:2], key=lambda x: x[2]))
+
+
+def baseline_extract_fields(words):
+    """Line grouping and license/name search with dicts per line."""
+    line_map = {}
+    for w in words:
+        line_map.setdefault((w["block_num"], w["line_num"]), []).append(w)
+    lines_data = []
+    for key in sorted(line_map):
+        lw = line_map[key]
+        confs = [w["conf"] for w in lw if w["conf"] >= 0]
+        lines_data.append({
+            "text": " ".join(w["text"] for w in lw),
+            "bbox": (min(w["left"] for w in lw), min(w["top"] for w in lw),
+                     sum(w["width"] for w in lw), max(w["height"] for w in lw)),
+            "conf": sum(confs) / len(confs) if confs else 0.0,
+        })
+    cleaned = [clean_scattered_text(ld["text"]) for ld in lines_data]
+    results, seen = [], set()
+    for i, text in enumerate(cleaned):
+        text = re.sub(r'[Nn][Oo0]\.?\s*', ' ', re.sub(r'[Oo0][\s,\.]+', ' ', text))
+        for lic in re.findall(r'\b\d{4,6}\b', text):
+            if len(lic) == 4 and lic.startswith(('19', '20')):
+                continue
+            if int(lic) < 1000 or lic in seen:
+                continue
+            lx, ly, lw, lh = lines_data[i]["bbox"]
+            results.append({
+                "engineer_name": _baseline_name_near(cleaned, i, lines_data),
+                "license_number": lic,
+                "relative_bbox": [lx - 50, ly - 200, lw + 100, lh + 400],
+                "confidence": lines_data[i]["conf"],
+            })
+            seen.add(lic)
+    return results
+
+
+def timed(fn, *args, runs=3):
+    best, result = float("inf"), None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def same(a, b):
+    key = lambda r: (r["license_number"], r["engineer_name"], r["relative_bbox"], round(r["confidence"], 6))
+    return [key(r) for r in a] == [key(r) for r in b]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument("--stamps", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tsv = make_tsv(args.words, args.stamps)
+    words, t_parse = timed(parse_tsv, tsv, runs=args.runs)
+    reference, t_old = timed(baseline_extract_fields, words, runs=args.runs)
+    results, t_new = timed(extract_fields_from_words, words, runs=args.runs)
+    print(f"TSV: {len(words)} words, vocabulary states {','.join(VOCABULARY.states)}\n")
+
+    print(f"parse_tsv           {t_parse*1000:9.1f} ms")
+    print(f"fields (baseline)   {t_old*1000:9.1f} ms")
+    print(f"fields (columnar)   {t_new*1000:9.1f} ms   {t_old / t_new:6.1f}x")
+    print(f"parse + fields      {(t_parse + t_old)*1000:9.1f} ms -> {(t_parse + t_new)*1000:.1f} ms")
+    print(f"\nresults identical: {same(reference, results)} ({len(results)} licenses)")
+
+if __name__ == "__main__":
+    main()
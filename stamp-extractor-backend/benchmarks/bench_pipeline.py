@@ -0,0 +1,304 @@
+"""
+Per-stage latency and license recall on a synthetic drawing set (see benchmarks.synthetic).
+
+Each stage is timed on its own so a regression can be pinned to one step:
+  render_page_to_image        full page at DETECT_DPI
+  detect_stamp_region         circle detection on that render; recall = seal centres inside a region
+  vector_detection            seal rings from the vector paths, no render; same recall
+  get_stamp_bboxes_from_pdf   text-layer lookup; recall over text-layer sheets only
+  extract_fields_multi        OCR of each seal, cropped at 300 DPI from the ground truth position
+  extract_seal_fields         the same crops read centre block first, then the unwrapped ring
+  endpoint                    POST /extract-stamp end to end, result cache off
+
+The JSON report is meant to be committed or kept per commit and diffed:
+
+    python -m benchmarks.bench_pipeline --out bench.json
+    python -m benchmarks.bench_pipeline --out bench-new.json --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import fitz
+
+from benchmarks.synthetic import make_benchmark_set
+
+STAGES = [
+    "render_page_to_image", "detect_stamp_region", "vector_detection", "get_stamp_bboxes_from_pdf",
+    "extract_fields_multi", "extract_seal_fields", "endpoint",
+]
+OCR_CROP_DPI = 300
+SEAL_MARGIN_PT = 10
+
+
+def latency_summary(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return {
+        "mean": round(statistics.fmean(ms), 2),
+        "p50": round(statistics.median(ms), 2),
+        "p95": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+        "max": round(ms[-1], 2),
+    }
+
+
+def recall_summary(hits):
+    """hits: [(variant, found)] -> overall recall plus recall per variant."""
+    by_variant = {}
+    for variant, found in hits:
+        by_variant.setdefault(variant, []).append(found)
+    return {
+        "recall": round(sum(f for _, f in hits) / len(hits), 3) if hits else None,
+        "recall_by_variant": {v: round(sum(f) / len(f), 3) for v, f in sorted(by_variant.items())},
+    }
+
+
+def _variant(entry):
+    return "text_layer" if entry["text_layer"] else "scanned"
+
+
+def _same_name(found, expected):
+    return bool(found) and " ".join(found.split()) == expected
+
+
+def _timed(fn, *args, **kwargs):
+    # Pipeline functions log every step; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def _region_hits(entry, regions, scale):
+    """(variant, found) per ground-truth seal: found when its centre lies inside a detected region."""
+    hits = []
+    for s in entry["stamps"]:
+        cx, cy = s["center_pt"][0] * scale, s["center_pt"][1] * scale
+        inside = any(x <= cx <= x + w and y <= cy <= y + h for x, y, w, h in regions)
+        hits.append((_variant(entry), inside))
+    return hits
+
+
+def _seal_bbox(stamp, dpi):
+    scale = dpi / 72.0
+    (cx, cy), r = stamp["center_pt"], stamp["radius_pt"] + SEAL_MARGIN_PT
+    return int((cx - r) * scale), int((cy - r) * scale), int(2 * r * scale), int(2 * r * scale)
+
+
+def bench_in_process(doc, truth, runs, stages):
+    from app.core.extractor import extract_fields_multi, extract_seal_fields_batched
+    from app.core.layout_detector import (
+        detect_stamp_region, detect_stamp_region_from_circles, MIN_STAMP_RADIUS, MAX_STAMP_RADIUS,
+    )
+    from app.core.pdf_handler import (
+        render_page_to_image, render_region_gray, get_stamp_bboxes_from_pdf, get_vector_circles,
+        get_page_pixel_size, _page_words_cache,
+    )
+    from app.core.pipeline import DETECT_DPI
+
+    report = {}
+    timings = {name: [] for name in stages}
+    detect_hits, vector_hits, text_hits, ocr_hits, ocr_names = [], [], [], [], []
+    seal_hits, seal_names = [], []
+    text_false_positives = 0
+    scale = DETECT_DPI / 72.0
+
+    for run in range(runs):
+        for entry in truth:
+            page = entry["page"]
+            expected = {s["license"] for s in entry["stamps"]}
+
+            if "render_page_to_image" in stages or "detect_stamp_region" in stages:
+                page_img, t = _timed(render_page_to_image, doc, page, dpi=DETECT_DPI)
+                if "render_page_to_image" in stages:
+                    timings["render_page_to_image"].append(t)
+                if "detect_stamp_region" in stages:
+                    regions, t = _timed(detect_stamp_region, page_img)
+                    timings["detect_stamp_region"].append(t)
+                    if run == 0:
+                        detect_hits.extend(_region_hits(entry, regions, scale))
+                del page_img
+
+            if "vector_detection" in stages:
+                def vector_detection():
+                    circles = get_vector_circles(doc, page, DETECT_DPI, MIN_STAMP_RADIUS, MAX_STAMP_RADIUS)
+                    return detect_stamp_region_from_circles(circles, get_page_pixel_size(doc, page, DETECT_DPI))
+                regions, t = _timed(vector_detection)
+                timings["vector_detection"].append(t)
+                if run == 0:
+                    vector_hits.extend(_region_hits(entry, regions, scale))
+
+            if "get_stamp_bboxes_from_pdf" in stages:
+                _page_words_cache.clear()
+                found, t = _timed(get_stamp_bboxes_from_pdf, doc, page, dpi=DETECT_DPI)
+                timings["get_stamp_bboxes_from_pdf"].append(t)
+                if run == 0 and entry["text_layer"]:
+                    licenses = {f["license"] for f in found}
+                    text_hits.extend((_variant(entry), lic in licenses) for lic in expected)
+                    text_false_positives += len(licenses - expected)
+
+            if "extract_fields_multi" in stages:
+                for s in entry["stamps"]:
+                    crop = render_region_gray(doc, page, OCR_CROP_DPI, _seal_bbox(s, OCR_CROP_DPI))
+                    engineers, t = _timed(extract_fields_multi, crop)
+                    timings["extract_fields_multi"].append(t)
+                    if run == 0:
+                        match = next((e for e in engineers if e["license_number"] == s["license"]), None)
+                        ocr_hits.append((_variant(entry), match is not None))
+                        ocr_names.append(match is not None and _same_name(match["engineer_name"], s["name"]))
+
+            if "extract_seal_fields" in stages:
+                for s in entry["stamps"]:
+                    x, y, w, _ = _seal_bbox(s, OCR_CROP_DPI)
+                    crop = render_region_gray(doc, page, OCR_CROP_DPI, (x, y, w, w))
+                    circle = (w / 2, w / 2, s["radius_pt"] * OCR_CROP_DPI / 72.0)
+                    (engineers,), t = _timed(extract_seal_fields_batched, [crop], [circle])
+                    timings["extract_seal_fields"].append(t)
+                    if run == 0:
+                        match = next((e for e in engineers or [] if e["license_number"] == s["license"]), None)
+                        seal_hits.append((_variant(entry), match is not None))
+                        seal_names.append(match is not None and _same_name(match["engineer_name"], s["name"]))
+
+    for name, samples in timings.items():
+        if samples:
+            report[name] = {"latency_ms": latency_summary(samples), "samples": len(samples)}
+    if detect_hits:
+        report["detect_stamp_region"].update(recall_summary(detect_hits))
+    if vector_hits:
+        report["vector_detection"].update(recall_summary(vector_hits))
+    if "get_stamp_bboxes_from_pdf" in report:
+        report["get_stamp_bboxes_from_pdf"].update(recall_summary(text_hits))
+        report["get_stamp_bboxes_from_pdf"]["false_positives"] = text_false_positives
+    if ocr_hits:
+        report["extract_fields_multi"].update(recall_summary(ocr_hits))
+        report["extract_fields_multi"]["name_accuracy"] = round(sum(ocr_names) / len(ocr_names), 3)
+    if seal_hits:
+        report["extract_seal_fields"].update(recall_summary(seal_hits))
+        report["extract_seal_fields"]["name_accuracy"] = round(sum(seal_names) / len(seal_names), 3)
+    return report
+
+
+def bench_endpoint(pdf_path, truth, runs):
+    # Every request has to run the pipeline, and previews would compete for workers
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    os.environ["PREVIEW_PRERENDER"] = "0"
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    timings, hits, names = [], [], []
+    with TestClient(app) as client, open(pdf_path, "rb") as f:
+        doc_id = client.post("/documents", files={"file": ("set.pdf", f, "application/pdf")}).json()["doc_id"]
+        # Warm-up: spawns the pool and loads the OCR model, which is not what we measure
+        client.post("/extract-stamp", data={"doc_id": doc_id, "page": truth[0]["page"]})
+        for run in range(runs):
+            for entry in truth:
+                start = time.perf_counter()
+                resp = client.post("/extract-stamp", data={"doc_id": doc_id, "page": entry["page"]})
+                timings.append(time.perf_counter() - start)
+                resp.raise_for_status()
+                if run:
+                    continue
+                stamps = {s["license_number"]: s for s in resp.json()["stamps"]}
+                for s in entry["stamps"]:
+                    match = stamps.get(s["license"])
+                    hits.append((_variant(entry), match is not None))
+                    names.append(match is not None and _same_name(match["engineer_name"], s["name"]))
+
+    return {
+        "latency_ms": latency_summary(timings),
+        "samples": len(timings),
+        **recall_summary(hits),
+        "name_accuracy": round(sum(names) / len(names), 3) if names else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    base_stages = (baseline or {}).get("stages", {})
+    header = f"{'stage':28s} {'p50 ms':>9s} {'p95 ms':>9s} {'recall':>7s}"
+    if baseline:
+        header += f" {'p50 vs base':>12s} {'recall vs base':>15s}"
+    print(header)
+    for name in STAGES:
+        stage = report["stages"].get(name)
+        if stage is None:
+            continue
+        recall = stage.get("recall")
+        line = f"{name:28s} {stage['latency_ms']['p50']:9.1f} {stage['latency_ms']['p95']:9.1f} " \
+               f"{'-' if recall is None else f'{recall:.3f}':>7s}"
+        base = base_stages.get(name)
+        if base:
+            change = (stage["latency_ms"]["p50"] / base["latency_ms"]["p50"] - 1) * 100
+            line += f" {change:+11.1f}%"
+            if recall is not None and base.get("recall") is not None:
+                line += f" {recall - base['recall']:+15.3f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="bench_pipeline.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--sheets", default="ansi-b,arch-e")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf", default="/tmp/bench_pipeline_set.pdf")
+    args = parser.parse_args()
+    stages = args.stages.split(",")
+
+    truth = make_benchmark_set(args.pdf, sheets=args.sheets.split(","), seed=args.seed)
+    doc = fitz.open(args.pdf)
+    seals = sum(len(e["stamps"]) for e in truth)
+    print(f"Synthetic set: {len(truth)} pages, {seals} seals, {args.runs} runs\n")
+
+    results = bench_in_process(doc, truth, args.runs, [s for s in stages if s != "endpoint"])
+    if "endpoint" in stages:
+        results["endpoint"] = bench_endpoint(args.pdf, truth, args.runs)
+
+    from app.core.ocr_engine import get_ocr_engine
+    from app.core.pipeline import PIPELINE_VERSION
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "pipeline_version": PIPELINE_VERSION,
+            "ocr_backend": get_ocr_engine().name,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "sheets": args.sheets.split(","),
+            "pages": len(truth),
+            "seals": seals,
+            "runs": args.runs,
+        },
+        "stages": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
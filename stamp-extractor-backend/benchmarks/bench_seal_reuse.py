@@ -0,0 +1,110 @@
+"""
+Seal reuse check: do signatures (app/core/stamp_fingerprints.py) keep seals from one
+state template apart while still matching the same seal on another sheet? Seals are
+drawn with benchmarks.synthetic (same state and discipline, different engineers),
+placed at fractional offsets on each sheet and cropped around a circle found a few
+pixels off, as the detector would. Compared pairs:
+
+  same seal        the seal on another sheet, crop jittered
+  same seal, scan  the seal pasted in as a scanned image, read from native pixels
+  one digit        same engineer, license differing in one digit
+  other engineer   another name and license from the same template
+
+Exits non-zero if any different seal reaches STAMP_REUSE_MIN_SIMILARITY or any same
+seal falls below it.
+
+    python -m benchmarks.bench_seal_reuse --engineers 12
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import fitz
+
+from app.core.layout_detector import _circle_bbox
+from app.core.pdf_handler import get_image_placements, get_placed_image_gray, render_region_gray
+from app.core.stamp_fingerprints import seal_signature, similarity, SIGNATURE_DPI, STAMP_REUSE_MIN_SIMILARITY
+from benchmarks.synthetic import draw_seal, paste_scanned_seal, FIRST_NAMES, LAST_NAMES, SEAL_RADIUS_IN
+
+DETECT_DPI = 150
+SHEET = 5 * 72  # points; a title-block corner is enough
+STATE, DISCIPLINE = "COMMONWEALTH OF MASSACHUSETTS", "STRUCTURAL"
+
+
+def seal_page(name, license_number, offset=(0.0, 0.0), scanned=False):
+    doc = fitz.open()
+    page = doc.new_page(width=SHEET, height=SHEET)
+    center = (SHEET / 2 + offset[0], SHEET / 2 + offset[1])
+    seal = dict(name=name, license_number=license_number, discipline=DISCIPLINE, state=STATE)
+    if scanned:
+        paste_scanned_seal(page, center, SEAL_RADIUS_IN * 72, **seal)
+    else:
+        draw_seal(page, center, SEAL_RADIUS_IN * 72, **seal)
+    return doc, center
+
+
+def detected_crop(doc, center, jitter=(0, 0, 0)):
+    """The seal's region as the pipeline renders it for its signature, from a circle found slightly off."""
+    scale = DETECT_DPI / 72
+    cx, cy = int(center[0] * scale) + jitter[0], int(center[1] * scale) + jitter[1]
+    r = int(SEAL_RADIUS_IN * DETECT_DPI) + jitter[2]
+    side = int(SHEET * scale)
+    region = _circle_bbox(cx, cy, r, side, side)
+    f = SIGNATURE_DPI / DETECT_DPI
+    return render_region_gray(doc, 0, SIGNATURE_DPI, tuple(int(v * f) for v in region))
+
+
+def signature(name, license_number, rnd, scanned=False):
+    doc, center = seal_page(name, license_number, (rnd.random() * 3, rnd.random() * 3), scanned)
+    if scanned:
+        arr, dpi = get_placed_image_gray(doc, get_image_placements(doc, 0, DETECT_DPI)[0], max_dpi=600)
+        return seal_signature(arr, dpi)
+    return seal_signature(detected_crop(doc, center, (rnd.randint(-3, 3), rnd.randint(-3, 3), rnd.randint(-2, 2))))
+
+
+def one_digit_off(license_number, rnd):
+    k = rnd.randrange(len(license_number))
+    digit = rnd.choice([d for d in "0123456789" if d != license_number[k]])
+    return license_number[:k] + digit + license_number[k + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engineers", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    people = [(f"{first} {last}", str(rnd.randint(30000, 89999)))
+              for first, last in itertools.islice(itertools.product(FIRST_NAMES, LAST_NAMES), args.engineers)]
+    base = {p: signature(*p, rnd) for p in people}
+
+    pairs = {"same seal": [], "same seal, scan": [], "one digit": [], "other engineer": []}
+    start = time.perf_counter()
+    for name, lic in people:
+        ref = base[(name, lic)]
+        for _ in range(3):
+            pairs["same seal"].append(similarity(ref, signature(name, lic, rnd)))
+        scan = signature(name, lic, rnd, scanned=True)
+        pairs["same seal, scan"].append(similarity(scan, signature(name, lic, rnd, scanned=True)))
+        for _ in range(5):
+            pairs["one digit"].append(similarity(ref, signature(name, one_digit_off(lic, rnd), rnd)))
+    for a, b in itertools.combinations(people, 2):
+        pairs["other engineer"].append(similarity(base[a], base[b]))
+    compares = sum(len(v) for v in pairs.values())
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(people)} engineers, one template ({STATE}, {DISCIPLINE}), threshold {STAMP_REUSE_MIN_SIMILARITY}\n")
+    for kind, sims in pairs.items():
+        print(f"{kind:16s} n={len(sims):4d}  min {min(sims):.3f}  max {max(sims):.3f}")
+    print(f"\n{compares} comparisons incl. rendering, {1000 * elapsed / compares:.1f} ms each")
+
+    wrong = (sum(s < STAMP_REUSE_MIN_SIMILARITY for k in ("same seal", "same seal, scan") for s in pairs[k])
+             + sum(s >= STAMP_REUSE_MIN_SIMILARITY for k in ("one digit", "other engineer") for s in pairs[k]))
+    print(f"separated at threshold: {not wrong} ({wrong} pairs on the wrong side)")
+    sys.exit(1 if wrong else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Text-layer name lookup on a dense CAD-style sheet: brute-force O(words x candidates)
+scan vs. the grid index in get_stamp_bboxes_from_pdf (cold and cached).
+
+    python -m benchmarks.bench_spatial_index --words 30000 --licenses 400
+"""
+import argparse
+import random
+import re
+import time
+
+import fitz
+
+from app.core.pdf_handler import get_stamp_bboxes_from_pdf, _page_words_cache
+
+FIRST_NAMES = ["THOMAS", "MARIA", "JAMES", "LINDA", "ROBERT", "SUSAN", "DAVID", "KAREN"]
+LAST_NAMES = ["MAHANNA", "OKAFOR", "LINDQVIST", "BERNARD", "CHEN", "ROSSI", "PATEL", "NOVAK"]
+NOTE_WORDS = ["TYP.", "SEE", "DETAIL", "CONC.", "SLAB", "#5@12\"", "EQ.", "CLR.", "W12x26", "EL."]
+
+
+def make_dense_sheet(path, n_words, n_licenses, seed=0):
+    """E-size (48x36in) sheet full of dimension/note text with scattered 5-digit numbers."""
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    page = doc.new_page(width=48 * 72, height=36 * 72)
+    font = fitz.Font("helv")
+
+    items = []
+    for _ in range(n_words - n_licenses * 3):
+        x, y = rnd.uniform(20, 3400), rnd.uniform(20, 2570)
+        if rnd.random() < 0.3:
+            text = f"{rnd.randint(1, 99)}'-{rnd.randint(0, 11)}\""
+        else:
+            text = rnd.choice(NOTE_WORDS)
+        items.append(((x, y), text, 4))
+    for _ in range(n_licenses):
+        x, y = rnd.uniform(40, 3380), rnd.uniform(40, 2550)
+        items.append(((x, y - 14), rnd.choice(FIRST_NAMES), 6))
+        items.append(((x, y - 7), rnd.choice(LAST_NAMES), 6))
+        items.append(((x, y), f"{rnd.randint(30000, 89999)}", 6))
+
+    # TextWriter re-bounds all of its text on every append, so write in small batches
+    for start in range(0, len(items), 500):
+        tw = fitz.TextWriter(page.rect)
+        for pos, text, size in items[start:start + 500]:
+            tw.append(pos, text, font=font, fontsize=size)
+        tw.write_text(page)
+    doc.save(path)
+
+
+def brute_force_stamp_bboxes(doc, page_number, dpi=150):
+    """The pre-index implementation: every license candidate scans every word."""
+    page = doc[page_number]
+    scale = dpi / 72.0
+    words = page.get_text("words")
+    license_pattern = re.compile(r'^\d{5}$')
+    skip_licenses = {'01085', '01086'}
+    word_list = [{"text": w[4].strip(), "sx": (w[0] + w[2]) / 2 * scale, "sy": (w[1] + w[3]) / 2 * scale}
+                 for w in words]
+    name_blacklist = {
+        'CIVIL', 'ENGINEER', 'PROFESSIONAL', 'REGISTERED', 'LICENSE',
+        'STRUCTURAL', 'ENVIRONMENTAL', 'COMMONWEALTH', 'MASSACHUSETTS',
+        'NO.', 'NO', 'PE', 'OF', 'THE', 'AND', 'FOR',
+    }
+    found = []
+    seen = set()
+    for w in word_list:
+        lic = w["text"]
+        if not license_pattern.match(lic) or lic.startswith(('19', '20')) or lic in skip_licenses or lic in seen:
+            continue
+        seen.add(lic)
+        cx, cy = w["sx"], w["sy"]
+        radius = int(280 * (dpi / 150))
+        bbox = (max(0, int(cx) - radius), max(0, int(cy) - radius), radius * 2, radius * 2)
+        nearby = []
+        for ww in word_list:
+            if ww is w:
+                continue
+            dist = ((ww["sx"] - cx) ** 2 + (ww["sy"] - cy) ** 2) ** 0.5
+            if dist > 200:
+                continue
+            txt = re.sub(r'[^A-Z\s\.]', '', ww["text"].upper()).strip()
+            if not txt or len(txt) < 2 or txt in name_blacklist or txt.isdigit() or re.search(r'\bOF\b', txt):
+                continue
+            nearby.append((dist, txt))
+        nearby.sort(key=lambda x: x[0])
+        names = list(dict.fromkeys(n[1] for n in nearby))
+        found.append({"bbox": bbox, "license": lic, "name": " ".join(names[:3]) if names else None})
+    return found
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=30000)
+    parser.add_argument("--licenses", type=int, default=400)
+    parser.add_argument("--path", default="/tmp/bench_dense_sheet.pdf")
+    args = parser.parse_args()
+
+    make_dense_sheet(args.path, args.words, args.licenses)
+    doc = fitz.open(args.path)
+    print(f"Sheet: {len(doc[0].get_text('words'))} words, {args.licenses} license candidates\n")
+
+    reference, t_brute = timed(brute_force_stamp_bboxes, doc, 0)
+    _page_words_cache.clear()
+    indexed, t_cold = timed(get_stamp_bboxes_from_pdf, doc, 0)
+    _, t_warm = timed(get_stamp_bboxes_from_pdf, doc, 0)
+
+    print(f"brute force     {t_brute*1000:9.1f} ms")
+    print(f"grid (cold)     {t_cold*1000:9.1f} ms   {t_brute / t_cold:6.1f}x")
+    print(f"grid (cached)   {t_warm*1000:9.1f} ms   {t_brute / t_warm:6.1f}x")
+    print(f"\nresults identical: {reference == indexed} ({len(indexed)} stamps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+End-to-end load test: starts `app.main:app` under uvicorn on a free local port and
+replays a mix of /get-info, /get-page-image and /extract-stamp from concurrent
+virtual users against a synthetic drawing set (see benchmarks.synthetic).
+
+Each scenario is a request mix plus a number of users; each server setting (uvicorn
+workers, pipeline env vars) gets a fresh server per scenario, so RSS and caches
+start cold every time; load starts once /ready reports the warm-up done. Reported
+per scenario: throughput, p50/p95/p99 latency and error rate per endpoint, and the
+server's resident memory (uvicorn plus its worker pool processes, read from /proc,
+so Linux only).
+
+    python -m benchmarks.load_test --out load.json
+    python -m benchmarks.load_test --scenarios browse,burst --workers 1,2 --env WORKER_POOL_SIZE=2
+    python -m benchmarks.load_test --mix get-info=1,get-page-image=4,extract-stamp=2 --users 16
+    python -m benchmarks.load_test --out new.json --baseline load.json
+
+Like the frontend, every request uploads the PDF by default; --send doc_id uploads
+it once through /documents and sends the doc_id instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.bench_pipeline import _git_commit
+from benchmarks.synthetic import make_benchmark_set
+
+ENDPOINTS = ("get-info", "get-page-image", "extract-stamp")
+
+# Relative weights per endpoint
+SCENARIOS = {
+    # Many users flipping through sheets, the odd extraction
+    "browse": {"mix": {"get-info": 1, "get-page-image": 8, "extract-stamp": 1}, "users": 16},
+    # Everyone extracting at once
+    "burst": {"mix": {"extract-stamp": 1}, "users": 8},
+    # Paging while extractions queue up behind the pool
+    "mixed": {"mix": {"get-info": 1, "get-page-image": 4, "extract-stamp": 3}, "users": 12},
+}
+
+# Includes the startup warm-up: load starts once /ready answers 200
+SERVER_START_TIMEOUT = 120
+RSS_SAMPLE_INTERVAL = 0.25
+REQUEST_TIMEOUT = 300
+
+
+def percentiles(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    if not ms:
+        return None
+
+    def pick(q):
+        return round(ms[min(len(ms) - 1, int(len(ms) * q))], 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ms[-1], 2)}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _process_tree(pid):
+    """pid plus all of its descendants (uvicorn workers, the spawned pool processes)."""
+    pids, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        pids.append(p)
+        try:
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def tree_rss_bytes(pid):
+    total = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class Server:
+    """uvicorn running app.main:app in a subprocess, with its own store and cache directories."""
+
+    def __init__(self, workers, env):
+        self.workers = workers
+        self.env = env
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._tmp = tempfile.TemporaryDirectory(prefix="stamp-load-")
+        self._proc = None
+
+    def __enter__(self):
+        env = {
+            **os.environ,
+            # A fresh server must not answer from an earlier run's caches
+            "DOCUMENT_STORE_DIR": os.path.join(self._tmp.name, "documents"),
+            "RESULT_CACHE_PATH": os.path.join(self._tmp.name, "results.sqlite3"),
+            "STAMP_FINGERPRINT_PATH": os.path.join(self._tmp.name, "fingerprints.sqlite3"),
+            "PREVIEW_DIR": os.path.join(self._tmp.name, "previews"),
+            # ...nor pick up jobs another server left queued
+            "JOB_STORE_PATH": os.path.join(self._tmp.name, "jobs.sqlite3"),
+            **self.env,
+        }
+        self._proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self._proc.returncode}")
+            try:
+                # Not /: until warm-up is done every pool worker is busy loading, and the
+                # first seconds of latency and 503s would be cold start, not load
+                if httpx.get(f"{self.base_url}/ready", timeout=1).status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"uvicorn was not ready within {SERVER_START_TIMEOUT}s")
+
+    def rss_bytes(self):
+        return tree_rss_bytes(self._proc.pid)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._proc.terminate()
+        try:
+            self._proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._tmp.cleanup()
+        return False
+
+
+async def _sample_rss(server, samples, stop):
+    while not stop.is_set():
+        samples.append(server.rss_bytes())
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _request(client, endpoint, page, pdf_bytes, doc_id):
+    data = {} if endpoint == "get-info" else {"page": str(page)}
+    if doc_id:
+        return await client.post(f"/{endpoint}", data={**data, "doc_id": doc_id})
+    files = {"file": ("set.pdf", pdf_bytes, "application/pdf")}
+    return await client.post(f"/{endpoint}", data=data, files=files)
+
+
+async def _user(client, rnd, mix, page_count, pdf_bytes, doc_id, deadline, records):
+    endpoints, weights = zip(*mix.items())
+    page = rnd.randrange(page_count)
+    while time.monotonic() < deadline:
+        endpoint = rnd.choices(endpoints, weights)[0]
+        # Users mostly step to a neighbouring sheet
+        page = (page + rnd.choice((-1, 1, 1, 2))) % page_count
+        start = time.perf_counter()
+        try:
+            resp = await _request(client, endpoint, page, pdf_bytes, doc_id)
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        records.append((endpoint, status, time.perf_counter() - start))
+
+
+async def run_scenario(server, mix, users, duration, pdf_bytes, page_count, send, seed):
+    records = []
+    rss = []
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=REQUEST_TIMEOUT, limits=limits) as client:
+        doc_id = None
+        if send == "doc_id":
+            resp = await client.post("/documents", files={"file": ("set.pdf", pdf_bytes, "application/pdf")})
+            resp.raise_for_status()
+            doc_id = resp.json()["doc_id"]
+
+        rss_before = server.rss_bytes()
+        sampler = asyncio.create_task(_sample_rss(server, rss, stop))
+        start = time.monotonic()
+        deadline = start + duration
+        await asyncio.gather(*(
+            _user(client, random.Random(seed + u), mix, page_count, pdf_bytes, doc_id, deadline, records)
+            for u in range(users)
+        ))
+        elapsed = time.monotonic() - start
+        stop.set()
+        await sampler
+        rss_after = server.rss_bytes()
+
+    by_endpoint = {}
+    for endpoint in ENDPOINTS:
+        rows = [r for r in records if r[0] == endpoint]
+        if not rows:
+            continue
+        statuses = {}
+        for _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(n for s, n in statuses.items() if not s.isdigit() or int(s) >= 400)
+        by_endpoint[endpoint] = {
+            "requests": len(rows),
+            "errors": errors,
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "error_rate": round(errors / len(rows), 4),
+            "status": statuses,
+            # Latency of successful requests only: a fast 503 is not a fast extraction
+            "latency_ms": percentiles([t for _, s, t in rows if isinstance(s, int) and s < 400]),
+        }
+
+    errors = sum(e["errors"] for e in by_endpoint.values())
+    return {
+        "users": users,
+        "mix": mix,
+        "duration_s": round(elapsed, 2),
+        "requests": len(records),
+        "throughput_rps": round(len(records) / elapsed, 2),
+        "error_rate": round(errors / len(records), 4) if records else None,
+        "latency_ms": percentiles([t for _, s, t in records if isinstance(s, int) and s < 400]),
+        "endpoints": by_endpoint,
+        "rss_mb": {
+            "start": round(rss_before / 2**20, 1),
+            "peak": round(max(rss + [rss_after]) / 2**20, 1),
+            "end": round(rss_after / 2**20, 1),
+        },
+    }
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        endpoint, _, weight = part.partition("=")
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {endpoint!r}, expected one of {ENDPOINTS}")
+        mix[endpoint] = float(weight or 1)
+    return mix
+
+
+def _parse_env(pairs):
+    env = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--env expects KEY=VALUE, got {pair!r}")
+        env[key] = value
+    return env
+
+
+def print_report(report, baseline=None):
+    base_runs = {(r["workers"], r["scenario"]): r for r in (baseline or {}).get("runs", [])}
+    header = f"{'workers':>7s} {'scenario':10s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} " \
+             f"{'p99 ms':>9s} {'errors':>7s} {'peak RSS MB':>12s}"
+    if baseline:
+        header += f" {'req/s vs base':>14s} {'p95 vs base':>12s}"
+    print(header)
+    for run in report["runs"]:
+        lat = run["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+        line = f"{run['workers']:7d} {run['scenario']:10s} {run['throughput_rps']:8.2f} {lat['p50']:9.1f} " \
+               f"{lat['p95']:9.1f} {lat['p99']:9.1f} {run['error_rate'] or 0:7.2%} {run['rss_mb']['peak']:12.1f}"
+        base = base_runs.get((run["workers"], run["scenario"]))
+        if base and base["throughput_rps"] and base["latency_ms"] and run["latency_ms"]:
+            line += f" {(run['throughput_rps'] / base['throughput_rps'] - 1) * 100:+13.1f}%" \
+                    f" {(lat['p95'] / base['latency_ms']['p95'] - 1) * 100:+11.1f}%"
+        print(line)
+        for endpoint, e in run["endpoints"].items():
+            elat = e["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+            print(f"{'':7s}   {endpoint:16s} {e['throughput_rps']:8.2f} {elat['p50']:9.1f} "
+                  f"{elat['p95']:9.1f} {elat['p99']:9.1f} {e['error_rate']:7.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="load_test.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"any of {list(SCENARIOS)}")
+    parser.add_argument("--mix", type=_parse_mix, help="custom scenario, e.g. get-page-image=4,extract-stamp=1")
+    parser.add_argument("--users", type=int, help="concurrent virtual users (overrides the scenario's)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per scenario")
+    parser.add_argument("--workers", default="1", help="comma-separated uvicorn worker counts to compare")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE server setting, repeatable")
+    parser.add_argument("--send", choices=("file", "doc_id"), default="file")
+    parser.add_argument("--sheets", default="ansi-b,arch-e")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf", default="/tmp/load_test_set.pdf")
+    args = parser.parse_args()
+
+    scenarios = {}
+    if args.mix:
+        scenarios["custom"] = {"mix": args.mix, "users": args.users or 8}
+    else:
+        for name in args.scenarios.split(","):
+            if name not in SCENARIOS:
+                parser.error(f"unknown scenario {name!r}, expected one of {list(SCENARIOS)}")
+            scenarios[name] = {**SCENARIOS[name], "users": args.users or SCENARIOS[name]["users"]}
+    env = _parse_env(args.env)
+
+    truth = make_benchmark_set(args.pdf, sheets=args.sheets.split(","), seed=args.seed)
+    with open(args.pdf, "rb") as f:
+        pdf_bytes = f.read()
+    print(f"Synthetic set: {len(truth)} pages, {len(pdf_bytes) / 1024:.0f} KB; "
+          f"{args.duration:.0f}s per scenario, sending {args.send}\n")
+
+    runs = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        for name, scenario in scenarios.items():
+            print(f"[LOAD] {name}: {scenario['users']} users, {workers} uvicorn worker(s)...")
+            with Server(workers, env) as server:
+                result = asyncio.run(run_scenario(
+                    server, scenario["mix"], scenario["users"], args.duration,
+                    pdf_bytes, len(truth), args.send, args.seed,
+                ))
+            runs.append({"scenario": name, "workers": workers, **result})
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "sheets": args.sheets.split(","),
+            "pages": len(truth),
+            "duration_s": args.duration,
+            "send": args.send,
+            "env": env,
+        },
+        "runs": runs,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print()
+    print_report(report, baseline)
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Synthetic stamped drawing sets with ground truth, for benchmarks.
+
+Each sheet gets one or two circular PE seals in the title block: ring text around
+the edge, the engineer's name and discipline in the middle and "No. <license>"
+underneath. Variants cover sheet size, /Rotate 90 (portrait media shown as
+landscape, as many CAD exports are), seals drawn as vector text (text layer) or
+pasted in as a scanned image (no text layer), and a dense title block.
+
+    python -m benchmarks.synthetic /tmp/synthetic_set.pdf     # writes the PDF + .json ground truth
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+
+import fitz
+
+# Landscape sheet sizes in inches
+SHEET_SIZES = {
+    "ansi-b": (17, 11),
+    "arch-d": (36, 24),
+    "arch-e": (48, 36),
+}
+
+FIRST_NAMES = ["THOMAS", "MARIA", "JAMES", "LINDA", "ROBERT", "SUSAN", "DAVID", "KAREN"]
+LAST_NAMES = ["MAHANNA", "OKAFOR", "LINDQVIST", "BERNARD", "CHEN", "ROSSI", "PATEL", "NOVAK"]
+DISCIPLINES = ["CIVIL", "STRUCTURAL"]
+STATES = ["COMMONWEALTH OF MASSACHUSETTS", "STATE OF NEW YORK", "STATE OF CONNECTICUT"]
+TITLE_BLOCK_WORDS = [
+    "REVISION", "DESCRIPTION", "ISSUED FOR PERMIT", "DRAWN BY", "CHECKED BY", "SCALE",
+    "AS NOTED", "SHEET", "FOUNDATION PLAN", "GENERAL NOTES", "BID SET", "ADDENDUM",
+]
+
+SEAL_RADIUS_IN = 0.8
+SCAN_DPI = 300  # resolution of the pasted-in seal image on sheets without a text layer
+
+
+def _ring_text(page, center, radius, text, start_deg, end_deg, fontsize, upper=True):
+    """Letters spaced along an arc, each turned to follow the circle."""
+    cx, cy = center
+    step = (end_deg - start_deg) / max(len(text) - 1, 1)
+    for i, ch in enumerate(text):
+        deg = start_deg + i * step
+        rad = math.radians(deg)
+        point = fitz.Point(cx + radius * math.cos(rad), cy - radius * math.sin(rad))
+        # Upper arc reads left to right with letter tops outward, lower arc with tops inward
+        turn = deg - 90 if upper else deg + 90
+        page.insert_text(point, ch, fontsize=fontsize, morph=(point, fitz.Matrix(turn)))
+
+
+def draw_seal(page, center, radius, name, license_number, discipline, state):
+    """Vector PE seal centred on `center` (points), so its text is in the text layer."""
+    cx, cy = center
+    page.draw_circle(center, radius, color=(0, 0, 0), width=1.5)
+    page.draw_circle(center, radius * 0.72, color=(0, 0, 0), width=0.8)
+
+    ring_size = radius * 0.13
+    _ring_text(page, center, radius * 0.8, state, 160, 20, ring_size)
+    _ring_text(page, center, radius * 0.92, "REGISTERED PROFESSIONAL ENGINEER", 200, 340, ring_size, upper=False)
+
+    first, last = name.split(" ", 1)
+    size = radius * 0.16
+    for dy, text in ((-0.3, first), (-0.08, last), (0.14, discipline), (0.38, f"No. {license_number}")):
+        width = fitz.get_text_length(text, fontsize=size)
+        page.insert_text((cx - width / 2, cy + dy * radius + size / 3), text, fontsize=size)
+
+
+def paste_scanned_seal(page, center, radius, **seal):
+    """Seal rasterised at SCAN_DPI and placed as an image: no text layer, like a scanned stamp."""
+    side = radius * 2 + 8
+    scratch = fitz.open()
+    scratch_page = scratch.new_page(width=side, height=side)
+    draw_seal(scratch_page, (side / 2, side / 2), radius, **seal)
+    pix = scratch_page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+    cx, cy = center
+    page.insert_image(fitz.Rect(cx - side / 2, cy - side / 2, cx + side / 2, cy + side / 2), pixmap=pix)
+
+
+def _draw_sheet_body(page, rnd, dense):
+    """Border, title-block column, a drawing grid and (optionally) a crowded title block."""
+    w, h = page.rect.width, page.rect.height
+    margin = 0.5 * 72
+    tb_x = w * 0.80
+    page.draw_rect(fitz.Rect(margin, margin, w - margin, h - margin), color=(0, 0, 0), width=2)
+    page.draw_line((tb_x, margin), (tb_x, h - margin), color=(0, 0, 0), width=1.5)
+
+    # Structural grid with bubbles, as in a framing plan
+    for i, x in enumerate(range(int(margin) + 144, int(tb_x) - 72, 288)):
+        page.draw_line((x, margin + 72), (x, h - margin - 36), color=(0.4, 0.4, 0.4), width=0.5, dashes="[6 3] 0")
+        page.draw_circle((x, margin + 54), 14, color=(0, 0, 0), width=0.8)
+        page.insert_text((x - 4, margin + 58), chr(ord("A") + i % 26), fontsize=12)
+
+    # Title-block text stays below the seal area at the top of the column
+    items = 400 if dense else 40
+    for _ in range(items):
+        x, y = rnd.uniform(tb_x + 6, w - margin - 90), rnd.uniform(h * 0.55, h - margin - 10)
+        page.insert_text((x, y), rnd.choice(TITLE_BLOCK_WORDS), fontsize=rnd.choice((5, 6, 7)))
+    if dense:
+        # Revision table rows
+        for row in range(12):
+            y = h - margin - 24 - row * 12
+            page.insert_text((tb_x + 8, y), f"{row + 1}  {rnd.randint(1, 12):02d}/{rnd.randint(1, 28):02d}/24  "
+                             f"{rnd.choice(TITLE_BLOCK_WORDS)}", fontsize=6)
+
+
+def _rotated_copy(out, src, rotation):
+    """Portrait page with /Rotate `rotation` that displays exactly like the landscape source page."""
+    w, h = src[0].rect.width, src[0].rect.height
+    page = out.new_page(width=h, height=w)
+    page.show_pdf_page(page.rect, src, 0, rotate=rotation)
+    page.set_rotation(rotation)
+    return page
+
+
+def make_sheet(out, rnd, sheet="arch-e", rotation=0, text_layer=True, dense=False, seals=1):
+    """
+    Append one sheet to `out` and return its ground truth:
+    {"sheet", "rotation", "text_layer", "dense", "stamps": [{"license", "name", "center_pt", "radius_pt"}]}
+    Seal centres are in displayed (rotated) page points.
+    """
+    w_in, h_in = SHEET_SIZES[sheet]
+    scratch = fitz.open()
+    page = scratch.new_page(width=w_in * 72, height=h_in * 72)
+    _draw_sheet_body(page, rnd, dense)
+
+    radius = SEAL_RADIUS_IN * 72
+    cx = page.rect.width * 0.80 + (page.rect.width * 0.20 - 36) / 2
+    stamps = []
+    licenses = rnd.sample(range(30000, 89999), seals)
+    for i in range(seals):
+        cy = 0.5 * 72 + radius + 40 + i * (radius * 2 + 48)
+        seal = {
+            "name": f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+            "license_number": str(licenses[i]),
+            "discipline": DISCIPLINES[i % len(DISCIPLINES)],
+            "state": rnd.choice(STATES),
+        }
+        if text_layer:
+            draw_seal(page, (cx, cy), radius, **seal)
+        else:
+            paste_scanned_seal(page, (cx, cy), radius, **seal)
+        stamps.append({
+            "license": seal["license_number"],
+            "name": seal["name"],
+            "center_pt": [round(cx, 1), round(cy, 1)],
+            "radius_pt": round(radius, 1),
+        })
+
+    if rotation:
+        _rotated_copy(out, scratch, rotation)
+    else:
+        out.insert_pdf(scratch)
+    return {"sheet": sheet, "rotation": rotation, "text_layer": text_layer, "dense": dense, "stamps": stamps}
+
+
+def make_benchmark_set(path, sheets=("ansi-b", "arch-e"), rotations=(0, 90), seed=0):
+    """
+    One page per combination of sheet size, rotation, text layer and title-block density.
+    Writes the PDF to `path` and returns the ground truth list (one entry per page).
+    """
+    rnd = random.Random(seed)
+    out = fitz.open()
+    truth = []
+    for i, (sheet, rotation, text_layer, dense) in enumerate(
+        itertools.product(sheets, rotations, (True, False), (False, True))
+    ):
+        entry = make_sheet(out, rnd, sheet, rotation, text_layer, dense, seals=1 + i % 2)
+        entry["page"] = i
+        truth.append(entry)
+    out.save(path, garbage=3, deflate=True)
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default="/tmp/synthetic_set.pdf")
+    parser.add_argument("--sheets", default="ansi-b,arch-e", help=f"comma-separated, from {list(SHEET_SIZES)}")
+    parser.add_argument("--rotations", default="0,90")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    truth = make_benchmark_set(
+        args.path,
+        sheets=args.sheets.split(","),
+        rotations=[int(r) for r in args.rotations.split(",")],
+        seed=args.seed,
+    )
+    truth_path = args.path.rsplit(".", 1)[0] + ".json"
+    with open(truth_path, "w") as f:
+        json.dump(truth, f, indent=2)
+    print(f"Wrote {len(truth)} pages to {args.path}, ground truth in {truth_path}")
+
+
+if __name__ == "__main__":
+    main()